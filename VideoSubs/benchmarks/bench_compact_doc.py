@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+紧凑字幕文档基准
+生成 N 条事件（每条 W 个逐词时间戳）的转写结果，对比 pydantic SubtitleDoc 与 CompactSubtitleDoc：
+
+    build   由分段 / 字典构造文档（SubtitleEvent 逐条构造、SubtitleDoc 整批校验、列式构造）
+    dump    model_dump() 得到 API / 缓存使用的字典
+    memory  文档对象常驻内存（tracemalloc，含 numpy 数组）
+
+用法:
+    python benchmarks/bench_compact_doc.py --events 50000 --words 8
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+WORDS = "the quick brown fox jumps over a lazy dog 字幕 导出 基准 测试".split()
+
+
+def make_segments(n: int, words: int, seed: int = 0):
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    for _ in range(n):
+        items = []
+        for _ in range(words):
+            duration = rng.uniform(0.1, 0.5)
+            items.append({"word": " " + rng.choice(WORDS), "start": round(t, 3), "end": round(t + duration, 3),
+                          "probability": round(rng.random(), 4)})
+            t += duration
+        segments.append({"start": items[0]["start"] if items else t, "end": round(t, 3),
+                         "text": "".join(w["word"] for w in items) or "...", "words": items or None})
+        t += rng.uniform(0.0, 0.5)
+    return segments
+
+
+def _best(fn, runs):
+    best, result = None, None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _retained(build):
+    """build() 返回的对象常驻的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact subtitle document benchmark")
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--words", type=int, default=8, help="每条事件的逐词时间戳数（0 表示不带 words）")
+    parser.add_argument("--runs", type=int, default=3, help="每项重复次数，取最快一次")
+    args = parser.parse_args()
+
+    from src.agent.Subs import SubtitleDoc, SubtitleEvent
+    from src.utils.compact_doc import CompactSubtitleDoc
+
+    segments = make_segments(args.events, args.words)
+
+    def pydantic_from_segments():
+        events = [SubtitleEvent(id=str(i + 1), start=seg["start"], end=seg["end"], text=seg["text"],
+                                words=seg["words"], style="Default") for i, seg in enumerate(segments)]
+        return SubtitleDoc(language="en", events=events)
+
+    def compact_from_segments():
+        return CompactSubtitleDoc.from_segments(segments, language="en", style="Default", words=True)
+
+    doc_dict = pydantic_from_segments().model_dump()
+
+    cases = [
+        ("pydantic", "segments", pydantic_from_segments),
+        ("pydantic", "dict", lambda: SubtitleDoc.model_validate(doc_dict)),
+        ("compact", "segments", compact_from_segments),
+        ("compact", "dict", lambda: CompactSubtitleDoc.from_doc(doc_dict)),
+    ]
+    print(f"events: {args.events}, words/event: {args.words}, runs: {args.runs}")
+    print(f"{'type':<9} {'from':<9} {'build s':>8} {'dump s':>8} {'memory MB':>10}")
+    for label, source, build in cases:
+        build_s, doc = _best(build, args.runs)
+        dump_s, dumped = _best(doc.model_dump, args.runs)
+        assert dumped == doc_dict
+        memory = _retained(build) / 1e6
+        print(f"{label:<9} {source:<9} {build_s:>8.3f} {dump_s:>8.3f} {memory:>10.1f}")
+        del doc, dumped
+
+    compact = compact_from_segments()
+    to_model_s, model = _best(compact.to_model, args.runs)
+    assert model.model_dump() == doc_dict
+    print(f"compact.to_model(): {to_model_s:.3f} s (lossless round trip)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Whisper int8 量化 CPU 推理基准
+对固定样本集分别用 fp32 与动态 int8 量化模型转写，报告实时率（RTF）与 WER 漂移。
+
+样本目录中每个音频/视频文件可附带同名 .txt 参考文本；
+没有参考文本时以 fp32 的输出作为参考，此时 int8 的 WER 即为相对 fp32 的漂移。
+
+用法:
+    python benchmarks/bench_quantized_asr.py --samples path/to/samples --model small
+"""
+import argparse
+import os
+import sys
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+MEDIA_EXTS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".mp4", ".mkv", ".mov", ".webm"}
+
+
+def _tokens(text: str):
+    """英文等按空格分词；中日文等无空格语言按字符计算（即 CER）"""
+    text = text.strip().lower()
+    words = text.split()
+    if len(words) <= 1 and len(text) > 1:
+        return [c for c in text if not c.isspace()]
+    return words
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def _load_samples(sample_dir: str):
+    samples = []
+    for name in sorted(os.listdir(sample_dir)):
+        path = os.path.join(sample_dir, name)
+        stem, ext = os.path.splitext(path)
+        if ext.lower() not in MEDIA_EXTS:
+            continue
+        reference = None
+        if os.path.isfile(stem + ".txt"):
+            with open(stem + ".txt", "r", encoding="utf-8") as f:
+                reference = f.read()
+        samples.append((path, reference))
+    return samples
+
+
+def _run(model, samples, lang, runs):
+    import whisper
+
+    total_audio = total_time = 0.0
+    texts = []
+    for path, _ in samples:
+        audio = whisper.load_audio(path)
+        best = None
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            result = model.transcribe(audio, language=lang, fp16=False)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        total_audio += len(audio) / whisper.audio.SAMPLE_RATE
+        total_time += best
+        texts.append(result["text"])
+    return total_time / max(total_audio, 1e-6), texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper fp32 vs int8 CPU benchmark")
+    parser.add_argument("--samples", default=os.environ.get("ASR_BENCH_SAMPLES", ""),
+                        help="样本目录（音频 + 可选的同名 .txt 参考文本）")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--lang", default=None)
+    parser.add_argument("--runs", type=int, default=1, help="每个样本重复次数，取最快一次")
+    args = parser.parse_args()
+
+    if not args.samples or not os.path.isdir(args.samples):
+        parser.error("--samples must point to a directory of audio files")
+    samples = _load_samples(args.samples)
+    if not samples:
+        parser.error(f"No media files found in {args.samples}")
+
+    import whisper
+
+    from src.utils.model_loader import configure_threads, load_quantized_model
+
+    threads = configure_threads(quantized=True)
+    print(f"Model: {args.model}, samples: {len(samples)}, torch threads: {threads}")
+
+    fp32 = whisper.load_model(args.model, device="cpu")
+    fp32_rtf, fp32_texts = _run(fp32, samples, args.lang, args.runs)
+    del fp32
+
+    int8 = load_quantized_model(args.model)
+    int8_rtf, int8_texts = _run(int8, samples, args.lang, args.runs)
+
+    fp32_wer = int8_wer = 0.0
+    for (path, reference), a, b in zip(samples, fp32_texts, int8_texts):
+        ref = reference if reference is not None else a
+        fp32_wer += word_error_rate(ref, a)
+        int8_wer += word_error_rate(ref, b)
+    fp32_wer /= len(samples)
+    int8_wer /= len(samples)
+
+    print(f"{'mode':<6} {'RTF':>8} {'WER':>8}")
+    print(f"{'fp32':<6} {fp32_rtf:>8.3f} {fp32_wer:>8.2%}")
+    print(f"{'int8':<6} {int8_rtf:>8.3f} {int8_wer:>8.2%}")
+    print(f"speedup: {fp32_rtf / max(int8_rtf, 1e-9):.2f}x, WER drift: {int8_wer - fp32_wer:+.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+字幕导出基准
+生成 N 条事件的 SubtitleDoc，分别以字典、pydantic 模型与 CompactSubtitleDoc 为输入序列化为 SRT / ASS / VTT / JSON，
+报告每种格式的耗时与吞吐；同时给出逐行写文件的旧实现（format_srt）作为对照。
+
+用法:
+    python benchmarks/bench_subtitle_export.py --events 100000
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+WORDS = "the quick brown fox jumps over a lazy dog 字幕 导出 基准 测试".split()
+
+
+def make_doc(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    events, t = [], 0.0
+    for i in range(n):
+        duration = rng.uniform(0.8, 4.0)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        if rng.random() < 0.1:
+            text += "\n" + " ".join(rng.choice(WORDS) for _ in range(4))
+        events.append({"id": str(i + 1), "start": round(t, 3), "end": round(t + duration, 3),
+                       "text": text, "style": "Default"})
+        t += duration + rng.uniform(0.0, 0.5)
+    return {"language": "en", "resolution": {"width": 1920, "height": 1080}, "events": events}
+
+
+def legacy_srt(doc, f):
+    """旧实现：逐事件多次 write（对照）"""
+    from src.utils.subtitle_export import srt_time
+
+    for i, ev in enumerate(doc["events"], 1):
+        f.write(f"{i}\n")
+        f.write(f"{srt_time(ev['start'])} --> {srt_time(ev['end'])}\n")
+        f.write(f"{ev['text']}\n\n")
+
+
+def _best(fn, runs):
+    best = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subtitle export benchmark")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=3, help="每项重复次数，取最快一次")
+    args = parser.parse_args()
+
+    from src.agent.Subs import SubtitleDoc
+    from src.utils.compact_doc import CompactSubtitleDoc
+    from src.utils.subtitle_export import FORMATS, write_subtitles
+
+    doc = make_doc(args.events)
+    model = SubtitleDoc.model_validate(doc)
+    print(f"events: {args.events}, runs: {args.runs}")
+    print(f"{'input':<8} {'format':<7} {'seconds':>8} {'events/s':>12} {'MB':>7}")
+    compact = CompactSubtitleDoc.from_doc(doc)
+    for label, source in (("dict", doc), ("model", model), ("compact", compact)):
+        for fmt in FORMATS:
+            out = io.StringIO()
+
+            def run():
+                out.seek(0)
+                out.truncate()
+                write_subtitles(source, fmt, out)
+
+            elapsed = _best(run, args.runs)
+            size = len(out.getvalue().encode("utf-8")) / 1e6
+            print(f"{label:<8} {fmt:<7} {elapsed:>8.3f} {args.events / elapsed:>12,.0f} {size:>7.1f}")
+
+    elapsed = _best(lambda: legacy_srt(doc, io.StringIO()), args.runs)
+    print(f"{'legacy':<8} {'srt':<7} {elapsed:>8.3f} {args.events / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
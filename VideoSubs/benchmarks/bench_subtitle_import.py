@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+字幕导入基准
+用 bench_subtitle_export 的随机文档生成 N 条 cue 的 SRT / VTT / ASS 文件，
+报告逐行流式解析为 SubtitleDoc 的耗时与吞吐，并校验往返后的 cue 数与时间戳。
+
+用法:
+    python benchmarks/bench_subtitle_import.py --cues 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    from bench_subtitle_export import make_doc
+
+    from src.utils.subtitle_export import write_subtitles
+    from src.utils.subtitle_import import load_subtitles
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cues", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    doc = make_doc(args.cues)
+    print(f"cues: {args.cues}, runs: {args.runs}")
+    print(f"{'format':<7} {'seconds':>8} {'cues/s':>12} {'MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("srt", "vtt", "ass"):
+            path = os.path.join(tmp, f"bench.{fmt}")
+            write_subtitles(doc, fmt, path)
+            best, parsed = float("inf"), None
+            for _ in range(args.runs):
+                t0 = time.perf_counter()
+                parsed, _ = load_subtitles(path)
+                best = min(best, time.perf_counter() - t0)
+            assert len(parsed.events) == args.cues, (fmt, len(parsed.events))
+            # ASS 时间精度为厘秒
+            tolerance = 0.005 if fmt == "ass" else 0.0005
+            assert abs(parsed.events[-1].end - doc["events"][-1]["end"]) <= tolerance
+            size = os.path.getsize(path) / 1e6
+            print(f"{fmt:<7} {best:>8.3f} {args.cues / best:>12,.0f} {size:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -207,6 +207,11 @@ def main():
     uvicorn.run(app, host=HOST, port=PORT, log_level="info")
 
 if __name__ == "__main__":
+    if "--asr-worker" in sys.argv:
+        # 打包版的 ASR 工作进程入口（见 src/services/asr_pool.py）
+        from src.services.asr_worker import main as asr_worker_main
+        asr_worker_main([a for a in sys.argv[1:] if a != "--asr-worker"])
+        sys.exit(0)
     try:
         main()
     except Exception as e:
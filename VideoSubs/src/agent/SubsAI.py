@@ -1,5 +1,3 @@
-import os
-import torch
 from typing import Annotated, TypedDict
 from langchain_tavily import TavilySearch
 from langchain_openai import ChatOpenAI
@@ -18,8 +16,6 @@ from src.tools.subtitle_tools import (
 )
 from src.config_manager import get_config
 
-torch.set_num_threads(int(os.environ.get("TORCH_THREADS", "2")))
-
 Model = {"llm": None}
 searchTool = None
 llm_with_tools = None
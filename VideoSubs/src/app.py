@@ -68,7 +68,7 @@ db_module.engine = create_engine(db_module.SQLALCHEMY_DATABASE_URL, connect_args
 db_module.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_module.engine)
 
 from src.db import init_db
-from src.utils.model_loader import get_whisper_model
+from src.services.asr_pool import asr_pool
 from src.utils.task_queue import burn_queue
 from src.services.cleanup import cleanup_old_files, periodic_cleanup
 
@@ -76,7 +76,7 @@ from src.services.cleanup import cleanup_old_files, periodic_cleanup
 burn_queue.persistence_file = os.path.join(OUTPUTS_DIR, "queue_state.json")
 
 # Routers
-from src.routers import upload, asr, burn, copilot, tasks, history
+from src.routers import upload, asr, burn, copilot, tasks, history, hls, timeline, subtitles
 
 # Prometheus
 try:
@@ -87,7 +87,7 @@ except ImportError:
 
 
 # ---- Handlers ----
-from src.services.handlers import burn_task_handler, asr_task_handler
+from src.services.handlers import burn_task_handler, asr_task_handler, hls_task_handler
 
 
 @asynccontextmanager
@@ -99,17 +99,24 @@ async def lifespan(app: FastAPI):
     except Exception:
         pass
 
-    logger.info("Preloading Whisper model...")
-    import concurrent.futures
     loop = asyncio.get_event_loop()
-    try:
-        await loop.run_in_executor(None, get_whisper_model)
-        logger.info("Whisper model preloaded")
-    except Exception as e:
-        logger.error("Failed to preload Whisper model: %s", e)
+    if asr_pool.size:
+        # 模型由常驻 ASR 工作进程持有，API 进程保持轻量
+        logger.info("Starting %d ASR worker(s)...", asr_pool.size)
+        await loop.run_in_executor(None, asr_pool.start)
+        asyncio.create_task(asr_pool.monitor())
+    else:
+        logger.info("Preloading Whisper model...")
+        from src.utils.model_loader import get_whisper_model
+        try:
+            await loop.run_in_executor(None, get_whisper_model)
+            logger.info("Whisper model preloaded")
+        except Exception as e:
+            logger.error("Failed to preload Whisper model: %s", e)
 
     burn_queue.register_handler("burn_task", burn_task_handler)
     burn_queue.register_handler("asr_task", asr_task_handler)
+    burn_queue.register_handler("hls_task", hls_task_handler)
     logger.info("Starting task queue...")
     await burn_queue.start()
     logger.info("Task queue started")
@@ -120,6 +127,7 @@ async def lifespan(app: FastAPI):
     yield
     logger.info("Shutting down...")
     await burn_queue.stop()
+    asr_pool.stop()
 
 
 app = FastAPI(title="VideoCaptionsAI", version="1.0.0", lifespan=lifespan)
@@ -132,11 +140,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition", "Content-Length"],
+    expose_headers=["Content-Disposition", "Content-Length", "Content-Range", "Accept-Ranges", "ETag",
+                    *timeline.WAVEFORM_HEADERS],
 )
 
-# Mount outputs
-app.mount("/outputs", StaticFiles(directory=OUTPUTS_DIR), name="outputs")
+# Mount outputs (Range / multipart byteranges, content-hash ETags)
+from src.services.storage import digest_for_path
+from src.utils.file_serving import RangeStaticFiles
+app.mount("/outputs", RangeStaticFiles(directory=OUTPUTS_DIR, etag_for=digest_for_path), name="outputs")
 
 # Routers
 app.include_router(upload.router, prefix="/api")
@@ -145,6 +156,9 @@ app.include_router(burn.router, prefix="/api")
 app.include_router(copilot.router, prefix="/api")
 app.include_router(tasks.router, prefix="/api")
 app.include_router(history.router, prefix="/api")
+app.include_router(hls.router, prefix="/api")
+app.include_router(timeline.router, prefix="/api")
+app.include_router(subtitles.router, prefix="/api")
 
 
 # ---- Global exception handler ----
@@ -160,10 +174,19 @@ async def global_exception_handler(request: Request, exc: Exception):
 # ---- Health check ----
 @app.get("/health")
 async def health_check():
+    if asr_pool.enabled:
+        models = asr_pool.loaded_models()
+    else:
+        # 只在进程内转写时才会导入 model_loader；未导入说明模型尚未加载，不在此处引入 torch
+        loader = sys.modules.get("src.utils.model_loader")
+        loaded = loader.loaded_model_size() if loader else None
+        models = [loaded] if loaded else []
     return JSONResponse({
         "status": "ok",
         "version": "1.0.0",
-        "whisper_loaded": bool(getattr(get_whisper_model, "_current_model", None) or True),
+        "whisper_loaded": bool(models),
+        "whisper_models": models,
+        "asr_workers": asr_pool.status(),
     })
 
 
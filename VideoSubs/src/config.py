@@ -2,3 +2,12 @@ import os
 
 MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 1024 * 1024 * 500)) # 500MB Default
 OUTPUTS_DIR = os.environ.get("OUTPUTS_DIR", "outputs")
+
+# 烧录输出格式: faststart（moov 前置，完成后即可网页播放）/ fragmented（分片 MP4，烧录过程中即可边写边播）
+BURN_OUTPUT_MODES = ("faststart", "fragmented")
+BURN_OUTPUT_MODE = os.environ.get("BURN_OUTPUT_MODE", "faststart")
+# fragmented 模式下的分片（强制关键帧）间隔，秒
+BURN_FRAGMENT_SECONDS = float(os.environ.get("BURN_FRAGMENT_SECONDS", 2))
+
+# 上传完成后在后台预处理（探测、解码音频、波形、缩略图、语言检测），产物按内容缓存
+INGEST_ON_UPLOAD = os.environ.get("INGEST_ON_UPLOAD", "0") not in ("0", "false", "False")
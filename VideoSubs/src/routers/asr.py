@@ -1,22 +1,40 @@
 ﻿import os
-import json
-import hashlib
+import copy
+import asyncio
 from typing import Optional
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
 from fastapi.responses import JSONResponse
 
-from src.services.storage import get_file_path, save_upload
-from src.config import MAX_UPLOAD_SIZE, OUTPUTS_DIR
+from src.services.storage import digest_for_path, get_file_digest, get_file_path, save_upload
+from src.config import MAX_UPLOAD_SIZE
+from src.utils.content_id import UploadTooLarge
 from src.services.style_recommender import generate_recommended_style
-from src.utils.task_queue import burn_queue
-from src.tools.subtitle_tools import asr_transcribe_video
+from src.utils.task_queue import burn_queue, TaskStatus
+from src.services.handlers import asr_task_handler
+from src.services.asr_cache import asr_cache
+from src.services.tiered_asr import DRAFT_MODEL, REFINE_MODEL
+from src.services.asr_backends import backend_for_quality
+from src.services.asr_pool import asr_pool
 
 router = APIRouter()
 
+# cache_key -> 进行中的异步 ASR 任务 ID，重复提交时直接返回已有任务
+_pending_asr_tasks = {}
+_IN_FLIGHT = (TaskStatus.QUEUED, TaskStatus.PROCESSING, TaskStatus.RETRYING)
+
 ALLOWED_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".wmv",
                       ".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".wma"}
 
 
+def _pending_task(cache_key: str):
+    """返回 cache_key 对应的进行中任务；顺带清除已结束（或已被清理）的任务，字典大小不超过进行中的任务数"""
+    for key, task_id in list(_pending_asr_tasks.items()):
+        task = burn_queue.get_task(task_id)
+        if task is None or task.status not in _IN_FLIGHT:
+            del _pending_asr_tasks[key]
+    return burn_queue.get_task(_pending_asr_tasks.get(cache_key, ""))
+
+
 def _validate_file_ext(filename: str):
     ext = os.path.splitext(filename or "")[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
@@ -32,31 +50,32 @@ async def api_asr(
     width: Optional[int] = Form(None),
     height: Optional[int] = Form(None),
 ):
+    # 下载、写盘、摘要与缓存查询都是阻塞 IO，放到线程池执行
+    loop = asyncio.get_running_loop()
     if file_uuid:
-        path = get_file_path(file_uuid)
+        # 远程对象存储时可能需要下载
+        path = await loop.run_in_executor(None, get_file_path, file_uuid)
         if not path or not os.path.exists(path):
             raise HTTPException(status_code=404, detail="File not found")
-        cache_key = f"{file_uuid}_{quality}"
+        # 缓存按内容摘要索引，同一内容换 UUID 重新上传也能命中
+        cache_key = f"{await loop.run_in_executor(None, get_file_digest, file_uuid)}_{quality}"
     elif file:
         if file.filename:
             _validate_file_ext(file.filename)
         if file.size and file.size > MAX_UPLOAD_SIZE:
             raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_UPLOAD_SIZE/1024/1024}MB")
-        path = save_upload(file)
-        with open(path, "rb") as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        cache_key = f"{file_hash}_{quality}"
+        try:
+            path = await loop.run_in_executor(None, lambda: save_upload(file, max_size=MAX_UPLOAD_SIZE))
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_UPLOAD_SIZE/1024/1024}MB")
+        # 摘要已在写盘时计算
+        cache_key = f"{await loop.run_in_executor(None, digest_for_path, path)}_{quality}"
     else:
         raise HTTPException(status_code=400, detail="Either file or file_uuid is required")
 
-    cache_dir = os.path.join(OUTPUTS_DIR, "asr_cache")
-    os.makedirs(cache_dir, exist_ok=True)
-    cache_file = os.path.join(cache_dir, f"{cache_key}.json")
-
-    if os.path.exists(cache_file):
+    result = await loop.run_in_executor(None, asr_cache.get, cache_key)
+    if result is not None:
         print(f"ASR cache hit: {cache_key}")
-        with open(cache_file, "r", encoding="utf-8") as f:
-            result = json.load(f)
         if width and height:
             style = generate_recommended_style(width, height)
             result["recommended_style"] = style.dict()
@@ -78,31 +97,75 @@ async def api_asr(
     else:
         model_size = "small"
 
-    print(f"Using model \"{model_size}\" for quality={quality}")
+    # tiered: 小模型出草稿，低置信度片段交给大模型重解码
+    refine_model_size = None
+    if quality == "tiered":
+        model_size, refine_model_size = DRAFT_MODEL, REFINE_MODEL
+
+    backend = backend_for_quality(quality)
+
+    print(f"Using model \"{model_size}\" ({backend}) for quality={quality}" + (f" (refine: {refine_model_size})" if refine_model_size else ""))
 
     if async_mode:
-        task_id = await burn_queue.submit("asr_task", media_path=path, model_size=model_size)
+        existing = _pending_task(cache_key)
+        if existing:
+            print(f"ASR task for {cache_key} already in flight: {existing.task_id}")
+            return JSONResponse({"task_id": existing.task_id, "status": existing.status,
+                                 "message": "ASR task already in progress"})
+        task_id = await burn_queue.submit("asr_task", media_path=path, model_size=model_size,
+                                          refine_model_size=refine_model_size, backend=backend,
+                                          cache_key=cache_key)
+        _pending_asr_tasks[cache_key] = task_id
         return JSONResponse({"task_id": task_id, "status": "queued", "message": "ASR task submitted"})
 
-    import asyncio
     loop = asyncio.get_running_loop()
-    result = await loop.run_in_executor(None, lambda: asr_transcribe_video.invoke({"media_path": path, "model_size": model_size}))
+    # 相同 cache_key 的并发请求（含队列任务）只转写一次
+    result = await loop.run_in_executor(None, lambda: asr_task_handler(
+        path, model_size, refine_model_size=refine_model_size, backend=backend, cache_key=cache_key))
 
     if width and height:
+        result = copy.deepcopy(result)
         style = generate_recommended_style(width, height)
-        result.recommended_style = style
-        if result.events:
-            for event in result.events:
-                event.style = style.Name
+        result["recommended_style"] = style.dict()
+        if result.get("events"):
+            for event in result["events"]:
+                event["style"] = style.Name
+
+    return JSONResponse(result)
 
-    if hasattr(result, "dict"):
-        result = result.dict()
 
-    try:
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        print(f"ASR result cached: {cache_key}")
-    except Exception as e:
-        print(f"Failed to cache ASR result: {e}")
+@router.get("/asr/workers")
+async def asr_workers_status():
+    """ASR 工作进程状态（健康、负载、重启次数）"""
+    return JSONResponse(asr_pool.status())
 
+
+@router.get("/asr/{file_uuid}/window")
+async def asr_window(
+    file_uuid: str,
+    quality: str = Query("standard"),
+    start: float = Query(0.0, ge=0),
+    end: Optional[float] = Query(None, ge=0),
+):
+    """按时间窗口读取已缓存的转写结果，只解码与 [start, end] 相交的块"""
+    if end is not None and end < start:
+        raise HTTPException(status_code=400, detail="end must be >= start")
+    digest = get_file_digest(file_uuid)
+    result = asr_cache.get(f"{digest}_{quality}", start=start, end=end) if digest else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="Transcript not cached")
+    result["window"] = {"start": start, "end": end}
     return JSONResponse(result)
+
+
+@router.get("/asr/cache")
+async def asr_cache_stats(limit: int = Query(50, ge=0, le=1000)):
+    """ASR 结果缓存统计（条目数、占用字节、命中率）及最近访问的条目"""
+    return JSONResponse(asr_cache.stats(limit=limit))
+
+
+@router.delete("/asr/cache")
+async def purge_asr_cache(key: Optional[str] = Query(None)):
+    """清空 ASR 结果缓存，或只删除指定 key"""
+    removed = asr_cache.purge(key)
+    return JSONResponse({"removed": removed})
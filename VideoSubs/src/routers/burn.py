@@ -1,15 +1,25 @@
 ﻿import os
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
 
 import src.config as _config
+from src.agent.Subs import AssStyle
+from src.services.retention import OUTPUTS, retention
+from src.services.storage import get_file_record, media_store, probe_file
+from src.utils.content_id import copy_and_hash
+from src.utils.subtitle_export import write_subtitles
+from src.utils.subtitle_import import load_subtitles
 from src.utils.task_queue import burn_queue
 
 router = APIRouter()
 
 ALLOWED_VIDEO = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".wmv"}
 ALLOWED_SUBTITLE = {".ass", ".srt", ".vtt", ".ssa"}
+# ass 滤镜不支持的格式，烧录前在服务端转为 ASS
+CONVERT_TO_ASS = {".srt", ".vtt"}
 
 
 def _validate(filename: str, allowed: set):
@@ -18,37 +28,107 @@ def _validate(filename: str, allowed: set):
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
 
+async def _stream_to_disk(upload: UploadFile, dest_path: str):
+    """分块写盘（内存占用固定），同一遍得到大小与 SHA-256"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, copy_and_hash, upload.file, dest_path)
+
+
+def _parse_style(style: Optional[str]) -> Optional[AssStyle]:
+    if not style:
+        return None
+    try:
+        return AssStyle.model_validate_json(style)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid style: {e}")
+
+
+def _convert_to_ass(sub_path: str, media_path: str, file_uuid: Optional[str], style: Optional[AssStyle]) -> str:
+    """SRT / VTT 转为 ASS（PlayRes 取视频分辨率，事件使用所选样式），返回 ASS 路径"""
+    doc, _ = load_subtitles(sub_path)
+    if not doc.events:
+        raise ValueError("No subtitle cues found")
+    try:
+        meta = media_store.media_info(file_uuid) if file_uuid else probe_file(media_path)
+    except Exception as e:
+        print(f"[BURN] Failed to probe {media_path}, using default resolution: {e}")
+        meta = None
+    name = style.Name if style else "Default"
+    for event in doc.events:
+        event.style = name
+    ass_path = os.path.splitext(sub_path)[0] + ".ass"
+    return write_subtitles(doc, "ass", ass_path, width=(meta or {}).get("width"), height=(meta or {}).get("height"),
+                           styles=[style] if style else None, literal_text=True)
+
+
 @router.post("/burn/")
-async def api_burn(file: UploadFile = File(...), ass_file: UploadFile = File(...)):
-    _validate(file.filename or "", ALLOWED_VIDEO)
+async def api_burn(
+    file: Optional[UploadFile] = File(None),
+    ass_file: UploadFile = File(...),
+    file_uuid: Optional[str] = Form(None),
+    output_mode: Optional[str] = Form(None),
+    style: Optional[str] = Form(None),
+):
+    """
+    烧录字幕；ass_file 可为 ASS / SSA / SRT / VTT，SRT 与 VTT 先转为 ASS，
+    style 为 AssStyle JSON（仅转换时使用，缺省为内置 Default 样式）
+    """
+    if file_uuid:
+        record = get_file_record(file_uuid)
+        if not record:
+            raise HTTPException(status_code=404, detail="File not found")
+        _validate(record["path"], ALLOWED_VIDEO)
+    elif file:
+        _validate(file.filename or "", ALLOWED_VIDEO)
+    else:
+        raise HTTPException(status_code=400, detail="Either file or file_uuid is required")
     _validate(ass_file.filename or "", ALLOWED_SUBTITLE)
+    ass_style = _parse_style(style)
+    output_mode = output_mode or _config.BURN_OUTPUT_MODE
+    if output_mode not in _config.BURN_OUTPUT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported output_mode: {output_mode}")
 
     try:
         task_id = str(uuid.uuid4())[:8]
         task_dir = os.path.join(_config.OUTPUTS_DIR, task_id)
         os.makedirs(task_dir, exist_ok=True)
 
-        media_path = os.path.join(task_dir, file.filename)
-        with open(media_path, "wb") as f:
-            f.write(await file.read())
-        media_size = os.path.getsize(media_path)
-        print(f"[BURN] Media saved: {media_path} ({media_size} bytes)")
+        if file_uuid:
+            # 复用 /api/upload_file 已上传的文件，不再重复上传
+            media_path = record["path"]
+            media_size, media_hash = record["size"], record["sha256"]
+            print(f"[BURN] Using uploaded media {file_uuid}: {media_path} ({media_size} bytes)")
+        else:
+            media_path = os.path.join(task_dir, os.path.basename(file.filename))
+            media_size, media_hash = await _stream_to_disk(file, media_path)
+            print(f"[BURN] Media saved: {media_path} ({media_size} bytes, sha256 {media_hash[:12]})")
 
-        ass_path = os.path.join(task_dir, ass_file.filename)
-        with open(ass_path, "wb") as f:
-            f.write(await ass_file.read())
-        ass_size = os.path.getsize(ass_path)
+        ass_path = os.path.join(task_dir, os.path.basename(ass_file.filename))
+        ass_size, _ = await _stream_to_disk(ass_file, ass_path)
         print(f"[BURN] ASS saved: {ass_path} ({ass_size} bytes)")
+        if os.path.splitext(ass_path)[1].lower() in CONVERT_TO_ASS:
+            loop = asyncio.get_running_loop()
+            try:
+                ass_path = await loop.run_in_executor(None, _convert_to_ass, ass_path, media_path, file_uuid, ass_style)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid subtitle file: {e}")
+            print(f"[BURN] Converted subtitles to {ass_path}")
 
+        retention.track(task_dir, OUTPUTS)
         queue_task_id = await burn_queue.submit(
-            "burn_task", media_path=media_path, ass_path=ass_path, task_dir=task_dir
+            "burn_task", media_path=media_path, ass_path=ass_path, task_dir=task_dir, output_mode=output_mode
         )
         print(f"Task submitted: {queue_task_id}")
 
         return JSONResponse({
             "task_id": queue_task_id,
             "status": "queued",
-            "message": "Task submitted"
+            "message": "Task submitted",
+            "media_size": media_size,
+            "media_sha256": media_hash,
+            "output_mode": output_mode,
+            # fragmented 模式下烧录开始后即可边写边播
+            "stream_url": f"/api/burn/stream/{queue_task_id}" if output_mode == "fragmented" else None,
         })
     except HTTPException:
         raise
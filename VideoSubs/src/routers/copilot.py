@@ -109,19 +109,18 @@ async def send_message(
 
     print(f"Copilot received: {text} (include_context={include_context})")
 
+    class MockUploadFile:
+        def __init__(self, path):
+            self.filename = os.path.basename(path)
+            self.path = path
+
     video_obj = None
     if video_uuid:
-        video_path = get_file_path(video_uuid)
+        video_path = await asyncio.get_running_loop().run_in_executor(None, get_file_path, video_uuid)
         if video_path and os.path.exists(video_path):
-
-            class MockUploadFile:
-                def __init__(self, path):
-                    self.filename = os.path.basename(path)
-                    self.path = path
             video_obj = MockUploadFile(video_path)
     elif video:
-        video_obj = video
-        save_upload(video)
+        video_obj = MockUploadFile(save_upload(video))
 
     for f in (files or []):
         if not os.path.exists(f.filename or ""):
@@ -3,9 +3,11 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timezone
+import asyncio
 import json
 
 from src.db import get_db, VideoEditHistory
+from src.services.thumbnails import prefetch, thumbnail_url
 
 router = APIRouter()
 
@@ -65,6 +67,12 @@ async def create_edit_history(
     metadata: Optional[dict] = None,
     db: Session = Depends(get_db),
 ):
+    if thumbnail_path is None:
+        # 有视频流时指向封面接口，并在后台预先生成封面与时间轴雪碧图
+        loop = asyncio.get_running_loop()
+        thumbnail_path = await loop.run_in_executor(None, thumbnail_url, file_uuid)
+        if thumbnail_path:
+            loop.run_in_executor(None, prefetch, file_uuid)
     item = VideoEditHistory(
         file_uuid=file_uuid,
         original_filename=original_filename,
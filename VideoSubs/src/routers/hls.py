@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import re
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Form, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+
+import src.config as _config
+from src.agent.Subs import SubtitleDoc
+from src.services.hls import MASTER_PLAYLIST
+from src.services.retention import OUTPUTS, retention
+from src.services.storage import get_file_path
+from src.utils.file_serving import (
+    PUBLIC_IMMUTABLE_CACHE,
+    REVALIDATE_CACHE,
+    RangeFileResponse,
+)
+from src.utils.task_queue import TaskStatus, burn_queue
+
+router = APIRouter()
+
+_NAME_RE = re.compile(r"^[\w-]+\.(m3u8|m4s|mp4|vtt)$")
+_ID_RE = re.compile(r"^[\w-]+$")
+_MEDIA_TYPES = {
+    "m3u8": "application/vnd.apple.mpegurl",
+    "m4s": "video/iso.segment",
+    "mp4": "video/mp4",
+    "vtt": "text/vtt; charset=utf-8",
+}
+
+
+def _hls_dir(export_id: str) -> str:
+    return os.path.join(_config.OUTPUTS_DIR, export_id, "hls")
+
+
+@router.post("/hls/")
+async def api_hls_export(
+    file_uuid: Optional[str] = Form(None),
+    task_id: Optional[str] = Form(None),
+    subtitles: Optional[str] = Form(None),
+):
+    """
+    HLS 导出：file_uuid（原始视频）或 task_id（已完成的烧录任务成品），
+    subtitles 为 SubtitleDoc JSON 时附带 WebVTT 软字幕轨（流复制，无需重新编码）
+    """
+    if task_id:
+        task = burn_queue.get_task(task_id)
+        if not task or task.task_type != "burn_task":
+            raise HTTPException(status_code=404, detail="Task not found")
+        if task.status != TaskStatus.COMPLETED or not task.result:
+            raise HTTPException(status_code=400, detail=f"Task not complete. Status: {task.status}")
+        media_path = task.result["output_path"]
+    elif file_uuid:
+        loop = asyncio.get_running_loop()
+        media_path = await loop.run_in_executor(None, get_file_path, file_uuid)
+    else:
+        raise HTTPException(status_code=400, detail="Either file_uuid or task_id is required")
+    if not media_path or not os.path.exists(media_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    subtitle_doc = None
+    if subtitles:
+        try:
+            subtitle_doc = SubtitleDoc.model_validate(json.loads(subtitles)).model_dump()
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid subtitles: {e}")
+
+    export_id = str(uuid.uuid4())[:8]
+    out_dir = _hls_dir(export_id)
+    os.makedirs(out_dir, exist_ok=True)
+    retention.track(os.path.dirname(out_dir), OUTPUTS)
+    queue_task_id = await burn_queue.submit("hls_task", media_path=media_path, out_dir=out_dir,
+                                            subtitle_doc=subtitle_doc)
+    return JSONResponse({
+        "task_id": queue_task_id,
+        "status": "queued",
+        "playlist_url": f"/api/hls/{export_id}/{MASTER_PLAYLIST}",
+    })
+
+
+@router.get("/hls/{export_id}/{name}")
+async def get_hls_file(export_id: str, name: str):
+    """播放列表每次重新验证；分片内容不变，长期缓存"""
+    match = _NAME_RE.match(name)
+    if not _ID_RE.match(export_id) or not match:
+        raise HTTPException(status_code=404, detail="Not found")
+    path = os.path.join(_hls_dir(export_id), name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not found")
+    ext = match.group(1)
+    return RangeFileResponse(
+        path, media_type=_MEDIA_TYPES[ext], route="hls",
+        cache_control=REVALIDATE_CACHE if ext == "m3u8" else PUBLIC_IMMUTABLE_CACHE,
+        headers={"Cross-Origin-Resource-Policy": "cross-origin"},
+    )
@@ -0,0 +1,60 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from src.agent.Subs import AssStyle, SubtitleDoc
+from src.utils.file_serving import content_disposition
+from src.utils.subtitle_export import FORMATS, MEDIA_TYPES, iter_encoded
+from src.utils.task_queue import TaskStatus, burn_queue
+
+router = APIRouter()
+
+
+def _load_doc(subtitles: Optional[str], task_id: Optional[str]):
+    if task_id:
+        task = burn_queue.get_task(task_id)
+        if not task or task.task_type != "asr_task":
+            raise HTTPException(status_code=404, detail="Task not found")
+        if task.status != TaskStatus.COMPLETED or not task.result:
+            raise HTTPException(status_code=400, detail=f"Task not complete. Status: {task.status}")
+        return task.result
+    if not subtitles:
+        raise HTTPException(status_code=400, detail="Either subtitles or task_id is required")
+    try:
+        return SubtitleDoc.model_validate(json.loads(subtitles))
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid subtitles: {e}")
+
+
+@router.post("/subtitles/export")
+async def export_subtitles(
+    format: str = Form("srt"),
+    subtitles: Optional[str] = Form(None),
+    task_id: Optional[str] = Form(None),
+    width: Optional[int] = Form(None),
+    height: Optional[int] = Form(None),
+    styles: Optional[str] = Form(None),
+    filename: str = Form("subtitles"),
+):
+    """
+    字幕导出：subtitles（SubtitleDoc JSON）或 task_id（已完成的 ASR 任务）→ SRT / ASS / VTT / JSON
+    边序列化边发送，不在服务器上落盘；styles 为 AssStyle 列表 JSON，仅 ASS 使用
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format} (available: {', '.join(FORMATS)})")
+    doc = _load_doc(subtitles, task_id)
+    options = {}
+    if format == "ass":
+        try:
+            style_list = [AssStyle.model_validate(s) for s in json.loads(styles)] if styles else None
+        except (ValueError, TypeError, ValidationError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid styles: {e}")
+        options = {"width": width, "height": height, "styles": style_list}
+    return StreamingResponse(
+        iter_encoded(doc, format, **options),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": content_disposition(f"{filename}.{format}")},
+    )
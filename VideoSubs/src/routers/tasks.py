@@ -1,12 +1,24 @@
 ﻿import os
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 
+from src.services.object_storage import object_store
+from src.services.retention import retention
+from src.services.storage import digest_for_path
+import src.config as _config
+from src.utils.file_serving import IMMUTABLE_CACHE, RangeFileResponse, download_stats, follow_file
 from src.utils.task_queue import burn_queue, TaskStatus
 
 router = APIRouter()
 
+_RUNNING = (TaskStatus.QUEUED, TaskStatus.PROCESSING, TaskStatus.RETRYING)
+
+
+def _streamable(task) -> bool:
+    return task.task_type == "burn_task" and \
+        (task.kwargs.get("output_mode") or _config.BURN_OUTPUT_MODE) == "fragmented"
+
 
 @router.get("/burn/task/{task_id}")
 async def get_burn_task_status(task_id: str):
@@ -16,12 +28,14 @@ async def get_burn_task_status(task_id: str):
     task_info = task.to_dict()
     if task.status == TaskStatus.COMPLETED and task.result:
         output_path = task.result.get("output_path")
-        if output_path and os.path.exists(output_path):
+        if (output_path and os.path.exists(output_path)) or task.result.get("object_key"):
             task_info["download_url"] = f"/api/burn/download/{task_id}"
+    if task.status in _RUNNING and _streamable(task):
+        task_info["stream_url"] = f"/api/burn/stream/{task_id}"
     return JSONResponse(task_info)
 
 
-@router.get("/burn/download/{task_id}")
+@router.api_route("/burn/download/{task_id}", methods=["GET", "HEAD"])
 async def download_burn_result(task_id: str, filename: Optional[str] = Query(None)):
     task = burn_queue.get_task(task_id)
     if not task:
@@ -33,18 +47,57 @@ async def download_burn_result(task_id: str, filename: Optional[str] = Query(Non
 
     output_path = task.result["output_path"]
     if not os.path.exists(output_path):
+        # 由其他节点生成或本地已清理，改为对象存储的预签名链接
+        key = task.result.get("object_key")
+        url = object_store.presign(key, filename=filename or os.path.basename(output_path)) if key else None
+        if url:
+            return RedirectResponse(url, status_code=307)
         raise HTTPException(status_code=404, detail="Output file not found")
 
+    retention.touch(os.path.dirname(output_path))
     download_filename = filename if filename else os.path.basename(output_path)
-    return FileResponse(
+    # 任务成品内容不变：强 ETag 取内容摘要（烧录完成时已计算），支持 Range 续传与拖动预览
+    return RangeFileResponse(
         output_path, media_type="video/mp4", filename=download_filename,
+        etag=task.result.get("sha256") or (lambda: digest_for_path(output_path)),
+        cache_control=IMMUTABLE_CACHE, route="burn_download",
         headers={
             "Cross-Origin-Resource-Policy": "cross-origin",
-            "Access-Control-Expose-Headers": "Content-Disposition"
+            "Access-Control-Expose-Headers": "Content-Disposition, Content-Range, ETag"
         }
     )
 
 
+@router.get("/burn/stream/{task_id}")
+async def stream_burn_output(task_id: str):
+    """
+    边烧录边播放：分片 MP4 输出在写入过程中按块推送，烧录完成后与下载接口相同（支持 Range）
+    只有 output_mode=fragmented 的任务可在完成前播放
+    """
+    task = burn_queue.get_task(task_id)
+    if not task or task.task_type != "burn_task":
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task.status == TaskStatus.COMPLETED and task.result and "output_path" in task.result:
+        output_path = task.result["output_path"]
+        if not os.path.exists(output_path):
+            raise HTTPException(status_code=404, detail="Output file not found")
+        return RangeFileResponse(output_path, media_type="video/mp4",
+                                 etag=task.result.get("sha256") or (lambda: digest_for_path(output_path)),
+                                 cache_control=IMMUTABLE_CACHE, route="burn_stream",
+                                 headers={"Cross-Origin-Resource-Policy": "cross-origin"})
+    if task.status not in _RUNNING:
+        raise HTTPException(status_code=400, detail=f"Task not streamable. Status: {task.status}")
+    if not _streamable(task):
+        raise HTTPException(status_code=409, detail="Streaming during burn requires output_mode=fragmented")
+
+    output_path = os.path.join(task.kwargs["task_dir"], "output.mp4")
+    return StreamingResponse(
+        follow_file(output_path, lambda: task.status not in _RUNNING, route="burn_stream"),
+        media_type="video/mp4",
+        headers={"Cache-Control": "no-store", "Cross-Origin-Resource-Policy": "cross-origin"},
+    )
+
+
 @router.delete("/burn/task/{task_id}")
 async def cancel_burn_task(task_id: str):
     success = await burn_queue.cancel_task(task_id)
@@ -59,6 +112,7 @@ async def cancel_burn_task(task_id: str):
 @router.get("/burn/queue/status")
 async def get_queue_status():
     queue_status = burn_queue.get_queue_status()
+    queue_status["downloads"] = download_stats.snapshot()
     queue_status["worker_running"] = (
         burn_queue._worker_task is not None and not burn_queue._worker_task.done()
         if burn_queue._worker_task else False
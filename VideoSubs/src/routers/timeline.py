@@ -0,0 +1,145 @@
+import asyncio
+import os
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from src.services import scenes, thumbnails, waveform
+from src.services.storage import get_file_path, get_file_record, media_store
+from src.utils.asr_scheduler import SAMPLE_RATE
+from src.utils.file_serving import IMMUTABLE_CACHE, RangeFileResponse
+
+router = APIRouter()
+
+WAVEFORM_HEADERS = [
+    "X-Waveform-Start", "X-Waveform-Peaks", "X-Waveform-Samples-Per-Peak",
+    "X-Waveform-Sample-Rate", "X-Waveform-Bits", "X-Waveform-Duration",
+]
+
+
+@router.get("/files/{file_uuid}/waveform")
+async def get_waveform(
+    file_uuid: str,
+    request: Request,
+    start: float = Query(0.0, ge=0),
+    end: Optional[float] = Query(None, gt=0),
+    pixels: int = Query(1000, ge=1, le=waveform.MAX_PEAKS),
+    bits: int = Query(16),
+):
+    """
+    时间轴波形：返回 [start, end) 秒内约 pixels 对峰值
+    响应体为小端 int16 / int8 的 (min, max) 交错数组，实际起点与分辨率见 X-Waveform-* 响应头；
+    金字塔尚未构建时（未开启上传预处理）首次请求会先构建
+    """
+    if bits not in (8, 16):
+        raise HTTPException(status_code=400, detail="bits must be 8 or 16")
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+    record = get_file_record(file_uuid)
+    if not record:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    loop = asyncio.get_running_loop()
+
+    def read():
+        waveform.ensure_pyramid(get_file_path(file_uuid), record["sha256"])
+        duration = waveform.duration_seconds(record["sha256"])
+        window_end = duration if end is None else min(end, duration)
+        pps = pixels / max(window_end - start, 1.0 / SAMPLE_RATE)
+        return (*waveform.read_window(record["sha256"], start, window_end, pps, bits), duration)
+
+    try:
+        peaks, level, first, duration = await loop.run_in_executor(None, read)
+    except RuntimeError as e:
+        raise HTTPException(status_code=422, detail=f"Failed to decode audio: {e}")
+
+    # 内容由 uuid 对应的内容摘要与窗口参数唯一确定
+    etag = f'"{record["sha256"]}-{level}-{first:.3f}-{len(peaks)}-{bits}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE,
+        "X-Waveform-Start": f"{first:.3f}",
+        "X-Waveform-Peaks": str(len(peaks)),
+        "X-Waveform-Samples-Per-Peak": str(level),
+        "X-Waveform-Sample-Rate": str(SAMPLE_RATE),
+        "X-Waveform-Bits": str(bits),
+        "X-Waveform-Duration": f"{duration:.3f}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    body = peaks.astype("<i2" if bits == 16 else np.int8).tobytes()
+    return Response(content=body, media_type="application/octet-stream", headers=headers)
+
+
+async def _thumbnail_file(file_uuid: str, ensure, name: Optional[str], media_type: str):
+    if not get_file_record(file_uuid):
+        raise HTTPException(status_code=404, detail="File not found")
+    loop = asyncio.get_running_loop()
+    try:
+        path = await loop.run_in_executor(None, ensure, file_uuid)
+    except RuntimeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="No video stream")
+    if name:
+        path = os.path.join(path, name)
+    # 产物按内容摘要缓存，uuid 对应的内容不会变化
+    return RangeFileResponse(path, media_type=media_type, cache_control=IMMUTABLE_CACHE, route="thumbnails")
+
+
+@router.get("/files/{file_uuid}/thumbnail")
+async def get_thumbnail(file_uuid: str):
+    """封面缩略图（历史记录的 thumbnail_path 指向此处）"""
+    return await _thumbnail_file(file_uuid, thumbnails.ensure_poster, None, "image/jpeg")
+
+
+@router.get("/files/{file_uuid}/sprite.vtt")
+async def get_sprite_index(file_uuid: str):
+    """时间轴预览索引，cue 内容为相对地址 sprite.jpg#xywh=x,y,w,h"""
+    return await _thumbnail_file(file_uuid, thumbnails.ensure_sprite, thumbnails.SPRITE_INDEX,
+                                 "text/vtt; charset=utf-8")
+
+
+@router.get("/files/{file_uuid}/sprite.jpg")
+async def get_sprite_image(file_uuid: str):
+    return await _thumbnail_file(file_uuid, thumbnails.ensure_sprite, thumbnails.SPRITE_IMAGE, "image/jpeg")
+
+
+async def _scene_index(file_uuid: str):
+    """已构建的切点索引；尚未构建时在后台检测并返回 202 响应"""
+    record = get_file_record(file_uuid)
+    if not record:
+        raise HTTPException(status_code=404, detail="File not found")
+    index = scenes.load_index(record["sha256"])
+    if index is not None:
+        return index
+    loop = asyncio.get_running_loop()
+    try:
+        meta = await loop.run_in_executor(None, media_store.media_info, file_uuid)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Failed to probe media: {e}")
+    if not meta or not meta.get("width"):
+        raise HTTPException(status_code=404, detail="No video stream")
+    loop.run_in_executor(None, scenes.prefetch, file_uuid)
+    return JSONResponse({"status": "building"}, status_code=202)
+
+
+@router.get("/files/{file_uuid}/scenes")
+async def get_scene_cuts(file_uuid: str, start: float = Query(0.0, ge=0), end: Optional[float] = Query(None)):
+    """镜头切点（秒，升序）；首次请求触发后台检测"""
+    index = await _scene_index(file_uuid)
+    if isinstance(index, Response):
+        return index
+    cuts = index.between(start, end if end is not None else float("inf"))
+    return JSONResponse({"count": len(cuts), "cuts": cuts}, headers={"Cache-Control": IMMUTABLE_CACHE})
+
+
+@router.get("/files/{file_uuid}/scenes/nearest")
+async def get_nearest_cut(file_uuid: str, t: float = Query(..., ge=0)):
+    """离 t 最近的切点及其前后切点，供字幕时间轴编辑吸附"""
+    index = await _scene_index(file_uuid)
+    if isinstance(index, Response):
+        return index
+    return JSONResponse({"t": t, "nearest": index.nearest(t), "before": index.before(t), "after": index.after(t)})
@@ -1,7 +1,16 @@
 ﻿import os
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
-from src.services.storage import save_upload_with_uuid
+import src.config as _config
+from src.services.ingest import ingest_pipeline
+from src.services.retention import retention
+from src.services.storage import get_file_record, media_store, save_upload_with_uuid
+from src.services.resumable_upload import (
+    DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, UploadSessionError, UploadSessionNotFound, resumable_uploads
+)
+from src.utils.content_id import UploadTooLarge
 from src.config import MAX_UPLOAD_SIZE
 
 router = APIRouter()
@@ -10,6 +19,14 @@ ALLOWED_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".wmv",
                       ".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".wma"}
 
 
+def _start_ingest(file_uuid: str) -> dict:
+    """INGEST_ON_UPLOAD 开启时在后台预处理，响应附带状态查询地址"""
+    if not _config.INGEST_ON_UPLOAD:
+        return {}
+    ingest_pipeline.submit(file_uuid)
+    return {"ingest_url": f"/api/files/{file_uuid}/ingest"}
+
+
 @router.post("/upload_file")
 async def upload_file_endpoint(file: UploadFile = File(...)):
     ext = os.path.splitext(file.filename or "")[1].lower()
@@ -18,9 +35,137 @@ async def upload_file_endpoint(file: UploadFile = File(...)):
     if file.size and file.size > MAX_UPLOAD_SIZE:
         raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_UPLOAD_SIZE/1024/1024}MB")
 
-    file_uuid, file_path = save_upload_with_uuid(file, "default")
+    # 写盘与摘要计算是阻塞 IO，放到线程池执行
+    loop = asyncio.get_running_loop()
+    try:
+        file_uuid, _ = await loop.run_in_executor(
+            None, lambda: save_upload_with_uuid(file, "default", max_size=MAX_UPLOAD_SIZE))
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_UPLOAD_SIZE/1024/1024}MB")
+    record = await loop.run_in_executor(None, get_file_record, file_uuid)
     return JSONResponse({
         "uuid": file_uuid,
         "filename": file.filename,
-        "size": os.path.getsize(file_path)
+        "size": record["size"],
+        "sha256": record["sha256"],
+        "fingerprint": record["fingerprint"],
+        **_start_ingest(file_uuid),
+    })
+
+
+@router.get("/files/{file_uuid}")
+async def get_file_info(file_uuid: str, probe: bool = Query(True)):
+    """文件记录；probe=true 时附带 ffprobe 媒体信息（按内容缓存，只探测一次）"""
+    record = get_file_record(file_uuid)
+    if not record:
+        raise HTTPException(status_code=404, detail="File not found")
+    if probe and record["meta"] is None:
+        loop = asyncio.get_running_loop()
+        try:
+            record["meta"] = await loop.run_in_executor(None, media_store.media_info, file_uuid)
+        except Exception as e:
+            print(f"Failed to probe {file_uuid}: {e}")
+    record.pop("path", None)
+    return JSONResponse(record)
+
+
+@router.get("/files/{file_uuid}/ingest")
+async def get_ingest_status(file_uuid: str):
+    """预处理各步骤状态（done / running / failed / skipped / pending）与检测到的语言"""
+    loop = asyncio.get_running_loop()
+    status = await loop.run_in_executor(None, ingest_pipeline.status, file_uuid)
+    if status is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return JSONResponse(status)
+
+
+@router.post("/files/{file_uuid}/ingest")
+async def start_ingest(file_uuid: str):
+    """手动触发预处理（未开启 INGEST_ON_UPLOAD 时，或补做失败的步骤）"""
+    if get_file_record(file_uuid) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    ingest_pipeline.submit(file_uuid)
+    return JSONResponse({"status": "queued", "ingest_url": f"/api/files/{file_uuid}/ingest"}, status_code=202)
+
+
+@router.get("/storage/retention")
+async def retention_stats():
+    """各存储类别的占用、预算与累计回收字节数"""
+    loop = asyncio.get_running_loop()
+    return JSONResponse(await loop.run_in_executor(None, retention.stats))
+
+
+# ---- Resumable chunked upload ----
+def _session_call(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/upload/sessions")
+async def init_upload_session(
+    filename: str = Form(...),
+    size: int = Form(...),
+    chunk_size: int = Form(DEFAULT_CHUNK_SIZE),
+    sha256: Optional[str] = Form(None),
+):
+    """创建可续传上传会话；之后按偏移量 PUT 各分块（可并行、可乱序）"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+    if size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_UPLOAD_SIZE/1024/1024}MB")
+    return JSONResponse(_session_call(resumable_uploads.init, filename, size, chunk_size, sha256), status_code=201)
+
+
+@router.put("/upload/sessions/{session_id}")
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: Optional[str] = Header(None),
+):
+    """写入一块数据（请求体为原始字节），X-Chunk-SHA256 可选校验"""
+    length = int(request.headers.get("content-length") or 0)
+    if length > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Chunk too large. Max size is {MAX_CHUNK_SIZE} bytes")
+    # 分块传输编码没有 Content-Length，边读边计数，超限即停止读取
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail=f"Chunk too large. Max size is {MAX_CHUNK_SIZE} bytes")
+    data = bytes(data)
+    loop = asyncio.get_running_loop()
+    return JSONResponse(await loop.run_in_executor(
+        None, lambda: _session_call(resumable_uploads.write_chunk, session_id, offset, data, x_chunk_sha256)))
+
+
+@router.get("/upload/sessions/{session_id}")
+async def upload_session_status(session_id: str):
+    """已接收区间与缺失区间，断线后据此续传"""
+    return JSONResponse(_session_call(resumable_uploads.status, session_id))
+
+
+@router.post("/upload/sessions/{session_id}/complete")
+async def complete_upload_session(session_id: str, sha256: Optional[str] = Form(None)):
+    """校验并登记文件，返回的 uuid 可直接用于 ASR / 烧录接口"""
+    loop = asyncio.get_running_loop()
+    record = await loop.run_in_executor(
+        None, lambda: _session_call(resumable_uploads.complete, session_id, sha256))
+    return JSONResponse({
+        "uuid": record["uuid"],
+        "size": record["size"],
+        "sha256": record["sha256"],
+        "fingerprint": record["fingerprint"],
+        **_start_ingest(record["uuid"]),
     })
+
+
+@router.delete("/upload/sessions/{session_id}")
+async def abort_upload_session(session_id: str):
+    _session_call(resumable_uploads.abort, session_id)
+    return JSONResponse({"message": "Upload session aborted"})
@@ -0,0 +1,413 @@
+"""
+可插拔 ASR 后端
+转写编排（services/transcription.py）只依赖 AsrBackend 接口，更换推理引擎无需改动路由和任务处理器。
+
+内置后端:
+    whisper  openai-whisper（默认），支持批处理调度与 int8 量化
+    onnx     导出为 ONNX 的 Whisper，由 ONNX Runtime 在 CPU 上推理
+
+按质量档位选择后端：ASR_BACKEND 为默认后端，ASR_BACKEND_TIERS 覆盖个别档位，
+例如 ASR_BACKEND_TIERS="standard=onnx,auto=onnx"。
+
+导出 ONNX 模型:
+    python -m src.services.asr_backends export --model small
+"""
+import argparse
+import os
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from src.utils.asr_scheduler import (
+    SAMPLE_RATE,
+    TIME_PRECISION,
+    WINDOW_SAMPLES,
+    asr_scheduler,
+    batching_enabled,
+    model_traits,
+    split_segments,
+)
+
+Span = Tuple[int, int]
+
+DEFAULT_BACKEND = os.environ.get("ASR_BACKEND", "whisper")
+ONNX_DIR = os.environ.get("ASR_ONNX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "whisper", "onnx"))
+
+
+def _tiling(n_samples: int) -> List[Span]:
+    return [(o, min(o + WINDOW_SAMPLES, n_samples)) for o in range(0, max(n_samples, 1), WINDOW_SAMPLES)]
+
+
+class AsrBackend:
+    """ASR 后端接口，所有音频均为 16kHz 单声道 float32 PCM"""
+
+    name = "base"
+
+    def load(self, model_size: str) -> None:
+        """预加载模型（可选，首次转写时也会按需加载）"""
+        raise NotImplementedError
+
+    def transcribe_stream(self, audio: Any, model_size: str, lang: Optional[str] = None,
+                          spans: Optional[List[Span]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐段产出转写结果，分段字段与 whisper 相同
+        （start/end/text/tokens/avg_logprob/compression_ratio/no_speech_prob），
+        时间戳对应原始时间轴；首个分段附带 language 字段
+
+        Args:
+            spans: 只解码这些区间（采样），长度不限；None 表示整段
+        """
+        raise NotImplementedError
+
+    def detect_language(self, audio: Any, model_size: str) -> Tuple[str, float]:
+        """根据前 30 秒音频检测语言，返回 (语言代码, 概率)"""
+        raise NotImplementedError
+
+    def transcribe(self, audio: Any, model_size: str, lang: Optional[str] = None,
+                   spans: Optional[List[Span]] = None) -> Dict[str, Any]:
+        """汇总 transcribe_stream，返回与 whisper model.transcribe() 相同结构的字典"""
+        segments = []
+        language = lang
+        for seg in self.transcribe_stream(audio, model_size, lang, spans):
+            language = language or seg.pop("language", None)
+            seg.pop("language", None)
+            seg["id"] = len(segments)
+            segments.append(seg)
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": language}
+
+
+class WhisperBackend(AsrBackend):
+    """openai-whisper：启用批处理时经由 asr_scheduler，否则直接调用 model.transcribe"""
+
+    name = "whisper"
+
+    def load(self, model_size: str) -> None:
+        self._model(model_size)
+
+    def _model(self, model_size: str):
+        from src.utils.model_loader import get_whisper_model
+        return get_whisper_model(model_size)
+
+    def transcribe(self, audio: Any, model_size: str, lang: Optional[str] = None,
+                   spans: Optional[List[Span]] = None) -> Dict[str, Any]:
+        from src.utils.vad import pack_windows
+
+        # 短停顿合并进同一窗口：每个 clip 至少占一个 30 秒解码窗口，逐段传入反而比不做 VAD 更慢
+        windows = pack_windows(spans, WINDOW_SAMPLES) if spans is not None else None
+        if batching_enabled():
+            return asr_scheduler.transcribe_audio(audio, model_size=model_size, lang=lang, spans=windows)
+
+        model = self._model(model_size)
+        if windows is None:
+            return model.transcribe(audio, language=lang)
+        # clip_timestamps 让 whisper 只解码这些区间，输出的时间戳仍是原始时间轴
+        clips = [t / SAMPLE_RATE for window in windows for t in window]
+        return model.transcribe(audio, language=lang, clip_timestamps=clips)
+
+    def transcribe_stream(self, audio, model_size, lang=None, spans=None):
+        result = self.transcribe(audio, model_size, lang, spans)
+        for i, seg in enumerate(result["segments"]):
+            yield dict(seg, language=result.get("language")) if i == 0 else seg
+
+    def detect_language(self, audio, model_size):
+        import whisper
+
+        from src.utils.model_loader import get_whisper_model
+
+        model = get_whisper_model(model_size)
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[:WINDOW_SAMPLES]), model.dims.n_mels)
+        _, probs = model.detect_language(mel.to(model.device))
+        lang = max(probs, key=probs.get)
+        return lang, float(probs[lang])
+
+
+def export_onnx(model_size: str, out_dir: Optional[str] = None, quantize: Optional[bool] = None) -> str:
+    """
+    将 Whisper 的 encoder / decoder 导出为 ONNX（decoder 不带 KV cache，每步重算整个前缀）
+
+    Returns:
+        模型目录（含 encoder.onnx、decoder.onnx）
+    """
+    import torch
+    import whisper
+
+    from src.utils.model_loader import quantization_enabled
+
+    out_dir = out_dir or os.path.join(ONNX_DIR, model_size)
+    os.makedirs(out_dir, exist_ok=True)
+    model = whisper.load_model(model_size, device="cpu").eval()
+
+    class _Decoder(torch.nn.Module):
+        def __init__(self, decoder):
+            super().__init__()
+            self.decoder = decoder
+
+        def forward(self, tokens, audio_features):
+            return self.decoder(tokens, audio_features)
+
+    mel = torch.zeros(1, model.dims.n_mels, whisper.audio.N_FRAMES)
+    enc_path = os.path.join(out_dir, "encoder.onnx")
+    dec_path = os.path.join(out_dir, "decoder.onnx")
+    # 手写注意力路径才能把因果 mask 按动态长度导出；use_sdpa 是进程级开关，导出后恢复，
+    # 以免拖慢同进程内的 PyTorch 后端
+    attention = whisper.model.MultiHeadAttention
+    use_sdpa = getattr(attention, "use_sdpa", None)
+    if use_sdpa is not None:
+        attention.use_sdpa = False
+    try:
+        with torch.no_grad():
+            audio_features = model.encoder(mel)
+            torch.onnx.export(
+                model.encoder, (mel,), enc_path, opset_version=17,
+                input_names=["mel"], output_names=["audio_features"],
+                dynamic_axes={"mel": {0: "batch"}, "audio_features": {0: "batch"}},
+            )
+            tokens = torch.zeros((1, 3), dtype=torch.long)
+            torch.onnx.export(
+                _Decoder(model.decoder), (tokens, audio_features), dec_path, opset_version=17,
+                input_names=["tokens", "audio_features"], output_names=["logits"],
+                dynamic_axes={"tokens": {0: "batch", 1: "length"}, "audio_features": {0: "batch"},
+                              "logits": {0: "batch", 1: "length"}},
+            )
+    finally:
+        if use_sdpa is not None:
+            attention.use_sdpa = use_sdpa
+
+    if quantize is None:
+        quantize = quantization_enabled()
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        for path in (enc_path, dec_path):
+            tmp_path = f"{path}.int8.tmp"
+            quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, path)
+
+    print(f"Exported ONNX Whisper '{model_size}' to {out_dir}")
+    return out_dir
+
+
+class OnnxWhisperBackend(AsrBackend):
+    """ONNX Runtime CPU 推理；同一任务的多个 30 秒窗口合并为一个批次贪心解码"""
+
+    name = "onnx"
+    MAX_NEW_TOKENS = 224
+    MAX_INITIAL_TIMESTAMP = 1.0
+    BATCH_SIZE = int(os.environ.get("ASR_ONNX_BATCH", "8"))
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[Any, Any]] = {}
+
+    def load(self, model_size: str):
+        if model_size in self._sessions:
+            return self._sessions[model_size]
+        import onnxruntime as ort
+
+        from src.utils.model_loader import cpu_thread_count
+
+        model_dir = os.path.join(ONNX_DIR, model_size)
+        if not os.path.isfile(os.path.join(model_dir, "decoder.onnx")):
+            print(f"ONNX model for '{model_size}' not found, exporting...")
+            export_onnx(model_size, model_dir)
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = cpu_thread_count(quantized=True)
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ["CPUExecutionProvider"]
+        sessions = (
+            ort.InferenceSession(os.path.join(model_dir, "encoder.onnx"), opts, providers=providers),
+            ort.InferenceSession(os.path.join(model_dir, "decoder.onnx"), opts, providers=providers),
+        )
+        # 只保留一个模型，与 model_loader 的策略一致
+        self._sessions = {model_size: sessions}
+        print(f"ONNX Whisper '{model_size}' loaded ({opts.intra_op_num_threads} threads)")
+        return sessions
+
+    def _tokenizer(self, model_size: str, lang: Optional[str]):
+        from whisper.tokenizer import get_tokenizer
+        _, multilingual, num_languages = model_traits(model_size)
+        return get_tokenizer(multilingual, num_languages=num_languages, language=lang, task="transcribe")
+
+    def _encode(self, audio, spans: List[Span], model_size: str):
+        import numpy as np
+        import whisper
+
+        n_mels = model_traits(model_size)[0]
+        mels = np.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[s:e]), n_mels).numpy()
+            for s, e in spans
+        ]).astype(np.float32)
+        encoder, _ = self.load(model_size)
+        return encoder.run(None, {"mel": mels})[0]
+
+    def _logits(self, model_size: str, tokens, features):
+        _, decoder = self.load(model_size)
+        return decoder.run(None, {"tokens": tokens, "audio_features": features})[0]
+
+    def detect_language(self, audio, model_size):
+        import numpy as np
+
+        tokenizer = self._tokenizer(model_size, None)
+        features = self._encode(audio, [(0, min(len(audio), WINDOW_SAMPLES))], model_size)
+        logits = self._logits(model_size, np.array([[tokenizer.sot]], dtype=np.int64), features)[0, -1]
+        lang_tokens = list(tokenizer.all_language_tokens)
+        lang_logits = logits[lang_tokens]
+        probs = np.exp(lang_logits - lang_logits.max())
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        return tokenizer.all_language_codes[best], float(probs[best])
+
+    def _apply_timestamp_rules(self, logits, seq: List[int], tokenizer):
+        """whisper ApplyTimestampRules 的简化版：时间戳成对出现、单调不减，首个 token 必须是时间戳"""
+        import numpy as np
+
+        ts_begin = tokenizer.timestamp_begin
+        if not seq:
+            logits[:ts_begin] = -np.inf
+            logits[ts_begin + int(self.MAX_INITIAL_TIMESTAMP / TIME_PRECISION) + 1:] = -np.inf
+            return
+        last_ts = seq[-1] >= ts_begin
+        penultimate_ts = len(seq) < 2 or seq[-2] >= ts_begin
+        if last_ts:
+            if penultimate_ts:
+                logits[ts_begin:] = -np.inf
+            else:
+                logits[:tokenizer.eot] = -np.inf
+        stamps = [t for t in seq if t >= ts_begin]
+        if stamps:
+            floor = stamps[-1] if last_ts and not penultimate_ts else stamps[-1] + 1
+            logits[ts_begin:floor] = -np.inf
+        # 时间戳总概率高于任一文本 token 时强制输出时间戳
+        logprobs = logits - np.logaddexp.reduce(logits)
+        if np.logaddexp.reduce(logprobs[ts_begin:]) > logprobs[:ts_begin].max():
+            logits[:ts_begin] = -np.inf
+
+    def _decode_batch(self, model_size: str, tokenizer, features) -> List[Dict[str, Any]]:
+        import numpy as np
+
+        batch = features.shape[0]
+        prefix = list(tokenizer.sot_sequence)
+        suppress = sorted(set(tokenizer.non_speech_tokens) | {
+            tokenizer.transcribe, tokenizer.translate, tokenizer.sot, tokenizer.sot_prev,
+            tokenizer.sot_lm, tokenizer.no_timestamps,
+        })
+        blank = tokenizer.encode(" ") + [tokenizer.eot]
+
+        seqs: List[List[int]] = [[] for _ in range(batch)]
+        sum_logprob = [0.0] * batch
+        done = [False] * batch
+        no_speech = [0.0] * batch
+
+        for step in range(self.MAX_NEW_TOKENS):
+            # 已结束的行用 EOT 补齐，保持批次矩形；未结束的行长度都是 len(prefix) + step，
+            # 解码器是因果的，补齐不影响它们最后一个位置的 logits
+            tokens = np.array([prefix + s + [tokenizer.eot] * (step - len(s)) for s in seqs], dtype=np.int64)
+            logits = self._logits(model_size, tokens, features)
+            if step == 0:
+                probs = np.exp(logits[:, len(prefix) - 1] - logits[:, len(prefix) - 1].max(axis=-1, keepdims=True))
+                probs /= probs.sum(axis=-1, keepdims=True)
+                no_speech = probs[:, tokenizer.no_speech].tolist()
+            step_logits = logits[:, -1].astype(np.float64)
+            for k in range(batch):
+                if done[k]:
+                    continue
+                row = step_logits[k]
+                row[suppress] = -np.inf
+                if step == 0:
+                    row[blank] = -np.inf
+                self._apply_timestamp_rules(row, seqs[k], tokenizer)
+                token = int(np.argmax(row))
+                sum_logprob[k] += float(row[token] - np.logaddexp.reduce(row))
+                if token == tokenizer.eot:
+                    done[k] = True
+                else:
+                    seqs[k].append(token)
+            if all(done):
+                break
+
+        results = []
+        for k in range(batch):
+            text_bytes = tokenizer.decode([t for t in seqs[k] if t < tokenizer.eot]).encode("utf-8")
+            results.append({
+                "tokens": seqs[k],
+                "avg_logprob": sum_logprob[k] / (len(seqs[k]) + 1),
+                "compression_ratio": len(text_bytes) / max(1, len(zlib.compress(text_bytes))),
+                "no_speech_prob": no_speech[k],
+            })
+        return results
+
+    def transcribe_stream(self, audio, model_size, lang=None, spans=None):
+        from whisper.audio import HOP_LENGTH
+
+        from src.utils.vad import pack_windows
+
+        if lang is None:
+            lang, _ = self.detect_language(audio, model_size)
+        tokenizer = self._tokenizer(model_size, lang)
+        windows = pack_windows(spans, WINDOW_SAMPLES) if spans is not None else _tiling(len(audio))
+
+        def _decode_text(tokens: List[int]) -> str:
+            return tokenizer.decode([t for t in tokens if t < tokenizer.eot])
+
+        first = True
+        for i in range(0, len(windows), self.BATCH_SIZE):
+            chunk = windows[i:i + self.BATCH_SIZE]
+            features = self._encode(audio, chunk, model_size)
+            for (s, e), result in zip(chunk, self._decode_batch(model_size, tokenizer, features)):
+                if result["no_speech_prob"] > 0.6 and result["avg_logprob"] < -1.0:
+                    continue
+                for seg in split_segments(result["tokens"], tokenizer.timestamp_begin, _decode_text,
+                                          s / SAMPLE_RATE, (e - s) / SAMPLE_RATE):
+                    seg.update({
+                        "seek": s // HOP_LENGTH,
+                        "temperature": 0.0,
+                        "avg_logprob": result["avg_logprob"],
+                        "compression_ratio": result["compression_ratio"],
+                        "no_speech_prob": result["no_speech_prob"],
+                    })
+                    if first:
+                        seg["language"] = lang
+                        first = False
+                    yield seg
+
+
+_BACKENDS: Dict[str, Type[AsrBackend]] = {
+    "whisper": WhisperBackend,
+    "onnx": OnnxWhisperBackend,
+}
+_instances: Dict[str, AsrBackend] = {}
+
+
+def register_backend(name: str, backend_cls: Type[AsrBackend]):
+    """注册自定义后端"""
+    _BACKENDS[name] = backend_cls
+
+
+def get_backend(name: Optional[str] = None) -> AsrBackend:
+    name = name or DEFAULT_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown ASR backend: {name} (available: {', '.join(_BACKENDS)})")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+def backend_for_quality(quality: Optional[str]) -> str:
+    """按质量档位选择后端名称"""
+    tiers = {}
+    for item in os.environ.get("ASR_BACKEND_TIERS", "").split(","):
+        if "=" in item:
+            tier, backend = item.split("=", 1)
+            tiers[tier.strip()] = backend.strip()
+    return tiers.get(quality or "standard", DEFAULT_BACKEND)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ASR backend utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export Whisper to ONNX for the onnx backend")
+    export.add_argument("--model", default="small")
+    export.add_argument("--out", default=None)
+    export.add_argument("--quantize", action="store_true", help="Apply ONNX Runtime dynamic int8 quantization")
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx(args.model, args.out, quantize=args.quantize or None)
@@ -0,0 +1,294 @@
+"""
+ASR 结果缓存 - outputs/asr_cache 下的 .vsub 文件（utils/subtitle_codec.py）+ SQLite 索引
+索引记录 key、文件大小、最后访问时间与命中次数，超出字节预算时按 LRU/LFU 淘汰。
+配置远程对象存储时结果同时写入 asr_cache/<key>.vsub，本地未命中时从远程读回，
+各节点共享转写结果；本地淘汰不删除远程副本（由存储桶生命周期规则管理）。
+
+配置:
+    ASR_CACHE_MAX_BYTES  缓存字节预算（默认 1GB，0 表示不限）
+    ASR_CACHE_POLICY     淘汰策略 lru / lfu（默认 lru）
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import src.config as _config
+from src.services.object_storage import ObjectNotFound, ObjectStore, object_store
+from src.utils.subtitle_codec import read_doc, write_doc
+
+try:
+    from prometheus_client import Counter, Gauge
+    PROMETHEUS_AVAILABLE = True
+    METRIC_HITS = Counter('asr_cache_hits_total', 'ASR result cache hits')
+    METRIC_MISSES = Counter('asr_cache_misses_total', 'ASR result cache misses')
+    METRIC_EVICTIONS = Counter('asr_cache_evictions_total', 'ASR result cache entries evicted')
+    METRIC_BYTES = Gauge('asr_cache_bytes', 'Bytes held by the ASR result cache')
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+INDEX_NAME = "index.db"
+CACHE_EXTS = (".vsub", ".json")  # .json 为旧版缓存，读取兼容
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_EVICTION_ORDER = {
+    "lru": "last_access ASC",
+    "lfu": "hit_count ASC, last_access ASC",
+}
+
+
+class AsrCache:
+    def __init__(self, root: Optional[str] = None, max_bytes: int = 1024 ** 3, policy: str = "lru",
+                 objects: Optional[ObjectStore] = None):
+        """
+        Args:
+            root: 缓存目录，默认 OUTPUTS_DIR/asr_cache（运行时解析）
+            max_bytes: 字节预算，0 表示不限
+            policy: 淘汰策略 lru / lfu
+            objects: 对象存储后端，默认全局 object_store；仅远程后端会镜像缓存
+        """
+        if policy not in _EVICTION_ORDER:
+            raise ValueError(f"Unknown ASR cache policy: {policy}")
+        self._root = root
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized_root: Optional[str] = None
+        self.objects = objects or object_store
+
+    @property
+    def root(self) -> str:
+        return self._root or os.path.join(_config.OUTPUTS_DIR, "asr_cache")
+
+    def _connect(self) -> sqlite3.Connection:
+        root = self.root
+        os.makedirs(root, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(root, INDEX_NAME), timeout=30)
+        if self._initialized_root != root:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._initialized_root = root
+        return conn
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.vsub")
+
+    @staticmethod
+    def object_key(key: str) -> str:
+        return f"asr_cache/{key}.vsub"
+
+    def _fetch_remote(self, key: str, path: str) -> bool:
+        """从对象存储取回其他节点写入的结果"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            self.objects.download(self.object_key(key), tmp)
+            os.replace(tmp, path)
+            return True
+        except ObjectNotFound:
+            return False
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _load(self, key: str, start: Optional[float], end: Optional[float]):
+        path = self._path(key)
+        legacy = os.path.join(self.root, f"{key}.json")
+        if os.path.exists(path) or (
+                self.objects.remote and not os.path.exists(legacy) and self._fetch_remote(key, path)):
+            return read_doc(path, start, end), path
+        with open(legacy, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        if start is not None or end is not None:
+            lo = float("-inf") if start is None else start
+            hi = float("inf") if end is None else end
+            result["events"] = [ev for ev in result.get("events") or [] if ev["end"] >= lo and ev["start"] <= hi]
+        return result, legacy
+
+    def get(self, key: str, start: Optional[float] = None, end: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存结果并更新访问时间与命中次数；未命中返回 None
+        给出 start/end（秒）时只解码与该时间窗口相交的事件
+        """
+        try:
+            result, path = self._load(key, start, end)
+        except Exception:
+            result = None
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                if result is None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                else:
+                    now = time.time()
+                    updated = conn.execute(
+                        "UPDATE entries SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                        (now, key)).rowcount
+                    if not updated:
+                        # 索引建立前写入的旧缓存文件
+                        conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, 1)",
+                                     (key, os.path.basename(path), os.path.getsize(path), now, now))
+                conn.commit()
+            finally:
+                conn.close()
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if PROMETHEUS_AVAILABLE:
+            (METRIC_MISSES if result is None else METRIC_HITS).inc()
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """原子写入缓存结果，随后按预算淘汰"""
+        os.makedirs(self.root, exist_ok=True)
+        size = write_doc(self._path(key), result)
+        if self.objects.remote:
+            self.objects.put_file(self.object_key(key), self._path(key))
+        legacy = os.path.join(self.root, f"{key}.json")
+        if os.path.exists(legacy):
+            os.remove(legacy)
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, 0) "
+                    "ON CONFLICT(key) DO UPDATE SET path = excluded.path, size = excluded.size, "
+                    "last_access = excluded.last_access",
+                    (key, f"{key}.vsub", size, now, now))
+                conn.commit()
+                self._evict(conn, protect=key)
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, protect: Optional[str] = None) -> int:
+        """淘汰到预算以内，返回删除的条目数（调用方持有锁）"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = 0
+        if self.max_bytes and total > self.max_bytes:
+            rows = conn.execute(
+                f"SELECT key, path, size FROM entries WHERE key != ? ORDER BY {_EVICTION_ORDER[self.policy]}",
+                (protect or "",)).fetchall()
+            for key, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, path))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            conn.commit()
+            if evicted:
+                print(f"ASR cache evicted {evicted} entries ({self.policy}), {total} bytes remain")
+        if PROMETHEUS_AVAILABLE:
+            METRIC_EVICTIONS.inc(evicted)
+            METRIC_BYTES.set(total)
+        return evicted
+
+    def enforce(self) -> int:
+        """
+        索引与磁盘对账（收录旧文件、清除失效记录、删除残留临时文件），再按预算淘汰
+        由 cleanup_old_files 定期调用，返回淘汰条目数
+        """
+        root = self.root
+        if not os.path.isdir(root):
+            return 0
+        with self._lock:
+            conn = self._connect()
+            try:
+                indexed = {path for (path,) in conn.execute("SELECT path FROM entries")}
+                on_disk = set()
+                now = time.time()
+                for name in os.listdir(root):
+                    full = os.path.join(root, name)
+                    if name.endswith(".tmp") and now - os.path.getmtime(full) > 3600:
+                        os.remove(full)
+                    elif name.endswith(CACHE_EXTS):
+                        on_disk.add(name)
+                        if name not in indexed:
+                            mtime = os.path.getmtime(full)
+                            conn.execute("INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, 0)",
+                                         (os.path.splitext(name)[0], name, os.path.getsize(full), mtime, mtime))
+                for path in indexed - on_disk:
+                    conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+                conn.commit()
+                return self._evict(conn)
+            finally:
+                conn.close()
+
+    def purge(self, key: Optional[str] = None) -> int:
+        """删除指定 key 或全部缓存，返回删除的条目数"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                if key is None:
+                    rows = conn.execute("SELECT key, path FROM entries").fetchall()
+                else:
+                    rows = conn.execute("SELECT key, path FROM entries WHERE key = ?", (key,)).fetchall()
+                for k, path in rows:
+                    try:
+                        os.remove(os.path.join(self.root, path))
+                    except FileNotFoundError:
+                        pass
+                    if self.objects.remote:
+                        self.objects.delete(self.object_key(k))
+                    conn.execute("DELETE FROM entries WHERE key = ?", (k,))
+                conn.commit()
+            finally:
+                conn.close()
+        return len(rows)
+
+    def stats(self, limit: int = 0) -> Dict[str, Any]:
+        """缓存统计；limit > 0 时附带最近访问的条目"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+                entries: List[Dict[str, Any]] = []
+                if limit > 0:
+                    for key, size, created, last_access, hit_count in conn.execute(
+                            "SELECT key, size, created, last_access, hit_count FROM entries "
+                            "ORDER BY last_access DESC LIMIT ?", (limit,)):
+                        entries.append({"key": key, "size": size, "created": created,
+                                        "last_access": last_access, "hit_count": hit_count})
+            finally:
+                conn.close()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "items": entries,
+            }
+
+
+# 全局 ASR 结果缓存
+asr_cache = AsrCache(
+    max_bytes=int(os.environ.get("ASR_CACHE_MAX_BYTES", 1024 ** 3)),
+    policy=os.environ.get("ASR_CACHE_POLICY", "lru").lower(),
+)
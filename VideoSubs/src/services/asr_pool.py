@@ -0,0 +1,254 @@
+"""
+ASR 工作进程池 - 在 API 进程中管理常驻的 ASR 工作进程（services/asr_worker.py）
+负责启动、健康检查、崩溃重启，以及按最小负载分发转写请求。
+API 进程因此无需加载 torch / whisper，推理也不会占用其线程池。
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+try:
+    from prometheus_client import Gauge
+    PROMETHEUS_AVAILABLE = True
+    METRIC_WORKER_INFLIGHT = Gauge('asr_worker_inflight', 'In-flight ASR requests per worker', ['worker'])
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+_CREATE_NO_WINDOW = 0x08000000 if sys.platform == "win32" else 0
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+class WorkerUnavailable(RuntimeError):
+    pass
+
+
+def _free_port() -> int:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class AsrWorker:
+    def __init__(self, index: int, host: str = "127.0.0.1"):
+        self.index = index
+        self.host = host
+        self.port: Optional[int] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.inflight = 0
+        self.reported_active = 0
+        self.healthy = False
+        self.restarts = 0
+        self.last_health: Optional[Dict[str, Any]] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def load(self) -> int:
+        # 本地计数比健康检查上报的更及时，二者取大
+        return max(self.inflight, self.reported_active)
+
+    def spawn(self):
+        self.port = _free_port()
+        if getattr(sys, "frozen", False):
+            cmd = [sys.executable, "--asr-worker", "--port", str(self.port)]
+        else:
+            cmd = [sys.executable, "-m", "src.services.asr_worker", "--port", str(self.port)]
+        self.process = subprocess.Popen(cmd, cwd=_PROJECT_ROOT, creationflags=_CREATE_NO_WINDOW)
+        self.healthy = False
+        print(f"ASR worker #{self.index} spawned (pid {self.process.pid}, port {self.port})")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def request(self, method: str, path: str, payload: Optional[dict] = None,
+                timeout: Optional[float] = 5.0) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            try:
+                detail = json.loads(e.read()).get("error", str(e))
+            except Exception:
+                detail = str(e)
+            raise RuntimeError(f"ASR worker #{self.index} failed: {detail}") from e
+
+    def stop(self, timeout: float = 10.0):
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.healthy = False
+
+
+class AsrWorkerPool:
+    def __init__(self, size: int, acquire_timeout: float = 60.0):
+        """
+        Args:
+            size: 工作进程数；0 表示不启用，转写在 API 进程内完成
+            acquire_timeout: 没有健康进程时（启动中 / 重启中）请求最多等待多久（秒）
+        """
+        self.size = max(0, size)
+        self.acquire_timeout = acquire_timeout
+        self.workers: List[AsrWorker] = []
+        self._lock = threading.Lock()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """已启动进程池；请求在 acquire_timeout 内等待健康的进程，不会回退到 API 进程"""
+        return bool(self.workers)
+
+    @property
+    def ready(self) -> bool:
+        return any(w.healthy for w in self.workers)
+
+    def loaded_models(self) -> List[str]:
+        """健康进程中已加载的模型"""
+        return sorted({w.last_health["model_size"] for w in self.workers
+                       if w.healthy and w.last_health and w.last_health.get("model_size")})
+
+    def start(self, ready_timeout: float = 600.0):
+        """启动全部工作进程并等待其就绪（模型预加载可能较慢）"""
+        if self.size == 0 or self.workers:
+            return
+        self.workers = [AsrWorker(i) for i in range(self.size)]
+        for worker in self.workers:
+            worker.spawn()
+        deadline = time.monotonic() + ready_timeout
+        while time.monotonic() < deadline and not all(w.healthy for w in self.workers):
+            self.check_health()
+            time.sleep(0.5)
+        ready = sum(w.healthy for w in self.workers)
+        print(f"ASR worker pool ready: {ready}/{self.size} healthy")
+
+    def stop(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def check_health(self):
+        """刷新各进程的健康状态与负载，重启已退出的进程"""
+        for worker in self.workers:
+            if not worker.alive():
+                if worker.process is not None:
+                    print(f"ASR worker #{worker.index} exited ({worker.process.returncode}), restarting")
+                    worker.restarts += 1
+                worker.spawn()
+                continue
+            self._probe(worker)
+
+    def _probe(self, worker: AsrWorker):
+        try:
+            info = worker.request("GET", "/health", timeout=2.0)
+            worker.healthy = info.get("status") == "ok"
+            worker.reported_active = int(info.get("active", 0))
+            worker.last_health = info
+        except Exception:
+            worker.healthy = False
+        if PROMETHEUS_AVAILABLE:
+            METRIC_WORKER_INFLIGHT.labels(worker=str(worker.index)).set(worker.load)
+
+    async def monitor(self, interval: float = 10.0):
+        """后台定期健康检查"""
+        self._monitor_task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.check_health)
+            except Exception as e:
+                print(f"ASR worker health check failed: {e}")
+
+    def _acquire(self, exclude: List[AsrWorker], timeout: float = 0.0) -> AsrWorker:
+        """
+        选出负载最小的健康进程；暂无健康进程时在 timeout 内等待进程就绪
+        （模型加载中，或已退出、等待 monitor 重启）
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                candidates = [w for w in self.workers if w.healthy and w not in exclude]
+                if candidates:
+                    worker = min(candidates, key=lambda w: (w.load, w.index))
+                    worker.inflight += 1
+                    return worker
+            waiting = [w for w in self.workers if w not in exclude]
+            if not waiting or time.monotonic() >= deadline:
+                raise WorkerUnavailable("No healthy ASR worker available")
+            time.sleep(0.5)
+            for worker in waiting:
+                if worker.alive():
+                    self._probe(worker)
+
+    def _release(self, worker: AsrWorker):
+        with self._lock:
+            worker.inflight -= 1
+
+    def transcribe(self, **params) -> Dict[str, Any]:
+        """将转写请求分发给负载最小的工作进程（阻塞调用）"""
+        return self._dispatch("/transcribe", params)
+
+    def detect_language(self, pcm_path: str, offset: int, model_size: str) -> Dict[str, Any]:
+        """在工作进程中检测 PCM（.npy）从 offset 采样起的语言，返回 {"language", "probability"}"""
+        return self._dispatch("/detect_language", {"pcm_path": pcm_path, "offset": offset, "model_size": model_size})
+
+    def _dispatch(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """连接失败时标记该进程不健康并换一个进程重试"""
+        tried: List[AsrWorker] = []
+        while True:
+            worker = self._acquire(tried, self.acquire_timeout)
+            try:
+                return worker.request("POST", path, params, timeout=None)
+            except (urllib.error.URLError, ConnectionError) as e:
+                print(f"ASR worker #{worker.index} unreachable: {e}")
+                worker.healthy = False
+                tried.append(worker)
+            finally:
+                self._release(worker)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "models": self.loaded_models(),
+            "size": self.size,
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid if w.process else None,
+                    "port": w.port,
+                    "healthy": w.healthy,
+                    "inflight": w.inflight,
+                    "active": w.reported_active,
+                    "restarts": w.restarts,
+                    "model_size": (w.last_health or {}).get("model_size"),
+                }
+                for w in self.workers
+            ],
+        }
+
+
+# 全局工作进程池（打包的桌面版默认在进程内转写）
+asr_pool = AsrWorkerPool(
+    int(os.environ.get("ASR_WORKERS", "0" if getattr(sys, "frozen", False) else "1")),
+    acquire_timeout=float(os.environ.get("ASR_WORKER_WAIT_SECONDS", "60")),
+)
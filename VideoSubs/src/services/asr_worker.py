@@ -0,0 +1,155 @@
+"""
+ASR 工作进程 - 常驻进程持有 Whisper 模型，通过本地 HTTP 提供转写服务
+API 进程经由 services/asr_pool.py 按负载分发请求，本进程不依赖 FastAPI。
+
+接口:
+    GET  /health      存活检查
+    GET  /load        当前负载（进行中 / 已完成 / 失败数）
+    POST /transcribe  {"media_path", "lang", "model_size", "refine_model_size", "backend"}
+    POST /detect_language  {"pcm_path", "offset", "model_size"}  从 int16 PCM（.npy）的 offset 采样处检测语言
+
+启动:
+    python -m src.services.asr_worker --port 9101
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _WorkerState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at = time.time()
+        self.model_size = None
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "model_size": self.model_size,
+                "uptime": round(time.time() - self.started_at, 1),
+            }
+
+
+state = _WorkerState()
+
+
+class AsrWorkerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, dict(state.snapshot(), status="ok"))
+        elif self.path == "/load":
+            self._send_json(200, state.snapshot())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        handler = {"/transcribe": _transcribe, "/detect_language": _detect_language}.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except Exception as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        with state.lock:
+            state.active += 1
+        try:
+            result = handler(params)
+            with state.lock:
+                state.completed += 1
+                state.model_size = params.get("refine_model_size") or params.get("model_size") or state.model_size
+            self._send_json(200, result)
+        except Exception as e:
+            traceback.print_exc()
+            with state.lock:
+                state.failed += 1
+            self._send_json(500, {"error": str(e), "type": type(e).__name__})
+        finally:
+            with state.lock:
+                state.active -= 1
+
+
+def _transcribe(params):
+    from src.services.transcription import transcribe_media
+
+    return transcribe_media(
+        params["media_path"],
+        lang=params.get("lang"),
+        model_size=params.get("model_size"),
+        refine_model_size=params.get("refine_model_size"),
+        backend=params.get("backend"),
+    )
+
+
+def _detect_language(params):
+    import numpy as np
+
+    from src.services.asr_backends import get_backend
+    from src.utils.asr_scheduler import WINDOW_SAMPLES
+
+    pcm = np.load(params["pcm_path"], mmap_mode="r")
+    offset = int(params.get("offset", 0))
+    audio = np.asarray(pcm[offset:offset + WINDOW_SAMPLES], dtype=np.float32) / 32768.0
+    language, probability = get_backend().detect_language(audio, params["model_size"])
+    return {"language": language, "probability": probability}
+
+
+def serve(host: str, port: int, preload: bool = True):
+    if preload:
+        from src.services.asr_backends import get_backend
+        model_size = os.environ.get("WHISPER_MODEL", "base")
+        print(f"[ASR-WORKER {os.getpid()}] Preloading {model_size}...", flush=True)
+        try:
+            get_backend().load(model_size)
+            state.model_size = model_size
+        except Exception as e:
+            print(f"[ASR-WORKER {os.getpid()}] Preload failed: {e}", flush=True)
+
+    server = ThreadingHTTPServer((host, port), AsrWorkerHandler)
+    server.daemon_threads = True
+    print(f"[ASR-WORKER {os.getpid()}] Listening on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VideoCaptionsAI ASR worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--no-preload", action="store_true")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, preload=not args.no_preload)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,52 +1,26 @@
-import os
-import shutil
 import asyncio
-from datetime import datetime, timedelta
-from src.config import OUTPUTS_DIR
 from src.utils.task_queue import burn_queue
+from src.services.asr_cache import asr_cache
+from src.services.resumable_upload import resumable_uploads
+from src.services.retention import retention
 
 def cleanup_old_files(max_age_hours: int = 24):
-    """清理旧文件和文件夹"""
+    """
+    清理旧文件
+    任务目录、上传与缓存由 retention 按索引中的字节预算与访问时间淘汰（不再遍历 OUTPUTS_DIR 判断 mtime），
+    ASR 缓存与分块上传会话由各自模块管理
+    """
     print("Running cleanup_old_files...")
-    now = datetime.now()
-    cutoff = now - timedelta(hours=max_age_hours)
-    
-    if not os.path.exists(OUTPUTS_DIR):
-        return
-
-    for item in os.listdir(OUTPUTS_DIR):
-        item_path = os.path.join(OUTPUTS_DIR, item)
-        
-        # Skip queue_state.json
-        if item == "queue_state.json":
-            continue
-            
+    for name, job in (
+        ("asr_cache", asr_cache.enforce),
+        ("upload_sessions", resumable_uploads.expire_sessions),
+        ("retention", lambda: retention.run(max_age_hours)),
+    ):
         try:
-            if os.path.isfile(item_path):
-                mtime = datetime.fromtimestamp(os.path.getmtime(item_path))
-                if mtime < cutoff:
-                    os.remove(item_path)
-                    print(f"Deleted old file: {item_path}")
-            
-            elif os.path.isdir(item_path):
-                if item == "asr_cache":
-                    # Clean inside asr_cache
-                    for cache_file in os.listdir(item_path):
-                        cache_path = os.path.join(item_path, cache_file)
-                        if os.path.isfile(cache_path):
-                            mtime = datetime.fromtimestamp(os.path.getmtime(cache_path))
-                            if mtime < cutoff:
-                                os.remove(cache_path)
-                                print(f"Deleted old cache file: {cache_path}")
-                else:
-                    # Task directory: check mtime of the directory itself
-                    mtime = datetime.fromtimestamp(os.path.getmtime(item_path))
-                    if mtime < cutoff:
-                        shutil.rmtree(item_path)
-                        print(f"Deleted old task directory: {item_path}")
+            job()
         except Exception as e:
-            print(f"Error cleaning {item_path}: {e}")
-    
+            print(f"Error cleaning {name}: {e}")
+
     # Also cleanup old tasks in queue
     burn_queue.cleanup_old_tasks(max_age_hours)
 
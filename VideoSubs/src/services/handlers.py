@@ -4,10 +4,22 @@ from typing import Optional
 from src.tools.subtitle_tools import (
     asr_transcribe_video, probe_media, run_ffmpeg_burn
 )
+from src.services.asr_cache import asr_cache
+from src.services.hls import package_hls
+from src.services.object_storage import object_store
+from src.services.retention import OUTPUTS, retention
+from src.services.storage import digest_for_path, ensure_local
+from src.utils.single_flight import SingleFlight
+
+# 按 ASR 缓存 key 合并进行中的转写
+asr_flight = SingleFlight("asr")
 
 # --- Task Handlers ---
-def burn_task_handler(media_path: str, ass_path: str, task_dir: str, progress_callback=None):
+def burn_task_handler(media_path: str, ass_path: str, task_dir: str, progress_callback=None,
+                      output_mode: Optional[str] = None):
     try:
+        # 其他节点上传的媒体经对象存储取回（read-through 缓存，同一内容只下载一次）
+        media_path = ensure_local(media_path)
         # 探测视频信息
         media_info = probe_media.invoke({"media_path": media_path})
         print(f"[BURN-HANDLER] probe_media called with: {media_path}")
@@ -22,17 +34,60 @@ def burn_task_handler(media_path: str, ass_path: str, task_dir: str, progress_ca
             media_path=media_path, 
             ass_path=ass_path, 
             task_dir=task_dir,
-            progress_callback=progress_callback
+            progress_callback=progress_callback,
+            output_mode=output_mode
         )
         
-        return {"output_path": result}
+        # 成品摘要作为下载的强 ETag，在此计算避免首次下载时阻塞
+        output = {"output_path": result, "sha256": digest_for_path(result)}
+        # 更新任务目录大小，供按预算淘汰
+        retention.track(task_dir, OUTPUTS)
+        if object_store.remote:
+            # 上传成品，任何节点都能通过预签名链接提供下载
+            key = f"outputs/{os.path.basename(os.path.normpath(task_dir))}/{os.path.basename(result)}"
+            object_store.put_file(key, result)
+            output["object_key"] = key
+        return output
     except Exception as e:
         raise e
 
-def asr_task_handler(media_path: str, model_size: str, lang: Optional[str] = None):
-    """ASR 异步任务处理器"""
-    print(f"Starting ASR task for {media_path} with model {model_size}")
-    result = asr_transcribe_video.invoke({"media_path": media_path, "model_size": model_size, "lang": lang})
-    if hasattr(result, "dict"):
-        result = result.dict()
+def hls_task_handler(media_path: str, out_dir: str, subtitle_doc: Optional[dict] = None):
+    """HLS 打包任务（流复制，附带 WebVTT 字幕轨）"""
+    result = package_hls(ensure_local(media_path), out_dir, subtitle_doc)
+    retention.track(os.path.dirname(os.path.normpath(out_dir)), OUTPUTS)
     return result
+
+def asr_task_handler(media_path: str, model_size: str, lang: Optional[str] = None,
+                     refine_model_size: Optional[str] = None, backend: Optional[str] = None,
+                     cache_key: Optional[str] = None):
+    """
+    ASR 任务处理器（队列任务与同步请求共用）
+
+    提供 cache_key 时，相同 key 的并发调用只转写一次（single-flight），
+    结果写入 asr_cache；返回的字典在调用者间共享，不要原地修改。
+    """
+    def _run():
+        if cache_key:
+            cached = asr_cache.get(cache_key)
+            if cached is not None:
+                # 排队期间已由其他请求完成
+                return cached
+
+        print(f"Starting ASR task for {media_path} with model {model_size}")
+        result = asr_transcribe_video.invoke({"media_path": ensure_local(media_path), "model_size": model_size, "lang": lang,
+                                              "refine_model_size": refine_model_size, "backend": backend})
+        # SubtitleDoc 或 CompactSubtitleDoc，缓存与 API 使用字典
+        if hasattr(result, "model_dump"):
+            result = result.model_dump()
+
+        if cache_key:
+            try:
+                asr_cache.put(cache_key, result)
+                print(f"ASR result cached: {cache_key}")
+            except Exception as e:
+                print(f"Failed to cache ASR result: {e}")
+        return result
+
+    if not cache_key:
+        return _run()
+    return asr_flight.do(cache_key, _run)
@@ -0,0 +1,183 @@
+"""
+HLS 打包 - 将烧录成品或原始视频切成 fMP4 分片，附带分段 WebVTT 软字幕轨
+与 final_soft_mux 相同采用流复制：编码为 H.264/HEVC + AAC/MP3 等 HLS 兼容格式时不重新编码，
+其他编码（如 VP9 / Opus）才转码。字幕分片与视频分片按相同时长对齐。
+
+输出目录结构:
+    master.m3u8          主播放列表（含 SUBTITLES 分组）
+    video.m3u8           视频播放列表（ffmpeg 生成），init.mp4 + video_00000.m4s ...
+    subs.m3u8            字幕播放列表，subs_00000.vtt ...
+
+配置:
+    HLS_SEGMENT_SECONDS  目标分片时长（默认 6 秒；流复制时分片在关键帧处切分）
+"""
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.services.storage import probe_file
+from src.utils.subtitle_export import vtt_time
+
+_CREATE_NO_WINDOW = 0x08000000 if sys.platform == "win32" else 0
+
+SEGMENT_SECONDS = float(os.environ.get("HLS_SEGMENT_SECONDS", 6))
+COPY_VIDEO_CODECS = {"h264", "hevc"}
+COPY_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3"}
+
+MASTER_PLAYLIST = "master.m3u8"
+VIDEO_PLAYLIST = "video.m3u8"
+SUBTITLE_PLAYLIST = "subs.m3u8"
+
+
+def parse_media_playlist(text: str) -> List[Tuple[float, str]]:
+    """解析媒体播放列表，返回 [(时长, 分片 URI)]"""
+    segments, duration = [], None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((duration, line))
+            duration = None
+    return segments
+
+
+def segment_webvtt(events: Sequence[Dict[str, Any]], durations: Sequence[float],
+                   start_time: float = 0.0) -> List[str]:
+    """
+    按分片时长切分 WebVTT：跨越分片边界的字幕在每个相交的分片中重复出现（HLS 规范要求），
+    时间戳保持为全局时间
+
+    Args:
+        start_time: 第一个视频分片的起始 PTS（秒）；流复制时保留输入的起始时间戳，
+            X-TIMESTAMP-MAP 将字幕的 0 点映射到该 PTS（90kHz）
+    """
+    timestamp_map = f"X-TIMESTAMP-MAP=MPEGTS:{round(start_time * 90000)},LOCAL:00:00:00.000"
+    ordered = sorted((ev for ev in events if ev["end"] > ev["start"]), key=lambda ev: ev["start"])
+    segments, offset, first = [], 0.0, 0
+    for duration in durations:
+        seg_start, seg_end = offset, offset + duration
+        # 已结束的字幕不再参与后续分片
+        while first < len(ordered) and ordered[first]["end"] <= seg_start:
+            first += 1
+        lines = ["WEBVTT", timestamp_map, ""]
+        for ev in ordered[first:]:
+            if ev["start"] >= seg_end:
+                break
+            if ev["end"] <= seg_start:
+                continue
+            lines.append(f"{vtt_time(ev['start'])} --> {vtt_time(ev['end'])}")
+            # 空行会提前结束 cue
+            lines.append("\n".join(line for line in ev["text"].replace("-->", "->").splitlines() if line.strip()))
+            lines.append("")
+        segments.append("\n".join(lines) + "\n")
+        offset = seg_end
+    return segments
+
+
+def media_playlist(segments: Sequence[Tuple[float, str]]) -> str:
+    target = max((int(-(-d // 1)) for d, _ in segments), default=1)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", f"#EXT-X-TARGETDURATION:{target}",
+             "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+    for duration, uri in segments:
+        lines += [f"#EXTINF:{duration:.6f},", uri]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def master_playlist(bandwidth: int, resolution: Optional[Tuple[int, int]] = None,
+                    subtitles: Optional[Dict[str, str]] = None) -> str:
+    """
+    Args:
+        subtitles: {"name", "language"}，为 None 时不带字幕轨
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    stream = f"#EXT-X-STREAM-INF:BANDWIDTH={max(int(bandwidth), 1)}"
+    if resolution and all(resolution):
+        stream += f",RESOLUTION={resolution[0]}x{resolution[1]}"
+    if subtitles is not None:
+        language = subtitles.get("language")
+        lines.append(
+            f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="{subtitles.get("name") or language or "Subtitles"}",'
+            + (f'LANGUAGE="{language}",' if language else "")
+            + f'DEFAULT=YES,AUTOSELECT=YES,URI="{SUBTITLE_PLAYLIST}"')
+        stream += ',SUBTITLES="subs"'
+    lines += [stream, VIDEO_PLAYLIST]
+    return "\n".join(lines) + "\n"
+
+
+def _codec_args(info: Dict[str, Any], segment_seconds: float) -> Tuple[List[str], bool]:
+    """流复制或转码参数，返回 (参数, 视频是否流复制)"""
+    codecs = {s.get("codec_type"): s.get("codec_name") for s in reversed(info.get("streams", []))}
+    copy_video = codecs.get("video") in COPY_VIDEO_CODECS
+    args = ["-c:v", "copy"] if copy_video else [
+        "-c:v", "libx264", "-crf", "23", "-preset", "fast",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds:g})",
+    ]
+    if codecs.get("audio"):
+        args += ["-c:a", "copy"] if codecs["audio"] in COPY_AUDIO_CODECS else ["-c:a", "aac", "-b:a", "128k"]
+    return args, copy_video
+
+
+def package_hls(media_path: str, out_dir: str, subtitle_doc: Optional[Dict[str, Any]] = None,
+                segment_seconds: float = SEGMENT_SECONDS) -> Dict[str, Any]:
+    """
+    打包 HLS 到 out_dir
+
+    Args:
+        subtitle_doc: SubtitleDoc 字典，提供时生成 WebVTT 字幕轨
+    Returns:
+        {"master": 主播放列表路径, "segments", "duration", "stream_copy", "subtitles"}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    info = probe_file(media_path)
+    codec_args, stream_copy = _codec_args(info, segment_seconds)
+    cmd = [
+        "ffmpeg", "-y", "-i", os.path.abspath(media_path),
+        "-map", "0:v:0", "-map", "0:a:0?", *codec_args,
+        "-f", "hls", "-hls_time", f"{segment_seconds:g}", "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", os.path.join(out_dir, "video_%05d.m4s"),
+        os.path.join(out_dir, VIDEO_PLAYLIST),
+    ]
+    print(f"Running FFmpeg: {' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                            creationflags=_CREATE_NO_WINDOW)
+    with open(os.path.join(out_dir, "ffmpeg.log"), "w", encoding="utf-8") as lf:
+        lf.write(result.stderr or "")
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+
+    with open(os.path.join(out_dir, VIDEO_PLAYLIST), "r", encoding="utf-8") as f:
+        segments = parse_media_playlist(f.read())
+    durations = [d for d, _ in segments]
+    # 转码时输出从 0 开始；流复制沿用输入的起始时间戳
+    start_time = info.get("start_time", 0.0) if stream_copy else 0.0
+
+    subtitles = None
+    if subtitle_doc is not None:
+        vtt_segments = []
+        for i, text in enumerate(segment_webvtt(subtitle_doc.get("events") or [], durations, start_time)):
+            name = f"subs_{i:05d}.vtt"
+            with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+            vtt_segments.append((durations[i], name))
+        with open(os.path.join(out_dir, SUBTITLE_PLAYLIST), "w", encoding="utf-8") as f:
+            f.write(media_playlist(vtt_segments))
+        subtitles = {"language": subtitle_doc.get("language")}
+
+    # 峰值码率：单个分片的最大 比特数 / 时长
+    bandwidth = max((os.path.getsize(os.path.join(out_dir, uri)) * 8 / d for d, uri in segments if d > 0), default=0)
+    video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), {})
+    master = os.path.join(out_dir, MASTER_PLAYLIST)
+    with open(master, "w", encoding="utf-8") as f:
+        f.write(master_playlist(int(bandwidth), (video.get("width"), video.get("height")), subtitles))
+
+    return {
+        "master": master,
+        "segments": len(segments),
+        "duration": sum(durations),
+        "stream_copy": stream_copy,
+        "subtitles": subtitles is not None,
+    }
@@ -0,0 +1,311 @@
+"""
+上传后的后台预处理（ingest）- 在用户点击“转写”之前完成准备工作
+上传完成后按内容摘要依次执行以下步骤，产物缓存在 OUTPUTS_DIR/artifacts/<sha256>/，
+相同内容只处理一次，重复上传直接命中：
+
+    probe      ffprobe 媒体信息（probe.json，同时写入媒体存储索引）
+    audio      16kHz 单声道 PCM（audio.npy，与 utils/audio.load_pcm 共用，转写时无需再解码）
+    peaks      波形峰值金字塔（peaks/，见 services/waveform.py）
+    thumbnail  封面缩略图（thumbnail.jpg，纯音频文件跳过）
+    sprite     时间轴预览雪碧图与 WebVTT 索引（sprite/，见 services/thumbnails.py，纯音频文件跳过）
+    language   语言检测（language.json，未指定语言的转写直接使用；ASR 后端不可用时跳过）
+    scenes     镜头切点索引（scenes.npy，见 services/scenes.py，转写结果据此吸附；纯音频文件跳过）
+
+配置:
+    INGEST_ON_UPLOAD       上传完成后自动预处理（config.py，默认关闭；也可调用 POST /api/files/{uuid}/ingest）
+    INGEST_WORKERS         后台预处理线程数（默认 1）
+    INGEST_LANGUAGE_MODEL  语言检测使用的模型（默认 WHISPER_MODEL）
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import src.config as _config
+from src.services.retention import CACHES, retention
+from src.utils.single_flight import SingleFlight
+
+try:
+    from prometheus_client import Counter, Histogram
+    PROMETHEUS_AVAILABLE = True
+    METRIC_STEPS = Counter('ingest_steps_total', 'Ingest steps by outcome', ['step', 'result'])
+    METRIC_STEP_SECONDS = Histogram('ingest_step_seconds', 'Ingest step duration', ['step'])
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+ARTIFACTS_DIR = "artifacts"
+PROBE_ARTIFACT = "probe.json"
+PCM_ARTIFACT = "audio.npy"
+PEAKS_ARTIFACT = "peaks"
+THUMBNAIL_ARTIFACT = "thumbnail.jpg"
+SPRITE_ARTIFACT = "sprite"
+SCENES_ARTIFACT = "scenes.npy"
+LANGUAGE_ARTIFACT = "language.json"
+
+# 语言检测概率低于此值时转写仍由模型自行判断
+LANGUAGE_MIN_PROBABILITY = 0.5
+# 语言检测只在文件开头这段时长内找第一段语音，按块转换并检测，找到即停
+LANGUAGE_SCAN_SECONDS = 600
+LANGUAGE_SCAN_CHUNK_SECONDS = 60
+
+
+class StepSkipped(Exception):
+    """步骤不适用（纯音频没有缩略图）或依赖不可用（未安装 ASR 后端）"""
+
+
+def artifact_dir(digest: str) -> str:
+    return os.path.join(_config.OUTPUTS_DIR, ARTIFACTS_DIR, digest)
+
+
+def artifact_path(digest: str, name: str) -> str:
+    return os.path.join(artifact_dir(digest), name)
+
+
+def _atomic_write(dest: str, write: Callable[[Any], None], mode: str = "wb"):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **({"encoding": "utf-8"} if "b" not in mode else {})) as f:
+            write(f)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def cached_language(digest: str) -> Optional[Dict[str, Any]]:
+    """预处理检测到的语言 {"language", "probability"}，没有时返回 None"""
+    try:
+        with open(artifact_path(digest, LANGUAGE_ARTIFACT), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def language_hint(media_path: str) -> Optional[str]:
+    """转写未指定语言时使用的预检测结果（概率不足时返回 None，由模型自行检测）"""
+    from src.services.storage import digest_for_path
+
+    detected = cached_language(digest_for_path(media_path))
+    if detected and detected.get("probability", 0) >= LANGUAGE_MIN_PROBABILITY:
+        return detected["language"]
+    return None
+
+
+# (步骤名, 产物文件名, 依赖的步骤)
+Step = Tuple[str, str, Tuple[str, ...]]
+
+
+class IngestPipeline:
+    STEPS: List[Step] = [
+        ("probe", PROBE_ARTIFACT, ()),
+        ("audio", PCM_ARTIFACT, ()),
+        ("peaks", PEAKS_ARTIFACT, ("audio",)),
+        ("thumbnail", THUMBNAIL_ARTIFACT, ("probe",)),
+        ("sprite", SPRITE_ARTIFACT, ("probe",)),
+        ("language", LANGUAGE_ARTIFACT, ("audio",)),
+        # 需要完整解码视频，放在最后
+        ("scenes", SCENES_ARTIFACT, ("probe",)),
+    ]
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._flight = SingleFlight("ingest")
+        self._lock = threading.Lock()
+        # digest -> {步骤: (状态, 说明)}，只记录未产出产物的结果（失败 / 跳过 / 进行中）
+        self._state: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {}
+
+    # ---- 各步骤：产物写入 dest ----
+    def _probe(self, ctx: Dict[str, Any], dest: str):
+        from src.services.storage import media_store
+
+        meta = media_store.media_info(ctx["uuid"])
+        _atomic_write(dest, lambda f: json.dump(meta, f, ensure_ascii=False), "w")
+
+    def _audio(self, ctx: Dict[str, Any], dest: str):
+        from src.utils.audio import load_pcm_int16
+
+        # load_pcm 的缓存即此产物
+        load_pcm_int16(ctx["path"])
+
+    def _peaks(self, ctx: Dict[str, Any], dest: str):
+        from src.services.waveform import build_pyramid
+
+        build_pyramid(np.load(artifact_path(ctx["digest"], PCM_ARTIFACT), mmap_mode="r"), dest)
+
+    def _thumbnail(self, ctx: Dict[str, Any], dest: str):
+        from src.services.thumbnails import extract_poster
+
+        meta = self._load_probe(ctx["digest"])
+        if not meta.get("width"):
+            raise StepSkipped("no video stream")
+        extract_poster(ctx["path"], dest, meta)
+
+    def _sprite(self, ctx: Dict[str, Any], dest: str):
+        from src.services.thumbnails import generate_sprite
+
+        meta = self._load_probe(ctx["digest"])
+        if not meta.get("width"):
+            raise StepSkipped("no video stream")
+        generate_sprite(ctx["path"], dest, meta)
+
+    def _language(self, ctx: Dict[str, Any], dest: str):
+        from src.services.asr_pool import asr_pool
+        from src.utils.asr_scheduler import WINDOW_SAMPLES
+        from src.utils.vad import detect_speech, vad_enabled
+
+        pcm_path = artifact_path(ctx["digest"], PCM_ARTIFACT)
+        pcm = np.load(pcm_path, mmap_mode="r")
+        # 从第一段语音开始检测，片头音乐 / 静音不影响结果
+        offset = self._first_speech(pcm, detect_speech) if vad_enabled() else 0
+        model_size = os.environ.get("INGEST_LANGUAGE_MODEL") or os.environ.get("WHISPER_MODEL", "base")
+        if asr_pool.enabled:
+            # 模型只在 ASR 工作进程中加载，API 进程只传 PCM 路径
+            detected = asr_pool.detect_language(pcm_path, offset, model_size)
+            language, probability = detected["language"], detected["probability"]
+        else:
+            # 只转换用到的一个窗口，不读入整条音轨
+            audio = np.asarray(pcm[offset:offset + WINDOW_SAMPLES], dtype=np.float32) / 32768.0
+            try:
+                from src.services.asr_backends import get_backend
+                language, probability = get_backend().detect_language(audio, model_size)
+            except ImportError as e:
+                raise StepSkipped(f"ASR backend unavailable: {e}")
+        result = {"language": language, "probability": probability, "model": model_size}
+        _atomic_write(dest, lambda f: json.dump(result, f), "w")
+
+    @staticmethod
+    def _first_speech(pcm: np.ndarray, detect_speech: Callable[[np.ndarray], List[Tuple[int, int]]]) -> int:
+        """开头 LANGUAGE_SCAN_SECONDS 内第一段语音的起点（采样），没有语音时为 0"""
+        from src.utils.asr_scheduler import SAMPLE_RATE
+
+        chunk = LANGUAGE_SCAN_CHUNK_SECONDS * SAMPLE_RATE
+        for start in range(0, min(len(pcm), LANGUAGE_SCAN_SECONDS * SAMPLE_RATE), chunk):
+            speech = detect_speech(np.asarray(pcm[start:start + chunk], dtype=np.float32) / 32768.0)
+            if speech:
+                return start + speech[0][0]
+        return 0
+
+    def _scenes(self, ctx: Dict[str, Any], dest: str):
+        from src.services.scenes import detect_cuts, save_cuts
+
+        if not self._load_probe(ctx["digest"]).get("width"):
+            raise StepSkipped("no video stream")
+        save_cuts(detect_cuts(ctx["path"]), dest)
+
+    @staticmethod
+    def _load_probe(digest: str) -> Dict[str, Any]:
+        with open(artifact_path(digest, PROBE_ARTIFACT), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ---- 编排 ----
+    def _set_state(self, digest: str, step: str, state: Optional[str], detail: Optional[str] = None):
+        with self._lock:
+            steps = self._state.setdefault(digest, {})
+            if state is None:
+                steps.pop(step, None)
+            else:
+                steps[step] = (state, detail)
+
+    def _run(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        from src.services.storage import media_store
+
+        digest = record["sha256"]
+        ctx = {"uuid": record["uuid"], "digest": digest, "path": media_store.ensure_local(record["path"])}
+        os.makedirs(artifact_dir(digest), exist_ok=True)
+        done = set()
+        for name, artifact, requires in self.STEPS:
+            dest = artifact_path(digest, artifact)
+            if os.path.exists(dest):
+                done.add(name)
+                continue
+            missing = [r for r in requires if r not in done]
+            if missing:
+                self._set_state(digest, name, "skipped", f"requires {', '.join(missing)}")
+                continue
+            self._set_state(digest, name, "running")
+            start = time.time()
+            try:
+                getattr(self, f"_{name}")(ctx, dest)
+            except StepSkipped as e:
+                self._set_state(digest, name, "skipped", str(e))
+                result = "skipped"
+            except Exception as e:
+                print(f"Ingest step {name} failed for {digest[:12]}: {e}")
+                self._set_state(digest, name, "failed", str(e))
+                result = "failed"
+            else:
+                self._set_state(digest, name, None)
+                done.add(name)
+                result = "done"
+            if PROMETHEUS_AVAILABLE:
+                METRIC_STEPS.labels(step=name, result=result).inc()
+                METRIC_STEP_SECONDS.labels(step=name).observe(time.time() - start)
+        retention.track(artifact_dir(digest), CACHES, ref=digest)
+        print(f"Ingest finished for {record['uuid']} ({digest[:12]}): {', '.join(sorted(done)) or 'nothing'} ready")
+        return self.status(record["uuid"])
+
+    def run(self, file_uuid: str) -> Optional[Dict[str, Any]]:
+        """同步执行预处理（已有的产物跳过），返回状态；相同内容的并发调用合并为一次"""
+        from src.services.storage import media_store
+
+        record = media_store.get(file_uuid)
+        if record is None:
+            return None
+        return self._flight.do(record["sha256"], lambda: self._run(record))
+
+    def submit(self, file_uuid: str) -> Future:
+        """提交到后台线程池"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        future = self._executor.submit(self.run, file_uuid)
+
+        def _log_error(f: Future):
+            if f.exception() is not None:
+                print(f"Ingest failed for {file_uuid}: {f.exception()}")
+
+        future.add_done_callback(_log_error)
+        return future
+
+    def status(self, file_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        各步骤状态：done / running / failed / skipped / pending
+        以磁盘上的产物为准，失败与跳过原因只保存在本进程内存中
+        """
+        from src.services.storage import media_store
+
+        record = media_store.get(file_uuid)
+        if record is None:
+            return None
+        digest = record["sha256"]
+        with self._lock:
+            state = dict(self._state.get(digest, {}))
+        steps = {}
+        for name, artifact, _ in self.STEPS:
+            if os.path.exists(artifact_path(digest, artifact)):
+                steps[name] = {"status": "done"}
+            else:
+                status, detail = state.get(name, ("pending", None))
+                steps[name] = {"status": status, **({"detail": detail} if detail else {})}
+        return {
+            "uuid": file_uuid,
+            "sha256": digest,
+            "running": self._flight.in_flight(digest),
+            "steps": steps,
+            "language": cached_language(digest),
+        }
+
+
+# 全局预处理管线
+ingest_pipeline = IngestPipeline(workers=int(os.environ.get("INGEST_WORKERS", 1)))
@@ -0,0 +1,374 @@
+"""
+对象存储后端 - 本地文件系统与 S3 兼容服务（标准库实现的 SigV4 签名）
+支持分片上传、Range 读取与预签名下载链接；远程对象经本地 read-through 缓存，
+大文件在同一节点只下载一次。
+
+配置:
+    STORAGE_BACKEND   local（默认）/ s3
+    S3_ENDPOINT       如 http://127.0.0.1:9000（路径风格寻址）
+    S3_BUCKET / S3_REGION / S3_ACCESS_KEY / S3_SECRET_KEY
+"""
+import datetime
+import hashlib
+import hmac
+import http.client
+import os
+import shutil
+import tempfile
+import urllib.parse
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import src.config as _config
+from src.services.retention import CACHES, retention
+from src.utils.single_flight import SingleFlight
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+    METRIC_CACHE_FETCHES = Counter('object_cache_fetches_total', 'Read-through cache lookups', ['result'])
+    METRIC_BYTES_DOWNLOADED = Counter('object_bytes_downloaded_total', 'Bytes downloaded from object storage')
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+PART_SIZE = 8 * 1024 * 1024
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class ObjectNotFound(FileNotFoundError):
+    pass
+
+
+class ObjectStorageError(RuntimeError):
+    pass
+
+
+# ---- SigV4 ----
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return urllib.parse.quote(value, safe=safe)
+
+
+def canonical_query(params: List[Tuple[str, str]]) -> str:
+    return "&".join(f"{_quote(k)}={_quote(v)}" for k, v in sorted(params))
+
+
+def _signing_key(secret_key: str, date: str, region: str) -> bytes:
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for part in (date, region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    return key
+
+
+def sigv4_signature(secret_key: str, region: str, amz_date: str, method: str, path: str,
+                    query: List[Tuple[str, str]], headers: Dict[str, str], signed_headers: List[str],
+                    payload_hash: str) -> str:
+    """
+    计算 SigV4 签名（客户端签名与本地 S3 替身校验共用）
+
+    Args:
+        path: 已 URL 编码的路径
+        headers: 小写头名 -> 值，需包含 signed_headers 中的全部头
+    """
+    canonical_headers = "".join(f"{h}:{' '.join(headers[h].split())}\n" for h in signed_headers)
+    canonical_request = "\n".join([
+        method, path, canonical_query(query), canonical_headers, ";".join(signed_headers), payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    key = _signing_key(secret_key, amz_date[:8], region)
+    return hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+# ---- Backends ----
+
+class ObjectStore:
+    """对象存储接口；key 为以 / 分隔的相对路径"""
+    remote = False
+
+    def put_file(self, key: str, path: str):
+        raise NotImplementedError
+
+    def put_bytes(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """读取 [start, end]（含 end）字节，end 为 None 时读到末尾"""
+        raise NotImplementedError
+
+    def download(self, key: str, dest: str):
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """对象大小，不存在时返回 None"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def presign(self, key: str, expires: int = 3600, filename: Optional[str] = None) -> Optional[str]:
+        """
+        预签名下载链接；本地后端返回 None（由应用自身提供下载）
+
+        Args:
+            filename: 下载文件名（response-content-disposition）
+        """
+        return None
+
+
+class LocalObjectStore(ObjectStore):
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> str:
+        return self._root or os.path.join(_config.OUTPUTS_DIR, "objects")
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def _write(self, key: str, writer):
+        dest = self.path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def put_file(self, key: str, path: str):
+        def copy(f):
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, f, PART_SIZE)
+        self._write(key, copy)
+
+    def put_bytes(self, key: str, data: bytes):
+        self._write(key, lambda f: f.write(data))
+
+    def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        try:
+            with open(self.path(key), "rb") as f:
+                f.seek(start)
+                return f.read() if end is None else f.read(end - start + 1)
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def download(self, key: str, dest: str):
+        try:
+            shutil.copyfile(self.path(key), dest)
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ObjectStore(ObjectStore):
+    remote = True
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", timeout: float = 60.0):
+        url = urllib.parse.urlsplit(endpoint)
+        self.scheme = url.scheme or "http"
+        self.netloc = url.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.timeout = timeout
+
+    def _path(self, key: str) -> str:
+        return _quote(f"/{self.bucket}/{key}", safe="/-_.~")
+
+    def _connection(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+    def _request(self, method: str, key: str, query: Optional[List[Tuple[str, str]]] = None,
+                 body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+                 ok: Tuple[int, ...] = (200,)) -> http.client.HTTPResponse:
+        query = query or []
+        amz_date = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        payload_hash = hashlib.sha256(body).hexdigest() if body else _EMPTY_SHA256
+        all_headers = {k.lower(): v for k, v in (headers or {}).items()}
+        all_headers.update({"host": self.netloc, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+        signed = sorted(all_headers)
+        path = self._path(key)
+        signature = sigv4_signature(self.secret_key, self.region, amz_date, method, path,
+                                    query, all_headers, signed, payload_hash)
+        all_headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={';'.join(signed)}, Signature={signature}")
+
+        url = path + ("?" + canonical_query(query) if query else "")
+        conn = self._connection()
+        conn.request(method, url, body=body or None, headers=all_headers)
+        resp = conn.getresponse()
+        if resp.status == 404:
+            resp.read()
+            conn.close()
+            raise ObjectNotFound(key)
+        if resp.status not in ok:
+            detail = resp.read()[:500]
+            conn.close()
+            raise ObjectStorageError(f"S3 {method} {key} failed: {resp.status} {detail!r}")
+        return resp
+
+    def put_bytes(self, key: str, data: bytes):
+        self._request("PUT", key, body=data).read()
+
+    def put_file(self, key: str, path: str):
+        """小文件单次 PUT，大文件分片上传"""
+        if os.path.getsize(path) <= MULTIPART_THRESHOLD:
+            with open(path, "rb") as f:
+                self.put_bytes(key, f.read())
+            return
+
+        root = ET.fromstring(self._request("POST", key, query=[("uploads", "")]).read())
+        upload_id = next(el.text for el in root.iter() if el.tag.endswith("UploadId"))
+        parts = []
+        try:
+            with open(path, "rb") as f:
+                for number, chunk in enumerate(iter(lambda: f.read(PART_SIZE), b""), 1):
+                    resp = self._request("PUT", key, body=chunk,
+                                         query=[("partNumber", str(number)), ("uploadId", upload_id)])
+                    resp.read()
+                    parts.append((number, resp.getheader("ETag")))
+            body = "<CompleteMultipartUpload>" + "".join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in parts
+            ) + "</CompleteMultipartUpload>"
+            self._request("POST", key, body=body.encode("utf-8"), query=[("uploadId", upload_id)]).read()
+        except BaseException:
+            try:
+                self._request("DELETE", key, query=[("uploadId", upload_id)], ok=(200, 204)).read()
+            except Exception:
+                pass
+            raise
+
+    def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        return self._request("GET", key, headers={"Range": byte_range}, ok=(200, 206)).read()
+
+    def download(self, key: str, dest: str):
+        resp = self._request("GET", key)
+        with open(dest, "wb") as f:
+            shutil.copyfileobj(resp, f, PART_SIZE)
+        if PROMETHEUS_AVAILABLE:
+            METRIC_BYTES_DOWNLOADED.inc(os.path.getsize(dest))
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            resp = self._request("HEAD", key)
+        except ObjectNotFound:
+            return None
+        resp.read()
+        return int(resp.getheader("Content-Length", 0))
+
+    def delete(self, key: str):
+        try:
+            self._request("DELETE", key, ok=(200, 204)).read()
+        except ObjectNotFound:
+            pass
+
+    def presign(self, key: str, expires: int = 3600, filename: Optional[str] = None) -> str:
+        amz_date = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        query = [
+            ("X-Amz-Algorithm", "AWS4-HMAC-SHA256"),
+            ("X-Amz-Credential", f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request"),
+            ("X-Amz-Date", amz_date),
+            ("X-Amz-Expires", str(expires)),
+            ("X-Amz-SignedHeaders", "host"),
+        ]
+        if filename:
+            query.append(("response-content-disposition", f'attachment; filename="{filename}"'))
+        path = self._path(key)
+        signature = sigv4_signature(self.secret_key, self.region, amz_date, "GET", path, query,
+                                    {"host": self.netloc}, ["host"], UNSIGNED_PAYLOAD)
+        query.append(("X-Amz-Signature", signature))
+        return f"{self.scheme}://{self.netloc}{path}?{canonical_query(query)}"
+
+
+class ReadThroughCache:
+    """远程对象的本地缓存；并发请求同一对象时只下载一次"""
+
+    def __init__(self, store: ObjectStore, root: Optional[str] = None):
+        self.store = store
+        self._root = root
+        self._flight = SingleFlight("object_cache")
+
+    @property
+    def root(self) -> str:
+        return self._root or os.path.join(_config.OUTPUTS_DIR, "object_cache")
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def fetch(self, key: str) -> str:
+        """返回对象的本地路径，本地没有时下载"""
+        if isinstance(self.store, LocalObjectStore):
+            return self.store.path(key)
+        dest = self.local_path(key)
+        if os.path.exists(dest):
+            if PROMETHEUS_AVAILABLE:
+                METRIC_CACHE_FETCHES.labels(result="hit").inc()
+            retention.touch(dest)
+            return dest
+
+        def _download():
+            if os.path.exists(dest):
+                return dest
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+            os.close(fd)
+            try:
+                self.store.download(key, tmp)
+                os.replace(tmp, dest)
+                retention.track(dest, CACHES)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            return dest
+
+        if PROMETHEUS_AVAILABLE:
+            METRIC_CACHE_FETCHES.labels(result="miss").inc()
+        return self._flight.do(key, _download)
+
+
+def create_object_store() -> ObjectStore:
+    backend = os.environ.get("STORAGE_BACKEND", "local").lower()
+    if backend == "s3":
+        return S3ObjectStore(
+            endpoint=os.environ["S3_ENDPOINT"],
+            bucket=os.environ["S3_BUCKET"],
+            access_key=os.environ["S3_ACCESS_KEY"],
+            secret_key=os.environ["S3_SECRET_KEY"],
+            region=os.environ.get("S3_REGION", "us-east-1"),
+        )
+    if backend != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return LocalObjectStore()
+
+
+# 全局对象存储与本地缓存
+object_store = create_object_store()
+object_cache = ReadThroughCache(object_store)
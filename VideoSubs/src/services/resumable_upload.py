@@ -0,0 +1,219 @@
+"""
+可续传分块上传 - init / chunk / status / complete
+分块按偏移量寻址，可乱序、并行上传；每块可附 SHA-256 校验；
+会话元数据与已写入数据保存在 OUTPUTS_DIR/upload_sessions/<id>/，服务重启后仍可续传。
+完成后文件登记到 services/storage.py，返回与 /api/upload_file 相同的 uuid。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import src.config as _config
+from src.utils.content_id import file_digest
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+SESSION_TTL = int(os.environ.get("UPLOAD_SESSION_TTL", 24 * 3600))
+
+Range = Tuple[int, int]
+
+
+class UploadSessionError(ValueError):
+    pass
+
+
+class UploadSessionNotFound(UploadSessionError):
+    pass
+
+
+def _merge(ranges: List[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _missing(received: List[Range], size: int) -> List[Range]:
+    gaps, pos = [], 0
+    for start, end in received:
+        if start > pos:
+            gaps.append((pos, start))
+        pos = max(pos, end)
+    if pos < size:
+        gaps.append((pos, size))
+    return gaps
+
+
+class ResumableUploads:
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+        self._lock = threading.Lock()
+        self._session_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def root(self) -> str:
+        return self._root or os.path.join(_config.OUTPUTS_DIR, "upload_sessions")
+
+    def _dir(self, session_id: str) -> str:
+        if not session_id or not all(c in "0123456789abcdef" for c in session_id):
+            raise UploadSessionNotFound(session_id)
+        return os.path.join(self.root, session_id)
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(session_id, threading.Lock())
+
+    def _load(self, session_id: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self._dir(session_id), "session.json"), "r", encoding="utf-8") as f:
+                session = json.load(f)
+        except FileNotFoundError:
+            raise UploadSessionNotFound(session_id)
+        session["received"] = [tuple(r) for r in session["received"]]
+        return session
+
+    def _save(self, session: Dict[str, Any]):
+        path = os.path.join(self._dir(session["id"]), "session.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(session, f)
+        os.replace(tmp, path)
+
+    def init(self, filename: str, size: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+             sha256: Optional[str] = None) -> Dict[str, Any]:
+        """创建上传会话，预分配目标文件"""
+        if size < 0:
+            raise UploadSessionError("size must be >= 0")
+        chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+        session_id = uuid.uuid4().hex
+        session_dir = self._dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, "data.part"), "wb") as f:
+            f.truncate(size)
+        now = time.time()
+        session = {
+            "id": session_id,
+            "filename": os.path.basename(filename or "upload"),
+            "size": size,
+            "chunk_size": chunk_size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created": now,
+            "expires_at": now + SESSION_TTL,
+            "received": [],
+        }
+        self._save(session)
+        return self.status(session_id)
+
+    def write_chunk(self, session_id: str, offset: int, data: bytes,
+                    checksum: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在 offset 处写入一块数据；重复上传同一块是幂等的
+
+        Args:
+            checksum: 该块的 SHA-256（十六进制），不匹配时拒绝写入
+        """
+        session = self._load(session_id)
+        if time.time() > session["expires_at"]:
+            raise UploadSessionNotFound(session_id)
+        if offset < 0 or offset + len(data) > session["size"]:
+            raise UploadSessionError(f"Chunk [{offset}, {offset + len(data)}) outside file of {session['size']} bytes")
+        if len(data) > MAX_CHUNK_SIZE:
+            raise UploadSessionError(f"Chunk larger than {MAX_CHUNK_SIZE} bytes")
+        if checksum and hashlib.sha256(data).hexdigest() != checksum.lower():
+            raise UploadSessionError("Chunk checksum mismatch")
+
+        # 各块写入互不重叠的区域，可并行；只有元数据更新需要串行
+        try:
+            with open(os.path.join(self._dir(session_id), "data.part"), "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+        except FileNotFoundError:
+            # 会话在校验之后被完成或清理
+            raise UploadSessionNotFound(session_id)
+        with self._session_lock(session_id):
+            session = self._load(session_id)
+            session["received"] = _merge(session["received"] + [(offset, offset + len(data))])
+            session["expires_at"] = time.time() + SESSION_TTL
+            self._save(session)
+        return self._describe(session)
+
+    def _describe(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        received = sum(end - start for start, end in session["received"])
+        return {
+            "session_id": session["id"],
+            "filename": session["filename"],
+            "size": session["size"],
+            "chunk_size": session["chunk_size"],
+            "received_bytes": received,
+            "received": session["received"],
+            "missing": _missing(session["received"], session["size"]),
+            "expires_at": session["expires_at"],
+        }
+
+    def status(self, session_id: str) -> Dict[str, Any]:
+        return self._describe(self._load(session_id))
+
+    def complete(self, session_id: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """校验完整性后存入媒体存储，返回文件记录（含 uuid）"""
+        from src.services.storage import media_store
+
+        with self._session_lock(session_id):
+            session = self._load(session_id)
+            missing = _missing(session["received"], session["size"])
+            if missing:
+                raise UploadSessionError(f"Upload incomplete, missing {len(missing)} ranges")
+
+            part = os.path.join(self._dir(session_id), "data.part")
+            digest = file_digest(part)
+            expected = (sha256 or session.get("sha256") or "").lower()
+            if expected and digest != expected:
+                raise UploadSessionError("File checksum mismatch")
+
+            record = media_store.put_file(part, session["filename"], size=session["size"], digest=digest)
+            shutil.rmtree(self._dir(session_id), ignore_errors=True)
+        with self._lock:
+            self._session_locks.pop(session_id, None)
+        return record
+
+    def abort(self, session_id: str):
+        session_dir = self._dir(session_id)
+        if not os.path.isdir(session_dir):
+            raise UploadSessionNotFound(session_id)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        with self._lock:
+            self._session_locks.pop(session_id, None)
+
+    def expire_sessions(self) -> int:
+        """删除超过有效期仍未完成的会话，返回删除数"""
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        now = time.time()
+        for session_id in os.listdir(self.root):
+            try:
+                session = self._load(session_id)
+                expired = now > session["expires_at"]
+            except UploadSessionNotFound:
+                # 缺少元数据的残留目录
+                session_dir = os.path.join(self.root, session_id)
+                expired = os.path.isdir(session_dir) and now - os.path.getmtime(session_dir) > SESSION_TTL
+            except Exception:
+                expired = False
+            if expired:
+                shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+                removed += 1
+        if removed:
+            print(f"Expired {removed} abandoned upload sessions")
+        return removed
+
+
+# 全局上传会话管理器
+resumable_uploads = ResumableUploads()
@@ -0,0 +1,360 @@
+"""
+存储保留策略 - 按类别的字节预算 + LRU 淘汰，替代按 mtime 遍历 OUTPUTS_DIR 的清理方式
+索引（OUTPUTS_DIR/retention.db）记录每个受管条目的类别、大小与最后访问时间，
+写入方在创建/使用文件时登记（track / touch），定期任务只需查询索引即可决定淘汰对象；
+对账扫描只为索引中没有或已变化的条目计算大小。
+仍被任务队列（排队 / 处理中 / 重试中）或编辑历史引用的文件不会被淘汰。
+
+类别:
+    uploads  媒体存储中的上传文件（media/files/<uuid>）
+    caches   对象存储的本地 read-through 缓存（object_cache/）与上传预处理产物（artifacts/<sha256>/）；
+             ASR 结果缓存由 asr_cache 自行管理
+    outputs  任务目录与 OUTPUTS_DIR 顶层的零散输出文件，另受 max_age_hours 限制
+
+配置:
+    RETENTION_UPLOADS_MAX_BYTES / RETENTION_CACHES_MAX_BYTES / RETENTION_OUTPUTS_MAX_BYTES
+    各类别字节预算（0 表示不限）
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import src.config as _config
+
+try:
+    from prometheus_client import Counter, Gauge
+    PROMETHEUS_AVAILABLE = True
+    METRIC_RECLAIMED = Counter('retention_reclaimed_bytes_total', 'Bytes reclaimed by retention', ['storage_class'])
+    METRIC_EVICTIONS = Counter('retention_evictions_total', 'Entries evicted by retention', ['storage_class', 'reason'])
+    METRIC_BYTES = Gauge('retention_bytes', 'Bytes tracked by retention', ['storage_class'])
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+UPLOADS = "uploads"
+CACHES = "caches"
+OUTPUTS = "outputs"
+CLASSES = (UPLOADS, CACHES, OUTPUTS)
+
+INDEX_NAME = "retention.db"
+# OUTPUTS_DIR 下由各自模块管理、不作为输出条目的名称
+RESERVED = {
+    "queue_state.json", INDEX_NAME, f"{INDEX_NAME}-wal", f"{INDEX_NAME}-shm",
+    "asr_cache", "media", "upload_sessions", "object_cache", "objects", "artifacts",
+}
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        path TEXT PRIMARY KEY,
+        class TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        last_access REAL NOT NULL,
+        ref TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries(class, last_access)",
+)
+
+PinSource = Callable[[], Iterable[str]]
+
+
+def _entry_size(path: str) -> Tuple[int, int]:
+    """条目大小与 mtime_ns；目录递归求和"""
+    st = os.stat(path)
+    if not os.path.isdir(path):
+        return st.st_size, st.st_mtime_ns
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total, st.st_mtime_ns
+
+
+def queue_pins() -> Iterable[str]:
+    """任务队列中未结束任务引用的路径"""
+    from src.utils.task_queue import TaskStatus, burn_queue
+
+    active = (TaskStatus.QUEUED, TaskStatus.PROCESSING, TaskStatus.RETRYING)
+    for task in list(burn_queue.tasks.values()):
+        if task.status in active:
+            for value in task.kwargs.values():
+                if isinstance(value, str):
+                    yield value
+
+
+def history_pins() -> Iterable[str]:
+    """编辑历史引用的文件 uuid 与路径"""
+    import src.db as db_module
+    from src.db import VideoEditHistory
+
+    session = db_module.SessionLocal()
+    try:
+        rows = session.query(VideoEditHistory.file_uuid, VideoEditHistory.thumbnail_path,
+                             VideoEditHistory.subtitle_file, VideoEditHistory.output_file).all()
+    except Exception as e:
+        print(f"Retention: failed to read history pins: {e}")
+        return []
+    finally:
+        session.close()
+    return [value for row in rows for value in row if value]
+
+
+class RetentionManager:
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, root: Optional[str] = None,
+                 pin_sources: Optional[List[PinSource]] = None):
+        """
+        Args:
+            budgets: 类别 -> 字节预算，0 或缺省表示不限
+            root: 受管目录，默认 OUTPUTS_DIR（运行时解析）
+            pin_sources: 返回被引用路径或文件 uuid 的函数列表
+        """
+        self.budgets = dict(budgets or {})
+        self._root = root
+        self.pin_sources = [queue_pins, history_pins] if pin_sources is None else pin_sources
+        self._lock = threading.Lock()
+        self._initialized_root: Optional[str] = None
+        self.reclaimed: Dict[str, int] = {cls: 0 for cls in CLASSES}
+
+    @property
+    def root(self) -> str:
+        return self._root or _config.OUTPUTS_DIR
+
+    def _managed(self, path: str) -> Optional[str]:
+        """受管目录内的绝对路径，目录外返回 None（如测试中独立根目录的存储）"""
+        path = os.path.abspath(path)
+        return path if path.startswith(os.path.abspath(self.root) + os.sep) else None
+
+    def _connect(self) -> sqlite3.Connection:
+        root = self.root
+        os.makedirs(root, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(root, INDEX_NAME), timeout=30)
+        if self._initialized_root != root:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            conn.commit()
+            self._initialized_root = root
+        return conn
+
+    # ---- 写入方登记 ----
+    def track(self, path: str, storage_class: str, ref: Optional[str] = None, size: Optional[int] = None):
+        """登记（或更新）一个受管条目；size 缺省时按当前磁盘内容计算"""
+        if storage_class not in CLASSES:
+            raise ValueError(f"Unknown storage class: {storage_class}")
+        path = self._managed(path)
+        if path is None:
+            return
+        try:
+            measured, mtime_ns = _entry_size(path)
+        except FileNotFoundError:
+            return
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                "class = excluded.class, size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "last_access = excluded.last_access, ref = COALESCE(excluded.ref, entries.ref)",
+                (path, storage_class, measured if size is None else size, mtime_ns, time.time(), ref))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def touch(self, path: str):
+        """记录一次访问（LRU）"""
+        path = self._managed(path)
+        if path is None:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE entries SET last_access = ? WHERE path = ?", (time.time(), path))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def forget(self, path: str):
+        path = self._managed(path)
+        if path is None:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---- 对账扫描 ----
+    def _candidates(self) -> Iterable[Tuple[str, str, Optional[str]]]:
+        """磁盘上的受管条目 (path, class, ref)；只列目录，不读取内容"""
+        root = os.path.abspath(self.root)
+        if os.path.isdir(root):
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.name not in RESERVED and not entry.name.endswith(".tmp"):
+                        yield entry.path, OUTPUTS, None
+        files_dir = os.path.join(root, "media", "files")
+        if os.path.isdir(files_dir):
+            with os.scandir(files_dir) as it:
+                for entry in it:
+                    yield entry.path, UPLOADS, os.path.splitext(entry.name)[0]
+        cache_dir = os.path.join(root, "object_cache")
+        for dirpath, _, filenames in os.walk(cache_dir):
+            for name in filenames:
+                if not name.endswith(".tmp"):
+                    yield os.path.join(dirpath, name), CACHES, None
+        artifacts_dir = os.path.join(root, "artifacts")
+        if os.path.isdir(artifacts_dir):
+            with os.scandir(artifacts_dir) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        yield entry.path, CACHES, entry.name
+
+    def scan(self) -> int:
+        """
+        索引与磁盘对账：收录未登记条目、更新内容有变化的条目、删除已不存在的记录
+        已登记且 mtime 未变的条目不重新计算大小，返回新增或更新的条目数
+        """
+        conn = self._connect()
+        try:
+            known = {path: mtime_ns for path, mtime_ns in conn.execute("SELECT path, mtime_ns FROM entries")}
+            seen: Set[str] = set()
+            changed = 0
+            now = time.time()
+            for path, storage_class, ref in self._candidates():
+                seen.add(path)
+                try:
+                    if path in known and os.stat(path).st_mtime_ns == known[path]:
+                        continue
+                    size, mtime_ns = _entry_size(path)
+                except FileNotFoundError:
+                    continue
+                if path in known:
+                    conn.execute("UPDATE entries SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+                else:
+                    # 未登记的旧条目以 mtime 作为最后访问时间
+                    conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                 (path, storage_class, size, mtime_ns, min(mtime_ns / 1e9, now), ref))
+                changed += 1
+            for path in set(known) - seen:
+                conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            conn.commit()
+            return changed
+        finally:
+            conn.close()
+
+    # ---- 淘汰 ----
+    def _pinned(self) -> Set[str]:
+        """被引用的 uuid 与路径（含其上级目录，任务目录中有文件被引用时整个目录保留）"""
+        pins: Set[str] = set()
+        root = os.path.abspath(self.root)
+        for source in self.pin_sources:
+            try:
+                values = list(source())
+            except Exception as e:
+                print(f"Retention: pin source {getattr(source, '__name__', source)} failed: {e}")
+                continue
+            for value in values:
+                pins.add(value)
+                path = os.path.abspath(value)
+                while path.startswith(root + os.sep):
+                    pins.add(path)
+                    path = os.path.dirname(path)
+        return pins
+
+    def _remove(self, path: str, storage_class: str, ref: Optional[str]):
+        if storage_class == UPLOADS and ref:
+            from src.services.storage import media_store
+            if media_store.evict_local(ref):
+                return
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def enforce(self, max_age_hours: Optional[float] = None) -> Dict[str, Any]:
+        """
+        按预算淘汰最久未访问的条目；max_age_hours 给出时 outputs 类别中超龄的条目一并删除
+
+        Returns:
+            各类别删除的条目数与回收字节数
+        """
+        pins = self._pinned()
+        now = time.time()
+        report: Dict[str, Any] = {}
+        with self._lock:
+            conn = self._connect()
+            try:
+                for storage_class in CLASSES:
+                    rows = conn.execute(
+                        "SELECT path, size, last_access, ref FROM entries WHERE class = ? ORDER BY last_access ASC",
+                        (storage_class,)).fetchall()
+                    total = sum(row[1] for row in rows)
+                    budget = self.budgets.get(storage_class) or 0
+                    cutoff = now - max_age_hours * 3600 if max_age_hours and storage_class == OUTPUTS else None
+                    evicted, reclaimed = 0, 0
+                    for path, size, last_access, ref in rows:
+                        expired = cutoff is not None and last_access < cutoff
+                        over_budget = budget and total > budget
+                        if not (expired or over_budget):
+                            # 按最后访问时间升序，之后的条目既未超龄也无需再腾空间
+                            break
+                        if path in pins or (ref and ref in pins):
+                            continue
+                        self._remove(path, storage_class, ref)
+                        conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+                        total -= size
+                        evicted += 1
+                        reclaimed += size
+                        if PROMETHEUS_AVAILABLE:
+                            METRIC_EVICTIONS.labels(storage_class=storage_class,
+                                                    reason="age" if expired else "budget").inc()
+                    conn.commit()
+                    self.reclaimed[storage_class] += reclaimed
+                    if PROMETHEUS_AVAILABLE:
+                        METRIC_RECLAIMED.labels(storage_class=storage_class).inc(reclaimed)
+                        METRIC_BYTES.labels(storage_class=storage_class).set(total)
+                    if evicted:
+                        print(f"Retention evicted {evicted} {storage_class} entries, reclaimed {reclaimed} bytes")
+                    report[storage_class] = {"evicted": evicted, "reclaimed_bytes": reclaimed, "bytes": total}
+            finally:
+                conn.close()
+        return report
+
+    def run(self, max_age_hours: Optional[float] = None) -> Dict[str, Any]:
+        """对账后淘汰（由 cleanup_old_files 定期调用）"""
+        self.scan()
+        return self.enforce(max_age_hours)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            usage = {cls: (count, size) for cls, count, size in conn.execute(
+                "SELECT class, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY class")}
+        finally:
+            conn.close()
+        return {
+            cls: {
+                "entries": usage.get(cls, (0, 0))[0],
+                "bytes": usage.get(cls, (0, 0))[1],
+                "max_bytes": self.budgets.get(cls) or 0,
+                "reclaimed_bytes": self.reclaimed[cls],
+            }
+            for cls in CLASSES
+        }
+
+
+# 全局保留策略管理器
+retention = RetentionManager(budgets={
+    UPLOADS: int(os.environ.get("RETENTION_UPLOADS_MAX_BYTES", 20 * 1024 ** 3)),
+    CACHES: int(os.environ.get("RETENTION_CACHES_MAX_BYTES", 5 * 1024 ** 3)),
+    OUTPUTS: int(os.environ.get("RETENTION_OUTPUTS_MAX_BYTES", 10 * 1024 ** 3)),
+})
@@ -0,0 +1,261 @@
+"""
+本地 S3 兼容服务 - 开发与测试用的对象存储替身（目录存储，标准库实现）
+支持路径风格寻址下的 PUT / GET（含 Range）/ HEAD / DELETE、分片上传，
+并校验 SigV4 请求头签名与预签名链接，行为与 services/object_storage.py 的 S3 客户端对应。
+
+启动:
+    python -m src.services.s3_standin --root ./s3data --port 9000
+    STORAGE_BACKEND=s3 S3_ENDPOINT=http://127.0.0.1:9000 S3_BUCKET=videosubs \\
+    S3_ACCESS_KEY=standin S3_SECRET_KEY=standin-secret python app.py
+"""
+import argparse
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import shutil
+import threading
+import urllib.parse
+import uuid
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from src.services.object_storage import UNSIGNED_PAYLOAD, sigv4_signature
+
+_AUTH_RE = re.compile(r"AWS4-HMAC-SHA256 Credential=([^/]+)/(\d{8})/([^/]+)/s3/aws4_request, "
+                      r"SignedHeaders=([^,]+), Signature=([0-9a-f]+)")
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "S3StandIn"
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- helpers ----
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str):
+        self._send(status, f"<Error><Code>{code}</Code></Error>".encode("utf-8"),
+                   {"Content-Type": "application/xml"})
+
+    def _parse(self) -> Tuple[str, List[Tuple[str, str]], Optional[str], str]:
+        raw_path, _, raw_query = self.path.partition("?")
+        query = urllib.parse.parse_qsl(raw_query, keep_blank_values=True)
+        parts = urllib.parse.unquote(raw_path).lstrip("/").split("/", 1)
+        return raw_path, query, (parts[1] if len(parts) > 1 and parts[1] else None), parts[0]
+
+    def _authorized(self, raw_path: str, query: List[Tuple[str, str]], body: bytes) -> bool:
+        server = self.server
+        params = dict(query)
+        if "X-Amz-Signature" in params:
+            # 预签名链接
+            try:
+                access_key, date, region = params["X-Amz-Credential"].split("/")[:3]
+                amz_date = params["X-Amz-Date"]
+                issued = datetime.datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+                expired = datetime.datetime.now(datetime.timezone.utc) > issued + datetime.timedelta(
+                    seconds=int(params["X-Amz-Expires"]))
+            except (KeyError, ValueError):
+                return False
+            if access_key != server.access_key or expired:
+                return False
+            signed = params["X-Amz-SignedHeaders"].split(";")
+            unsigned_query = [(k, v) for k, v in query if k != "X-Amz-Signature"]
+            headers = {h: self.headers.get(h, "") for h in signed}
+            expected = sigv4_signature(server.secret_key, region, amz_date, self.command, raw_path,
+                                       unsigned_query, headers, signed, UNSIGNED_PAYLOAD)
+            return hmac.compare_digest(expected, params["X-Amz-Signature"])
+
+        match = _AUTH_RE.match(self.headers.get("Authorization", ""))
+        if not match:
+            return False
+        access_key, date, region, signed_headers, signature = match.groups()
+        payload_hash = self.headers.get("x-amz-content-sha256", "")
+        amz_date = self.headers.get("x-amz-date", "")
+        if access_key != server.access_key or not amz_date.startswith(date):
+            return False
+        if payload_hash != UNSIGNED_PAYLOAD and payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        signed = signed_headers.split(";")
+        headers = {h: self.headers.get(h, "") for h in signed}
+        expected = sigv4_signature(server.secret_key, region, amz_date, self.command, raw_path,
+                                   query, headers, signed, payload_hash)
+        return hmac.compare_digest(expected, signature)
+
+    def _handle(self):
+        raw_path, query, key, bucket = self._parse()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self._authorized(raw_path, query, body):
+            return self._error(403, "SignatureDoesNotMatch")
+        if bucket != self.server.bucket:
+            return self._error(404, "NoSuchBucket")
+        if key is None:
+            return self._error(400, "InvalidRequest")
+        try:
+            path = self.server.object_path(key)
+        except ValueError:
+            return self._error(400, "InvalidObjectName")
+        params = dict(query)
+
+        if self.command == "PUT" and "uploadId" in params:
+            part_dir = self.server.upload_dir(params["uploadId"])
+            if not os.path.isdir(part_dir):
+                return self._error(404, "NoSuchUpload")
+            with open(os.path.join(part_dir, f"{int(params['partNumber']):05d}"), "wb") as f:
+                f.write(body)
+            return self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if self.command == "PUT":
+            self.server.write_object(path, [body])
+            return self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+        if self.command == "POST" and "uploads" in params:
+            upload_id = uuid.uuid4().hex
+            os.makedirs(self.server.upload_dir(upload_id))
+            xml = (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                   f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+            return self._send(200, xml.encode("utf-8"), {"Content-Type": "application/xml"})
+        if self.command == "POST" and "uploadId" in params:
+            part_dir = self.server.upload_dir(params["uploadId"])
+            if not os.path.isdir(part_dir):
+                return self._error(404, "NoSuchUpload")
+            numbers = [int(el.text) for el in ET.fromstring(body).iter() if el.tag.endswith("PartNumber")]
+            files = [os.path.join(part_dir, f"{n:05d}") for n in numbers]
+            if not numbers or numbers != sorted(numbers) or not all(os.path.exists(p) for p in files):
+                return self._error(400, "InvalidPart")
+            self.server.write_object(path, files)
+            shutil.rmtree(part_dir, ignore_errors=True)
+            xml = f"<CompleteMultipartUploadResult><Key>{key}</Key></CompleteMultipartUploadResult>"
+            return self._send(200, xml.encode("utf-8"), {"Content-Type": "application/xml"})
+
+        if self.command == "DELETE":
+            if "uploadId" in params:
+                shutil.rmtree(self.server.upload_dir(params["uploadId"]), ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            return self._send(204)
+
+        if self.command in ("GET", "HEAD"):
+            if not os.path.isfile(path):
+                return self._error(404, "NoSuchKey")
+            size = os.path.getsize(path)
+            headers = {"Content-Type": "application/octet-stream", "Accept-Ranges": "bytes"}
+            if "response-content-disposition" in params:
+                headers["Content-Disposition"] = params["response-content-disposition"]
+            start, end, status = 0, size - 1, 200
+            match = _RANGE_RE.match(self.headers.get("Range", ""))
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                else:
+                    start = max(size - int(match.group(2)), 0)
+                if start >= size or start > end:
+                    return self._send(416, headers={"Content-Range": f"bytes */{size}"})
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            if self.command == "HEAD":
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(end - start + 1))
+                return self.end_headers()
+            with open(path, "rb") as f:
+                f.seek(start)
+                self._send(status, f.read(end - start + 1), headers)
+            return
+        self._error(405, "MethodNotAllowed")
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+
+class S3StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root: str, bucket: str = "videosubs", access_key: str = "standin",
+                 secret_key: str = "standin-secret", host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.root = os.path.abspath(root)
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(os.path.join(self.root, bucket), exist_ok=True)
+        os.makedirs(os.path.join(self.root, ".uploads"), exist_ok=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def object_path(self, key: str) -> str:
+        base = os.path.join(self.root, self.bucket)
+        path = os.path.abspath(os.path.join(base, *key.split("/")))
+        if not path.startswith(base + os.sep):
+            raise ValueError(key)
+        return path
+
+    def upload_dir(self, upload_id: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            return os.path.join(self.root, ".uploads", "invalid")
+        return os.path.join(self.root, ".uploads", upload_id)
+
+    def write_object(self, path: str, sources: List):
+        """原子写入对象；sources 为 bytes 或分片文件路径"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as out:
+            for src in sources:
+                if isinstance(src, bytes):
+                    out.write(src)
+                else:
+                    with open(src, "rb") as f:
+                        shutil.copyfileobj(f, out)
+        os.replace(tmp, path)
+
+    def start(self) -> "S3StandIn":
+        """后台线程运行（测试用）"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local S3-compatible stand-in")
+    parser.add_argument("--root", default="./s3data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--bucket", default="videosubs")
+    parser.add_argument("--access-key", default="standin")
+    parser.add_argument("--secret-key", default="standin-secret")
+    args = parser.parse_args(argv)
+
+    server = S3StandIn(args.root, args.bucket, args.access_key, args.secret_key, args.host, args.port)
+    print(f"S3 stand-in serving bucket '{args.bucket}' from {server.root} at {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
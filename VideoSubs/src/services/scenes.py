@@ -0,0 +1,163 @@
+"""
+镜头切换索引 - 字幕时间轴吸附到镜头切点
+每个媒体内容只检测一次：ffmpeg 在缩小到 160 像素宽的画面上做场景检测（select='gt(scene,T)'），
+切点时间排序后以 float64 数组保存在 artifacts/<sha256>/scenes.npy。
+查询最近切点为二分查找（O(log n)），转写完成后据此微调字幕边界：
+距切点不超过 SCENE_SNAP_SECONDS 的起止时间对齐到切点，避免字幕在切镜前后几帧内闪现或残留。
+
+配置:
+    SCENE_THRESHOLD      场景变化阈值（0~1，默认 0.3）
+    SCENE_SNAP_SECONDS   吸附距离（默认 0.25 秒，0 表示不吸附）
+"""
+import bisect
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.services.ingest import SCENES_ARTIFACT, artifact_dir, artifact_path
+from src.services.retention import CACHES, retention
+from src.utils.single_flight import SingleFlight
+
+_CREATE_NO_WINDOW = 0x08000000 if sys.platform == "win32" else 0
+
+SCENE_THRESHOLD = float(os.environ.get("SCENE_THRESHOLD", 0.3))
+SNAP_SECONDS = float(os.environ.get("SCENE_SNAP_SECONDS", 0.25))
+DETECT_WIDTH = 160
+# 吸附后字幕的最短时长，短于此值时保留原始时间
+MIN_EVENT_SECONDS = 0.3
+
+_PTS_TIME_RE = re.compile(r"pts_time:\s*(-?[0-9.]+)")
+
+_flight = SingleFlight("scenes")
+
+
+class SceneIndex:
+    """排序后的切点时间（秒）"""
+
+    def __init__(self, cuts: Sequence[float]):
+        self.cuts: List[float] = sorted(float(c) for c in cuts)
+
+    def __len__(self) -> int:
+        return len(self.cuts)
+
+    def nearest(self, t: float) -> Optional[float]:
+        """离 t 最近的切点，没有切点时返回 None"""
+        i = bisect.bisect_left(self.cuts, t)
+        candidates = self.cuts[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda c: abs(c - t)) if candidates else None
+
+    def before(self, t: float) -> Optional[float]:
+        """不晚于 t 的最后一个切点"""
+        i = bisect.bisect_right(self.cuts, t)
+        return self.cuts[i - 1] if i else None
+
+    def after(self, t: float) -> Optional[float]:
+        """晚于 t 的第一个切点"""
+        i = bisect.bisect_right(self.cuts, t)
+        return self.cuts[i] if i < len(self.cuts) else None
+
+    def between(self, start: float, end: float) -> List[float]:
+        return self.cuts[bisect.bisect_left(self.cuts, start):bisect.bisect_right(self.cuts, end)]
+
+    def snap(self, t: float, tolerance: float = SNAP_SECONDS) -> float:
+        cut = self.nearest(t)
+        return cut if cut is not None and abs(cut - t) <= tolerance else t
+
+
+def parse_showinfo(stderr: str) -> List[float]:
+    """从 showinfo 滤镜的输出中提取各帧 pts_time"""
+    return sorted({float(m.group(1)) for line in stderr.splitlines() if "Parsed_showinfo" in line
+                   for m in [_PTS_TIME_RE.search(line)] if m})
+
+
+def detect_cuts(media_path: str, threshold: float = SCENE_THRESHOLD) -> List[float]:
+    """低分辨率解码一遍，返回场景变化的时间点"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-i", os.path.abspath(media_path), "-map", "0:v:0",
+        "-an", "-sn", "-dn", "-vf", f"scale={DETECT_WIDTH}:-2,select='gt(scene,{threshold})',showinfo",
+        "-f", "null", "-",
+    ]
+    print(f"Running FFmpeg: {' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                            creationflags=_CREATE_NO_WINDOW)
+    if result.returncode != 0:
+        raise RuntimeError(f"Scene detection failed: {result.stderr[-500:]}")
+    return [t for t in parse_showinfo(result.stderr) if t > 0]
+
+
+def save_cuts(cuts: Sequence[float], dest: str):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.sort(np.asarray(cuts, dtype=np.float64)))
+    os.replace(tmp, dest)
+
+
+def load_index(digest: str) -> Optional[SceneIndex]:
+    """已构建的索引，尚未检测时返回 None"""
+    path = artifact_path(digest, SCENES_ARTIFACT)
+    if not os.path.exists(path):
+        return None
+    return SceneIndex(np.load(path).tolist())
+
+
+def index_for_path(media_path: str) -> Optional[SceneIndex]:
+    from src.services.storage import digest_for_path
+
+    return load_index(digest_for_path(media_path))
+
+
+def ensure_index(file_uuid: str) -> Optional[SceneIndex]:
+    """返回索引，尚未构建时检测（相同内容的并发请求只检测一次）；文件不存在或没有视频流时返回 None"""
+    from src.services.storage import get_file_path, media_store
+
+    record = media_store.get(file_uuid)
+    if record is None:
+        return None
+    index = load_index(record["sha256"])
+    if index is not None:
+        return index
+    meta = media_store.media_info(file_uuid)
+    if not meta or not meta.get("width"):
+        return None
+
+    def build():
+        dest = artifact_path(record["sha256"], SCENES_ARTIFACT)
+        if not os.path.exists(dest):
+            save_cuts(detect_cuts(get_file_path(file_uuid)), dest)
+            retention.track(artifact_dir(record["sha256"]), CACHES, ref=record["sha256"])
+        return load_index(record["sha256"])
+
+    return _flight.do(record["sha256"], build)
+
+
+def prefetch(file_uuid: str):
+    """后台构建切点索引（只做镜头检测，不走完整预处理流水线）；失败只记录日志"""
+    try:
+        ensure_index(file_uuid)
+    except Exception as e:
+        print(f"Scene detection failed for {file_uuid}: {e}")
+
+
+def snap_segments(segments: List[Dict[str, Any]], index: SceneIndex,
+                  tolerance: float = SNAP_SECONDS) -> List[Dict[str, Any]]:
+    """
+    将分段起止时间吸附到附近的切点（原地修改并返回）
+    吸附后不与上一段重叠、且不短于 MIN_EVENT_SECONDS，否则保留原始时间
+    """
+    if not len(index) or tolerance <= 0:
+        return segments
+    prev_end = float("-inf")
+    for seg in segments:
+        start, end = index.snap(seg["start"], tolerance), index.snap(seg["end"], tolerance)
+        if start < prev_end:
+            start = seg["start"]
+        if end - start >= MIN_EVENT_SECONDS:
+            seg["start"], seg["end"] = start, end
+        prev_end = seg["end"]
+    return segments
@@ -1,54 +1,374 @@
+"""
+媒体存储 - 内容寻址的 blob + SQLite 索引
+相同内容只存一份（media/blobs/<sha256 前两位>/<sha256>），每个上传 uuid 是指向 blob 的硬链接
+（media/files/<uuid><ext>），文件系统不支持硬链接时退化为复制。
+索引（media/index.db，WAL 模式）记录 uuid → blob 映射与探测到的媒体信息，重启后仍然有效，
+多个进程可同时读写。
+配置了远程对象存储（services/object_storage.py，STORAGE_BACKEND=s3）时，blob 同时上传到
+blobs/<sha256>，本节点缺失的文件在使用前经 read-through 缓存取回（ensure_local）。
+"""
+import json
 import os
-import uuid
 import shutil
-from typing import Optional
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
 from fastapi import UploadFile
-from src.config import OUTPUTS_DIR
 
-# File storage mapping: uuid -> file_path
-file_storage = {}
+import src.config as _config
+from src.services.object_storage import ObjectStore, ReadThroughCache, object_cache, object_store
+from src.services.retention import UPLOADS, retention
+from src.utils.content_id import copy_and_hash, file_digest, fingerprint
+
+_CREATE_NO_WINDOW = 0x08000000 if sys.platform == "win32" else 0
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        created REAL NOT NULL,
+        meta TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS files (
+        uuid TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+        filename TEXT NOT NULL,
+        path TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        created REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256)",
+    "CREATE INDEX IF NOT EXISTS idx_files_path ON files(path)",
+    """
+    CREATE TABLE IF NOT EXISTS path_digests (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL
+    )
+    """,
+)
+
+
+def probe_file(path: str) -> Dict[str, Any]:
+    """ffprobe 容器与各路流的基本信息"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration,start_time,format_name,bit_rate:stream=index,codec_name,codec_type,width,height,r_frame_rate,sample_rate,channels",
+        "-of", "json", os.path.abspath(path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True, encoding="utf-8",
+                            errors="replace", creationflags=_CREATE_NO_WINDOW)
+    info = json.loads(result.stdout)
+    fmt = info.get("format", {})
+    meta: Dict[str, Any] = {
+        "duration": float(fmt.get("duration", 0) or 0),
+        "start_time": float(fmt.get("start_time", 0) or 0),
+        "format": fmt.get("format_name"),
+        "bit_rate": int(fmt["bit_rate"]) if fmt.get("bit_rate") else None,
+        "streams": info.get("streams", []),
+    }
+    for stream in meta["streams"]:
+        if stream.get("codec_type") == "video" and "width" not in meta:
+            meta["width"], meta["height"] = stream.get("width"), stream.get("height")
+    return meta
+
+
+class MediaStore:
+    def __init__(self, root: Optional[str] = None, objects: Optional[ObjectStore] = None,
+                 cache: Optional[ReadThroughCache] = None):
+        """
+        Args:
+            root: 存储目录，默认 OUTPUTS_DIR/media（运行时解析）
+            objects: 对象存储后端，默认全局 object_store；仅远程后端会镜像 blob
+            cache: 远程 blob 的本地 read-through 缓存
+        """
+        self._root = root
+        self.objects = objects or object_store
+        self.cache = cache or (object_cache if self.objects is object_store else ReadThroughCache(self.objects))
+        self._initialized_root: Optional[str] = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def root(self) -> str:
+        return self._root or os.path.join(_config.OUTPUTS_DIR, "media")
+
+    def _connect(self) -> sqlite3.Connection:
+        root = self.root
+        if self._initialized_root != root:
+            with self._init_lock:
+                for sub in ("blobs", "files", "tmp"):
+                    os.makedirs(os.path.join(root, sub), exist_ok=True)
+                conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+                conn.commit()
+                conn.close()
+                self._initialized_root = root
+        conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    @staticmethod
+    def blob_key(digest: str) -> str:
+        return f"blobs/{digest}"
+
+    def _tmp_path(self) -> str:
+        self._connect().close()
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"), suffix=".part")
+        os.close(fd)
+        return tmp
+
+    @staticmethod
+    def _link(src: str, dest: str):
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy2(src, dest)
+
+    def _commit(self, tmp: str, filename: str, user_id: str, size: int, digest: str) -> Dict[str, Any]:
+        """将临时文件提交为 blob（内容已存在则丢弃）并为新 uuid 建立硬链接"""
+        blob = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            # os.link 不覆盖已存在的目标，多进程并发提交同一内容时只有一个生效
+            os.link(tmp, blob)
+        except FileExistsError:
+            pass
+        except OSError:
+            if not os.path.exists(blob):
+                os.replace(tmp, blob)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if self.objects.remote and self.objects.size(self.blob_key(digest)) is None:
+            self.objects.put_file(self.blob_key(digest), blob)
+
+        file_uuid = str(uuid.uuid4())
+        link = os.path.join(self.root, "files", f"{file_uuid}{os.path.splitext(filename or '')[1].lower()}")
+        self._link(blob, link)
+
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute("INSERT OR IGNORE INTO blobs (sha256, size, fingerprint, created) VALUES (?, ?, ?, ?)",
+                         (digest, size, fingerprint(blob), now))
+            conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                         (file_uuid, digest, os.path.basename(filename or "upload"), link, user_id, now))
+            conn.commit()
+        finally:
+            conn.close()
+        retention.track(link, UPLOADS, ref=file_uuid, size=size)
+        return self.get(file_uuid)
+
+    def put_stream(self, fileobj, filename: str, user_id: str = "default",
+                   max_size: Optional[int] = None) -> Dict[str, Any]:
+        """分块写入并同时计算 SHA-256；内容已存在时只新增一个硬链接"""
+        tmp = self._tmp_path()
+        size, digest = copy_and_hash(fileobj, tmp, max_size=max_size)
+        return self._commit(tmp, filename, user_id, size, digest)
+
+    def put_file(self, src_path: str, filename: str, user_id: str = "default", size: Optional[int] = None,
+                 digest: Optional[str] = None) -> Dict[str, Any]:
+        """将已写好的文件（如分块上传拼装结果）移入存储"""
+        tmp = self._tmp_path()
+        os.replace(src_path, tmp)
+        size = os.path.getsize(tmp) if size is None else size
+        return self._commit(tmp, filename, user_id, size, digest or file_digest(tmp))
+
+    def get(self, file_uuid: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT f.uuid, f.sha256, f.filename, f.path, f.user_id, f.created, b.size, b.fingerprint, b.meta "
+                "FROM files f JOIN blobs b ON b.sha256 = f.sha256 WHERE f.uuid = ?", (file_uuid,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        record = dict(row)
+        record["meta"] = json.loads(record["meta"]) if record["meta"] else None
+        return record
 
-def save_upload(file: UploadFile) -> str:
-    """保存上传文件到临时路径"""
-    uploads_dir = os.path.join(OUTPUTS_DIR)
-    os.makedirs(uploads_dir, exist_ok=True)
-    filename = os.path.basename(file.filename or "upload")
-    unique_name = f"{filename}"
-    dest_path = os.path.join(uploads_dir, unique_name)
-    with open(dest_path, "wb") as out_f:
+    def ensure_local(self, path: str) -> str:
+        """
+        确保存储中的文件在本节点可读（其他节点上传、或本地副本已被清理时）
+        从对象存储经 read-through 缓存取回 blob 并重建硬链接；非存储文件原样返回
+        """
+        if os.path.exists(path) or not self.objects.remote:
+            retention.touch(path)
+            return path
+        conn = self._connect()
         try:
-            shutil.copyfileobj(file.file, out_f)
+            row = conn.execute("SELECT sha256 FROM files WHERE path = ?", (path,)).fetchone()
         finally:
+            conn.close()
+        if row is None:
+            return path
+        blob = self._blob_path(row[0])
+        if not os.path.exists(blob):
+            fetched = self.cache.fetch(self.blob_key(row[0]))
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
             try:
-                file.file.seek(0)
-            except Exception:
+                self._link(fetched, blob)
+            except FileExistsError:
                 pass
-    return dest_path
+        try:
+            self._link(blob, path)
+        except FileExistsError:
+            pass
+        retention.track(path, UPLOADS, ref=os.path.splitext(os.path.basename(path))[0])
+        return path
 
-def save_upload_with_uuid(file: UploadFile, user_id: str) -> tuple[str, str]:
-    """保存上传文件并返回UUID"""
-    file_uuid = str(uuid.uuid4())
-    uploads_dir = os.path.join(OUTPUTS_DIR, "uploads", user_id)
-    os.makedirs(uploads_dir, exist_ok=True)
-    
-    # 保持原始文件扩展名
-    ext = os.path.splitext(file.filename or "")[1]
-    filename = f"{file_uuid}{ext}"
-    dest_path = os.path.join(uploads_dir, filename)
-    
-    with open(dest_path, "wb") as out_f:
-        try:
-            shutil.copyfileobj(file.file, out_f)
+    def digest_for_path(self, path: str) -> str:
+        """
+        文件内容的 SHA-256
+        存储中的文件直接查索引；其他文件（如任务输出）在大小与 mtime 未变时复用索引中的结果，
+        否则流式计算并记录，重启后仍然有效（下载 ETag 依赖此缓存）
+        """
+        abs_path = os.path.abspath(path)
+        st = os.stat(path)
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT sha256 FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                return row[0]
+            known = conn.execute("SELECT sha256 FROM path_digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+                                 (abs_path, st.st_size, st.st_mtime_ns)).fetchone()
+            if known:
+                return known[0]
         finally:
+            conn.close()
+        digest = file_digest(path)
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO path_digests VALUES (?, ?, ?, ?)",
+                         (abs_path, st.st_size, st.st_mtime_ns, digest))
+            conn.commit()
+        finally:
+            conn.close()
+        return digest
+
+    def media_info(self, file_uuid: str) -> Optional[Dict[str, Any]]:
+        """ffprobe 媒体信息，按内容缓存在索引中，同一内容只探测一次"""
+        record = self.get(file_uuid)
+        if record is None:
+            return None
+        if record["meta"] is None:
+            meta = probe_file(self.ensure_local(record["path"]))
+            conn = self._connect()
             try:
-                file.file.seek(0)
-            except Exception:
+                conn.execute("UPDATE blobs SET meta = ? WHERE sha256 = ?", (json.dumps(meta), record["sha256"]))
+                conn.commit()
+            finally:
+                conn.close()
+            record["meta"] = meta
+        return record["meta"]
+
+    def delete(self, file_uuid: str) -> bool:
+        """删除 uuid；不再被任何 uuid 引用的 blob 一并删除"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT sha256, path FROM files WHERE uuid = ?", (file_uuid,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM files WHERE uuid = ?", (file_uuid,))
+            orphan = not conn.execute("SELECT 1 FROM files WHERE sha256 = ? LIMIT 1", (row["sha256"],)).fetchone()
+            if orphan:
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (row["sha256"],))
+            conn.commit()
+        finally:
+            conn.close()
+        for path in [row["path"]] + ([self._blob_path(row["sha256"])] if orphan else []):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
                 pass
-    
-    # 存储UUID到路径映射
-    file_storage[file_uuid] = dest_path
-    return file_uuid, dest_path
+        retention.forget(row["path"])
+        return True
+
+    def evict_local(self, file_uuid: str) -> bool:
+        """
+        释放上传文件占用的本地空间（由 services/retention.py 按预算调用）
+        远程对象存储时只删除本地副本，记录保留、使用时经 ensure_local 取回；否则等同 delete
+        """
+        record = self.get(file_uuid)
+        if record is None:
+            return False
+        if not self.objects.remote:
+            return self.delete(file_uuid)
+        blob = self._blob_path(record["sha256"])
+        try:
+            os.remove(record["path"])
+            # 没有其他本地硬链接时 blob 也一并释放
+            if os.stat(blob).st_nlink == 1:
+                os.remove(blob)
+        except FileNotFoundError:
+            pass
+        retention.forget(record["path"])
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            files = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            blobs, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            logical = conn.execute(
+                "SELECT COALESCE(SUM(b.size), 0) FROM files f JOIN blobs b ON b.sha256 = f.sha256").fetchone()[0]
+        finally:
+            conn.close()
+        return {"files": files, "blobs": blobs, "stored_bytes": stored, "deduplicated_bytes": logical - stored}
+
+
+# 全局媒体存储
+media_store = MediaStore()
+
+
+def save_upload(file: UploadFile, max_size: Optional[int] = None) -> str:
+    """保存上传文件（写盘同时计算 SHA-256），返回文件路径"""
+    return save_upload_with_uuid(file, "default", max_size)[1]
+
+def save_upload_with_uuid(file: UploadFile, user_id: str, max_size: Optional[int] = None) -> tuple[str, str]:
+    """保存上传文件并返回UUID"""
+    try:
+        record = media_store.put_stream(file.file, file.filename or "upload", user_id, max_size)
+    finally:
+        try:
+            file.file.seek(0)
+        except Exception:
+            pass
+    return record["uuid"], record["path"]
 
 def get_file_path(file_uuid: str) -> Optional[str]:
-    """根据UUID获取文件路径"""
-    return file_storage.get(file_uuid)
+    """根据UUID获取文件路径（本地缺失时从对象存储取回）"""
+    record = media_store.get(file_uuid)
+    return media_store.ensure_local(record["path"]) if record else None
+
+def get_file_record(file_uuid: str) -> Optional[Dict[str, Any]]:
+    """根据UUID获取文件记录（size / sha256 / fingerprint / meta 等）"""
+    return media_store.get(file_uuid)
+
+def get_file_digest(file_uuid: str) -> Optional[str]:
+    """根据UUID获取文件内容摘要"""
+    record = media_store.get(file_uuid)
+    return record["sha256"] if record else None
+
+def digest_for_path(path: str) -> str:
+    return media_store.digest_for_path(path)
+
+def ensure_local(path: str) -> str:
+    return media_store.ensure_local(path)
@@ -0,0 +1,190 @@
+"""
+缩略图 - 历史记录封面与时间轴预览雪碧图
+雪碧图只需一次 ffmpeg 调用：-skip_frame nokey 只解码关键帧，fps 滤镜按等间隔取最近的关键帧，
+tile 滤镜拼成一张图，2 小时的文件也只需数秒。结果按内容摘要缓存在 artifacts/<sha256>/：
+
+    thumbnail.jpg        封面（时长 10% 处，最多第 10 秒）
+    sprite/sprite.jpg    N 帧拼接的雪碧图
+    sprite/sprite.vtt    WebVTT 索引，每个 cue 指向 sprite.jpg#xywh=x,y,w,h
+    sprite/sprite.json   布局（帧数、行列、单帧尺寸、间隔）
+
+配置:
+    SPRITE_FRAMES  雪碧图帧数上限（默认 100；短视频按每秒最多一帧减少）
+"""
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+from src.services.ingest import (
+    SPRITE_ARTIFACT,
+    THUMBNAIL_ARTIFACT,
+    artifact_dir,
+    artifact_path,
+)
+from src.services.retention import CACHES, retention
+from src.utils.single_flight import SingleFlight
+from src.utils.subtitle_export import vtt_time
+
+_CREATE_NO_WINDOW = 0x08000000 if sys.platform == "win32" else 0
+
+POSTER_WIDTH = 320
+SPRITE_FRAMES = int(os.environ.get("SPRITE_FRAMES", 100))
+SPRITE_COLUMNS = 10
+SPRITE_FRAME_WIDTH = 160
+MIN_INTERVAL = 1.0
+
+SPRITE_IMAGE = "sprite.jpg"
+SPRITE_INDEX = "sprite.vtt"
+SPRITE_LAYOUT = "sprite.json"
+
+_flight = SingleFlight("thumbnails")
+
+
+def _run_ffmpeg(cmd, what: str):
+    try:
+        subprocess.run(cmd, capture_output=True, check=True, creationflags=_CREATE_NO_WINDOW)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to extract {what}: {e.stderr.decode(errors='replace')[-500:]}") from e
+
+
+def poster_time(meta: Dict[str, Any]) -> float:
+    """取时长 10% 处（最多 10 秒）的画面，避开片头黑场"""
+    return min(float(meta.get("duration") or 0) * 0.1, 10.0)
+
+
+def extract_poster(media_path: str, dest: str, meta: Dict[str, Any], width: int = POSTER_WIDTH):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp.jpg")
+    os.close(fd)
+    cmd = [
+        "ffmpeg", "-nostdin", "-y", "-ss", f"{poster_time(meta):.3f}", "-i", os.path.abspath(media_path),
+        "-frames:v", "1", "-vf", f"scale={width}:-2", "-q:v", "4", tmp,
+    ]
+    try:
+        _run_ffmpeg(cmd, "thumbnail")
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def sprite_layout(meta: Dict[str, Any], frames: Optional[int] = None, columns: int = SPRITE_COLUMNS,
+                  frame_width: int = SPRITE_FRAME_WIDTH) -> Dict[str, Any]:
+    """按时长与画面比例计算雪碧图布局（单帧高度取偶数）"""
+    duration = float(meta.get("duration") or 0)
+    frames = max(1, min(frames or SPRITE_FRAMES, int(duration // MIN_INTERVAL)))
+    columns = min(columns, frames)
+    width, height = meta.get("width") or 16, meta.get("height") or 9
+    return {
+        "frames": frames,
+        "columns": columns,
+        "rows": math.ceil(frames / columns),
+        "width": frame_width,
+        "height": max(2, round(frame_width * height / width / 2) * 2),
+        "interval": duration / frames if duration > 0 else MIN_INTERVAL,
+        "duration": duration,
+    }
+
+
+def sprite_vtt(layout: Dict[str, Any], image: str = SPRITE_IMAGE) -> str:
+    """第 i 帧覆盖 [i * interval, (i + 1) * interval)，按行优先排列在雪碧图中"""
+    lines = ["WEBVTT", ""]
+    w, h, interval = layout["width"], layout["height"], layout["interval"]
+    for i in range(layout["frames"]):
+        start = i * interval
+        end = layout["duration"] if i == layout["frames"] - 1 else (i + 1) * interval
+        x, y = (i % layout["columns"]) * w, (i // layout["columns"]) * h
+        lines += [f"{vtt_time(start)} --> {vtt_time(end)}", f"{image}#xywh={x},{y},{w},{h}", ""]
+    return "\n".join(lines)
+
+
+def generate_sprite(media_path: str, dest: str, meta: Dict[str, Any], frames: Optional[int] = None) -> Dict[str, Any]:
+    """生成雪碧图、索引与布局到目录 dest（先写临时目录再整体改名）"""
+    layout = sprite_layout(meta, frames)
+    parent = os.path.dirname(dest)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".sprite-")
+    try:
+        vf = (f"fps=1/{layout['interval']:.6f},scale={layout['width']}:{layout['height']},"
+              f"tile={layout['columns']}x{layout['rows']}")
+        cmd = [
+            "ffmpeg", "-nostdin", "-y", "-skip_frame", "nokey", "-i", os.path.abspath(media_path),
+            "-an", "-sn", "-dn", "-vf", vf, "-frames:v", "1", "-q:v", "5",
+            os.path.join(tmp, SPRITE_IMAGE),
+        ]
+        print(f"Running FFmpeg: {' '.join(cmd)}")
+        _run_ffmpeg(cmd, "sprite sheet")
+        with open(os.path.join(tmp, SPRITE_INDEX), "w", encoding="utf-8") as f:
+            f.write(sprite_vtt(layout))
+        with open(os.path.join(tmp, SPRITE_LAYOUT), "w", encoding="utf-8") as f:
+            json.dump(layout, f)
+        try:
+            os.replace(tmp, dest)
+        except OSError:
+            # 并发生成时另一方已完成
+            if not os.path.isdir(dest):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return layout
+
+
+def _ensure(file_uuid: str, name: str, build) -> Optional[str]:
+    """按需生成产物（已由上传预处理生成时直接返回）；文件不存在或没有视频流时返回 None"""
+    from src.services.storage import get_file_path, media_store
+
+    record = media_store.get(file_uuid)
+    if record is None:
+        return None
+    dest = artifact_path(record["sha256"], name)
+    if os.path.exists(dest):
+        retention.touch(artifact_dir(record["sha256"]))
+        return dest
+    try:
+        meta = media_store.media_info(file_uuid)
+    except Exception as e:
+        raise RuntimeError(f"Failed to probe media: {e}") from e
+    if not meta or not meta.get("width"):
+        return None
+
+    def run():
+        if not os.path.exists(dest):
+            os.makedirs(artifact_dir(record["sha256"]), exist_ok=True)
+            build(get_file_path(file_uuid), dest, meta)
+            retention.track(artifact_dir(record["sha256"]), CACHES, ref=record["sha256"])
+        return dest
+
+    return _flight.do((name, record["sha256"]), run)
+
+
+def ensure_poster(file_uuid: str) -> Optional[str]:
+    return _ensure(file_uuid, THUMBNAIL_ARTIFACT, extract_poster)
+
+
+def ensure_sprite(file_uuid: str) -> Optional[str]:
+    return _ensure(file_uuid, SPRITE_ARTIFACT, generate_sprite)
+
+
+def prefetch(file_uuid: str):
+    """后台预先生成封面与雪碧图（只调用 ffmpeg 截帧，不走完整预处理流水线）；失败只记录日志"""
+    for ensure in (ensure_poster, ensure_sprite):
+        try:
+            ensure(file_uuid)
+        except Exception as e:
+            print(f"Thumbnail prefetch failed for {file_uuid}: {e}")
+
+
+def thumbnail_url(file_uuid: str) -> Optional[str]:
+    """历史记录的封面地址（thumbnail_path）；纯音频或无法探测时返回 None"""
+    from src.services.storage import media_store
+
+    try:
+        meta = media_store.media_info(file_uuid)
+    except Exception as e:
+        print(f"Failed to probe {file_uuid} for thumbnail: {e}")
+        return None
+    return f"/api/files/{file_uuid}/thumbnail" if meta and meta.get("width") else None
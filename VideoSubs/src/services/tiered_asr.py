@@ -0,0 +1,101 @@
+"""
+两遍式 ASR：先用小模型快速出草稿，再只对低置信度片段用大模型重解码。
+置信度取自 Whisper 每个分段自带的 avg_logprob / compression_ratio / no_speech_prob。
+"""
+import bisect
+import os
+from typing import Any, Dict, List, Tuple
+
+from src.utils.asr_scheduler import WINDOW_SECONDS
+
+DRAFT_MODEL = os.environ.get("ASR_DRAFT_MODEL", "small")
+REFINE_MODEL = os.environ.get("ASR_REFINE_MODEL", "large-v3")
+
+LOGPROB_THRESHOLD = float(os.environ.get("ASR_REFINE_LOGPROB", "-0.6"))
+COMPRESSION_RATIO_THRESHOLD = float(os.environ.get("ASR_REFINE_COMPRESSION_RATIO", "2.0"))
+NO_SPEECH_THRESHOLD = float(os.environ.get("ASR_REFINE_NO_SPEECH", "0.5"))
+
+Span = Tuple[float, float]
+
+
+def is_low_confidence(seg: Dict[str, Any]) -> bool:
+    """分段是否需要大模型重解码"""
+    avg_logprob = seg.get("avg_logprob")
+    if avg_logprob is not None and avg_logprob < LOGPROB_THRESHOLD:
+        return True
+    compression_ratio = seg.get("compression_ratio")
+    if compression_ratio is not None and compression_ratio > COMPRESSION_RATIO_THRESHOLD:
+        return True
+    # 模型认为是静音却输出了文字，多半是幻觉
+    no_speech_prob = seg.get("no_speech_prob")
+    return no_speech_prob is not None and no_speech_prob > NO_SPEECH_THRESHOLD and bool(seg.get("text", "").strip())
+
+
+def select_refine_spans(segments: List[Dict[str, Any]], duration: float, padding: float = 0.5,
+                        merge_gap: float = 1.0, max_span: float = WINDOW_SECONDS) -> List[Span]:
+    """
+    挑出低置信度分段，前后各扩展 padding 秒，合并相邻片段，
+    每个片段不超过一个解码窗口（max_span 秒）
+    """
+    spans: List[Span] = []
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        if not is_low_confidence(seg):
+            continue
+        start = max(0.0, seg["start"] - padding)
+        end = min(duration, seg["end"] + padding) if duration else seg["end"] + padding
+        end = min(end, start + max_span)
+        if spans and start - spans[-1][1] <= merge_gap and end - spans[-1][0] <= max_span:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        elif spans and start < spans[-1][1]:
+            # 放不进上一个窗口时从上一个片段的末尾接着切，避免重复解码
+            spans.append((spans[-1][1], max(spans[-1][1], end)))
+        else:
+            spans.append((start, end))
+    return [(s, e) for s, e in spans if e > s]
+
+
+def _refine_cores(draft: List[Dict[str, Any]], spans: List[Span]) -> List[Span]:
+    """每个重解码片段去掉 padding 后的范围：片段内低置信度草稿分段的起止（不超出片段）"""
+    low = sorted((seg for seg in draft if is_low_confidence(seg)), key=lambda s: s["start"])
+    cores: List[Span] = []
+    i = 0
+    for s, e in spans:
+        while i < len(low) and low[i]["end"] <= s:
+            i += 1
+        j = i
+        start, end = e, s
+        while j < len(low) and low[j]["start"] < e:
+            start, end = min(start, low[j]["start"]), max(end, low[j]["end"])
+            j += 1
+        if end > start:
+            cores.append((max(s, start), min(e, end)))
+    return cores
+
+
+def splice_segments(draft: List[Dict[str, Any]], spans: List[Span],
+                    refined: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    用重解码结果替换低置信度的草稿分段
+    片段两端的 padding 只为给大模型上下文：以分段中点判断，草稿与重解码结果按去掉 padding 的范围取舍，
+    重解码分段的起止裁剪到该范围内，避免与两侧保留的草稿重叠、重复出字
+    """
+    cores = _refine_cores(draft, spans)
+    core_starts = [s for s, _ in cores]
+
+    def _core(seg):
+        mid = (seg["start"] + seg["end"]) / 2
+        k = bisect.bisect_right(core_starts, mid) - 1
+        return cores[k] if k >= 0 and mid < cores[k][1] else None
+
+    merged = [seg for seg in draft if _core(seg) is None]
+    for seg in refined:
+        core = _core(seg)
+        if core is None:
+            continue
+        start, end = max(seg["start"], core[0]), min(seg["end"], core[1])
+        if end > start:
+            merged.append(dict(seg, start=start, end=end, refined=True))
+    merged.sort(key=lambda s: (s["start"], s["end"]))
+    for i, seg in enumerate(merged):
+        seg["id"] = i
+    return merged
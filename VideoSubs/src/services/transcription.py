@@ -0,0 +1,118 @@
+"""
+ASR 转写编排：PCM 缓存 → 语音检测 → 单遍/两遍解码
+只对检测到的语音区间解码，时间戳始终对应原始时间轴。
+具体推理由 services/asr_backends.py 中的后端完成。
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.services.asr_backends import AsrBackend, get_backend
+from src.services.tiered_asr import (
+    DRAFT_MODEL,
+    REFINE_MODEL,
+    select_refine_spans,
+    splice_segments,
+)
+from src.utils.asr_scheduler import SAMPLE_RATE, WINDOW_SAMPLES
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+    METRIC_SKIPPED_SECONDS = Counter('asr_skipped_seconds_total', 'Audio seconds skipped as non-speech before decoding')
+    METRIC_AUDIO_SECONDS = Counter('asr_audio_seconds_total', 'Total audio seconds submitted for transcription')
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+Span = Tuple[int, int]
+
+
+def _transcribe_pass(backend: AsrBackend, audio: Any, model_size: Optional[str], lang: Optional[str],
+                     speech: Optional[List[Span]]) -> Dict[str, Any]:
+    if speech is not None and not speech:
+        return {"text": "", "segments": [], "language": lang}
+    return backend.transcribe(audio, model_size, lang, spans=speech)
+
+
+def transcribe_tiered(audio: Any, lang: Optional[str] = None, draft_model: Optional[str] = None,
+                      refine_model: Optional[str] = None, speech: Optional[List[Span]] = None,
+                      backend: Optional[AsrBackend] = None) -> Dict[str, Any]:
+    """
+    两遍转写：小模型出草稿，低置信度片段交给大模型重解码后拼回
+
+    Args:
+        lang: 识别语言（可选，缺省时沿用草稿检测到的语言）
+        draft_model: 草稿模型，默认 ASR_DRAFT_MODEL
+        refine_model: 重解码模型，默认 ASR_REFINE_MODEL
+    """
+    backend = backend or get_backend()
+    draft_model = draft_model or DRAFT_MODEL
+    refine_model = refine_model or REFINE_MODEL
+    duration = len(audio) / SAMPLE_RATE
+
+    draft = _transcribe_pass(backend, audio, draft_model, lang, speech)
+    language = lang or draft.get("language")
+    spans = select_refine_spans(draft["segments"], duration)
+    if not spans:
+        print(f"Tiered ASR: draft ({draft_model}) fully confident, no refinement needed")
+        return draft
+
+    refined = backend.transcribe(
+        audio, refine_model, language,
+        spans=[(int(s * SAMPLE_RATE), int(e * SAMPLE_RATE)) for s, e in spans],
+    )
+    segments = splice_segments(draft["segments"], spans, refined["segments"])
+
+    refined_seconds = sum(e - s for s, e in spans)
+    print(f"Tiered ASR: refined {refined_seconds:.1f}s of {duration:.1f}s "
+          f"({100 * refined_seconds / max(duration, 1e-6):.0f}%) with {refine_model}")
+    return {
+        "text": "".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "language": language,
+        "refined_seconds": refined_seconds,
+    }
+
+
+def transcribe_media(media_path: str, lang: Optional[str] = None, model_size: Optional[str] = None,
+                     refine_model_size: Optional[str] = None, backend: Optional[str] = None) -> Dict[str, Any]:
+    """
+    转写媒体文件，返回与 whisper model.transcribe() 相同结构的字典，
+    另附 skipped_seconds（跳过的非语音时长）
+
+    Args:
+        backend: ASR 后端名称，默认 ASR_BACKEND
+    """
+    from src.services.ingest import language_hint
+    from src.services.scenes import index_for_path, snap_segments
+    from src.utils.audio import load_pcm
+    from src.utils.vad import detect_speech, pack_windows, speech_seconds, vad_enabled
+
+    audio = load_pcm(media_path)
+    duration = len(audio) / SAMPLE_RATE
+    # 上传后的预处理已检测过语言时直接使用，省去模型再检测一次
+    lang = lang or language_hint(media_path)
+
+    speech = detect_speech(audio) if vad_enabled() else None
+    # 按实际解码的窗口计算：pack_windows 合并进窗口的区间间停顿也会被解码，不算跳过
+    skipped = duration - speech_seconds(pack_windows(speech, WINDOW_SAMPLES)) if speech is not None else 0.0
+    if speech is not None:
+        print(f"VAD: {len(speech)} speech regions, skipping {skipped:.1f}s of {duration:.1f}s non-speech")
+
+    engine = get_backend(backend)
+    model_size = model_size or os.environ.get("WHISPER_MODEL", "base")
+    if refine_model_size:
+        result = transcribe_tiered(audio, lang=lang, draft_model=model_size,
+                                   refine_model=refine_model_size, speech=speech, backend=engine)
+    else:
+        result = _transcribe_pass(engine, audio, model_size, lang, speech)
+
+    # 已有镜头切点索引（上传预处理生成）时，字幕边界吸附到附近的切点
+    scene_index = index_for_path(media_path)
+    if scene_index is not None:
+        snap_segments(result["segments"], scene_index)
+
+    if PROMETHEUS_AVAILABLE:
+        METRIC_AUDIO_SECONDS.inc(duration)
+        METRIC_SKIPPED_SECONDS.inc(max(0.0, skipped))
+    result["skipped_seconds"] = max(0.0, skipped)
+    return result
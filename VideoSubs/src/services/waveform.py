@@ -0,0 +1,127 @@
+"""
+时间轴波形 - 多分辨率 min/max 峰值金字塔
+每个媒体内容只构建一次（上传预处理或首次请求时），存放在 artifacts/<sha256>/peaks/<每峰采样数>.npy：
+最细一级每 10ms 一对 int16 (min, max)，之后每级合并 4 倍，最粗一级约 10 秒一对。
+请求只读取可见窗口，并选用不比所需分辨率更细的最粗一级，
+因此 3 小时的文件在任意缩放级别下都只返回与屏幕像素数相当的数据（内存映射读取，不载入整个数组）。
+"""
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.services.ingest import PEAKS_ARTIFACT, artifact_path
+from src.utils.asr_scheduler import SAMPLE_RATE
+from src.utils.single_flight import SingleFlight
+
+BASE_SAMPLES_PER_PEAK = SAMPLE_RATE // 100
+LEVEL_FACTOR = 4
+LEVEL_COUNT = 6
+LEVELS: List[int] = [BASE_SAMPLES_PER_PEAK * LEVEL_FACTOR ** i for i in range(LEVEL_COUNT)]
+MAX_PEAKS = 65536
+
+_flight = SingleFlight("waveform")
+
+
+def compute_peaks(pcm: np.ndarray, samples_per_peak: int) -> np.ndarray:
+    """每 samples_per_peak 个采样一对 (min, max)，返回 shape=(n, 2) 的 int16 数组"""
+    pcm = np.asarray(pcm)
+    full = len(pcm) // samples_per_peak * samples_per_peak
+    blocks = pcm[:full].reshape(-1, samples_per_peak)
+    peaks = np.stack([blocks.min(axis=1), blocks.max(axis=1)], axis=1) if len(blocks) else np.empty((0, 2), pcm.dtype)
+    if full < len(pcm):
+        tail = pcm[full:]
+        peaks = np.concatenate([peaks, [[tail.min(), tail.max()]]])
+    return peaks.astype(np.int16)
+
+
+def reduce_peaks(peaks: np.ndarray, factor: int) -> np.ndarray:
+    """将相邻 factor 对峰值合并为一对（min 取最小、max 取最大），不足的尾部单独成对"""
+    full = len(peaks) // factor * factor
+    head = peaks[:full].reshape(-1, factor, 2)
+    reduced = np.stack([head[:, :, 0].min(axis=1), head[:, :, 1].max(axis=1)], axis=1)
+    if full < len(peaks):
+        tail = peaks[full:]
+        reduced = np.concatenate([reduced, [[tail[:, 0].min(), tail[:, 1].max()]]])
+    return reduced.astype(np.int16)
+
+
+def build_pyramid(pcm: np.ndarray, dest: str):
+    """构建全部级别写入目录 dest（先写临时目录再整体改名，读取方不会看到不完整的金字塔）"""
+    parent = os.path.dirname(dest)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".peaks-")
+    try:
+        peaks = compute_peaks(pcm, LEVELS[0])
+        np.save(os.path.join(tmp, f"{LEVELS[0]}.npy"), peaks)
+        for level in LEVELS[1:]:
+            peaks = reduce_peaks(peaks, LEVEL_FACTOR)
+            np.save(os.path.join(tmp, f"{level}.npy"), peaks)
+        try:
+            os.replace(tmp, dest)
+        except OSError:
+            # 并发构建时另一方已完成
+            if not os.path.isdir(dest):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def choose_level(peaks_per_second: float) -> int:
+    """不比所需分辨率更细的最粗一级；所需分辨率超过最细一级时返回最细一级"""
+    for level in reversed(LEVELS):
+        if SAMPLE_RATE / level >= peaks_per_second:
+            return level
+    return LEVELS[0]
+
+
+def pyramid_dir(digest: str) -> str:
+    return artifact_path(digest, PEAKS_ARTIFACT)
+
+
+def ensure_pyramid(media_path: str, digest: str) -> str:
+    """返回金字塔目录，不存在时解码音频（复用 PCM 缓存）并构建；相同内容的并发请求只构建一次"""
+    dest = pyramid_dir(digest)
+    if os.path.isdir(dest):
+        return dest
+
+    def build():
+        if not os.path.isdir(dest):
+            from src.utils.audio import load_pcm_int16
+            build_pyramid(load_pcm_int16(media_path), dest)
+        return dest
+
+    return _flight.do(digest, build)
+
+
+def read_window(digest: str, start: float, end: Optional[float], peaks_per_second: float,
+                bits: int = 16) -> Tuple[np.ndarray, int, float]:
+    """
+    读取 [start, end) 秒的峰值
+
+    Args:
+        end: None 表示到结尾
+        peaks_per_second: 所需分辨率（通常为 可见像素数 / 可见时长）
+        bits: 16 返回 int16；8 返回 int8（右移 8 位，数据量减半）
+    Returns:
+        (shape=(n, 2) 的峰值, 每峰采样数, 第一对峰值的起始秒数)
+    """
+    if bits not in (8, 16):
+        raise ValueError("bits must be 8 or 16")
+    level = choose_level(peaks_per_second)
+    peaks = np.load(os.path.join(pyramid_dir(digest), f"{level}.npy"), mmap_mode="r")
+    first = max(int(start * SAMPLE_RATE // level), 0)
+    last = len(peaks) if end is None else min(int(-(-end * SAMPLE_RATE // level)), len(peaks))
+    last = min(max(last, first), first + MAX_PEAKS)
+    window = np.asarray(peaks[first:last])
+    if bits == 8:
+        window = (window >> 8).astype(np.int8)
+    return window, level, first * level / SAMPLE_RATE
+
+
+def duration_seconds(digest: str) -> float:
+    """按最细一级的峰值数估算时长（精确到 10ms）"""
+    peaks = np.load(os.path.join(pyramid_dir(digest), f"{LEVELS[0]}.npy"), mmap_mode="r")
+    return len(peaks) * LEVELS[0] / SAMPLE_RATE
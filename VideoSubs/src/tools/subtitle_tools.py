@@ -3,20 +3,23 @@ import os
 import subprocess
 import json
 import shutil
-import codecs
 import re
+import uuid
 from typing import Any, Dict, List, Optional, Callable
 from fastapi import FastAPI, UploadFile, Form, File
 from fastapi.responses import JSONResponse, FileResponse
 from langchain_core.tools import tool
-from src.agent.Subs import AssStyle, SubtitleDoc, SubtitleEvent
-from src.utils.model_loader import get_whisper_model
+from src.agent.Subs import AssStyle
+import src.config as _config
+from src.utils.compact_doc import CompactSubtitleDoc
+from src.utils.subtitle_export import hex_to_ass_color, ass_time, srt_time, write_subtitles
+from src.services.asr_pool import asr_pool
+from src.services.transcription import transcribe_media
 
 # Windows: prevent subprocess from spawning console windows
 import sys as _sys
 _CREATE_NO_WINDOW = 0x08000000 if _sys.platform == "win32" else 0
 
-out_dir = "outputs"
 # whisper_model = whisper.load_model("large-v3") <-- Removed
 # ----------------
 # 核心工具函数
@@ -69,86 +72,68 @@ def probe_media(media_path: str) -> Dict[str, Any]:
 
 
 @tool
-def asr_transcribe_video(media_path: str, lang: str = None, model_size: str = None) -> SubtitleDoc:
+def asr_transcribe_video(media_path: str, lang: str = None, model_size: str = None, refine_model_size: str = None, backend: str = None) -> CompactSubtitleDoc:
     """
     使用 Whisper 语音识别模型直接转写视频，输出分段字幕�?
     参数:
         media_path: 视频文件路径
         lang: 识别语言（可选）
         model_size: 模型大小 (tiny/base/small/medium)
+        refine_model_size: 两遍模式下用于重解码低置信度片段的大模型（可选）
+        backend: ASR 推理后端 (whisper/onnx，可选)
     返回:
-        SubtitleDoc 对象
+        CompactSubtitleDoc（列式存储，model_dump() 结构与 SubtitleDoc 相同）
     """
-    model = get_whisper_model(model_size)
     print(f"Starting transcription for {media_path} with model {model_size or 'default'}...")
-    result = model.transcribe(media_path, language=lang)
+    params = dict(media_path=media_path, lang=lang, model_size=model_size, refine_model_size=refine_model_size, backend=backend)
+    if asr_pool.enabled:
+        # 交给常驻 ASR 工作进程，API 进程不加载模型
+        result = asr_pool.transcribe(**params)
+    else:
+        # 只解码语音区间；并发请求的窗口由调度器合并批处理
+        result = transcribe_media(**params)
     detected_lang = result.get('language', 'unknown')
     print(f"Transcription finished. Detected language: {detected_lang}")
     
-    events = []
-    for i, seg in enumerate(result['segments']):
-        events.append(SubtitleEvent(
-            id=str(i+1),
-            start=seg['start'],
-            end=seg['end'],
-            text=seg['text'],
-            style="Default"
-        ))
-    
-    return SubtitleDoc(language=detected_lang, events=events)
+    # 列式文档：不为每个分段构造模型，API 边界再 model_dump()
+    return CompactSubtitleDoc.from_segments(result['segments'], language=detected_lang, style="Default")
 
 
 
 @tool
-def format_srt(subtitle_doc: Dict[str, Any], ) -> str:
+def format_srt(subtitle_doc: Dict[str, Any]) -> str:
     """
-    将字幕结构体格式化为 SRT 文件�?
+    将字幕结构体格式化为 SRT 文件（写入新的 outputs/<id>/out.srt，并发调用互不覆盖）。
     参数:
-        subtitle_doc: 字幕结构�?
+        subtitle_doc: 字幕结构体
     返回:
         SRT 文件路径
     """
-    srt_path = os.path.join(out_dir, "out.srt")
-    with open(srt_path, "w", encoding="utf-8") as f:
-        for i, ev in enumerate(subtitle_doc["events"], 1):
-            f.write(f"{i}\n")
-            f.write(f"{format_time(ev['start'])} --> {format_time(ev['end'])}\n")
-            f.write(f"{ev['text']}\n\n")
-    return srt_path
+    return _write_srt(subtitle_doc)
 
 
 @tool
 def format_ass(media_height: int, media_width: int, subtitle_doc: Dict[str, Any], styles: Optional[List[AssStyle]] = None) -> str:
     """
-    将字幕结构体格式化为 ASS 文件�?
+    将字幕结构体格式化为 ASS 文件（写入新的 outputs/<id>/out.ass）。
     参数:
-        subtitle_doc: 字幕结构�?
+        subtitle_doc: 字幕结构体
         styles: ASS 样式列表（可选）
     返回:
         ASS 文件路径
     """
-    ass_path = os.path.join(out_dir, "out.ass")
-    with codecs.open(ass_path, "w", encoding="utf-8") as f:
-        f.write(f"[Script Info]\nScriptType: v4.00+\nPlayResX: {media_width}\nPlayResY: {media_height}\n\n")
-        f.write("[V4+ Styles]\n")
-        f.write("Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
-                "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n")
-        if styles:
-            for style in styles:
-                f.write(f"Style: {style.Name},{style.FontName},{style.FontSize},{_hex_to_ass_color(style.PrimaryColour, style.PrimaryAlpha or 0)},{_hex_to_ass_color(style.SecondaryColour, style.SecondaryAlpha or 0)},"
-                        f"{_hex_to_ass_color(style.OutlineColour, style.OutlineAlpha or 0)},{_hex_to_ass_color(style.BackColour, style.BackAlpha or 0)},{-1 if style.Bold else 0},{-1 if style.Italic else 0},"
-                        f"{-1 if style.Underline else 0},{-1 if style.StrikeOut else 0},{style.ScaleX or 100},{style.ScaleY or 100},"
-                        f"{style.Spacing or 0},{style.Angle or 0},{style.BorderStyle or 1},{style.Outline or 1},{style.Shadow or 0},"
-                        f"{style.Alignment or 2},{style.MarginL or 10},{style.MarginR or 10},{style.MarginV or 10},{style.Encoding or 1}\n")
-        else:
-            f.write("Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H64000000,-1,0,0,0,100,100,0,0,1,1,0,2,10,10,10,1\n\n")
-        f.write("[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
-        for ev in subtitle_doc.get("events", []):
-            # ev is expected to be a dict-like object
-            text = (ev.get("text") if isinstance(ev, dict) else getattr(ev, "text", "")).replace('\n', ' ').replace('\r', ' ').replace('\ufeff', '')
-            style_name = ev.get("style", "Default") if isinstance(ev, dict) else getattr(ev, "style", "Default")
-            f.write(f"Dialogue: 0,{format_time(ev['start'], ass=True)},{format_time(ev['end'], ass=True)},{style_name},,0,0,0,,{text}\n")
-    return ass_path
+    return _write_ass(subtitle_doc, media_width, media_height, styles)
+
+
+# 输出路径只对进程内调用方开放，不进入 LLM 可见的工具参数
+def _write_srt(subtitle_doc: Dict[str, Any], out_path: Optional[str] = None) -> str:
+    return write_subtitles(subtitle_doc, "srt", out_path or _export_path("srt"))
+
+
+def _write_ass(subtitle_doc: Dict[str, Any], width: int, height: int, styles: Optional[List[AssStyle]] = None,
+               out_path: Optional[str] = None) -> str:
+    return write_subtitles(subtitle_doc, "ass", out_path or _export_path("ass"),
+                           width=width, height=height, styles=styles)
 
 
 @tool
@@ -206,7 +191,23 @@ def final_hard_burn(media_height: int, media_width: int, media_path: str, ass_pa
     return run_ffmpeg_burn(media_height, media_width, media_path, ass_path, task_dir)
 
 
-def run_ffmpeg_burn(media_height: int, media_width: int, media_path: str, ass_path: str, task_dir: str, progress_callback: Optional[Callable[[int], None]] = None) -> str:
+def _mp4_output_args(output_mode: str) -> List[str]:
+    """
+    MP4 封装参数
+    faststart: moov 由 ffmpeg 在结束时移到文件头，成品无需再转封装即可网页播放
+    fragmented: 先写空 moov，之后按固定间隔的关键帧输出分片，文件写入过程中即可播放
+    """
+    if output_mode == "fragmented":
+        return [
+            "-force_key_frames", f"expr:gte(t,n_forced*{_config.BURN_FRAGMENT_SECONDS:g})",
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+        ]
+    if output_mode == "faststart":
+        return ["-movflags", "+faststart"]
+    raise ValueError(f"Unknown burn output mode: {output_mode}")
+
+
+def run_ffmpeg_burn(media_height: int, media_width: int, media_path: str, ass_path: str, task_dir: str, progress_callback: Optional[Callable[[int], None]] = None, output_mode: Optional[str] = None) -> str:
     """
     执行 FFmpeg 烧录逻辑，支持进度回�?
     """
@@ -227,7 +228,8 @@ def run_ffmpeg_burn(media_height: int, media_width: int, media_path: str, ass_pa
     cmd = [
         "ffmpeg", "-y", "-i", media_abs,
         "-vf", f"ass='{ass_path_escaped}'",
-        "-c:v", "libx264", "-crf", "23", "-preset", "fast", "-c:a", "aac", "-b:a", "128k", out_path
+        "-c:v", "libx264", "-crf", "23", "-preset", "fast", "-c:a", "aac", "-b:a", "128k",
+        *_mp4_output_args(output_mode or _config.BURN_OUTPUT_MODE), out_path
     ]
     log_path = os.path.join(task_dir, "ffmpeg.log")
     
@@ -367,25 +369,14 @@ def auto_subtitle_pipeline(media_path: str, lang: str = None) -> Dict[str, str]:
 # ----------------
 # Helpers
 # ----------------
+def _export_path(ext: str) -> str:
+    """每次导出一个独立目录（与烧录任务目录同级，由保留策略按 outputs 类别清理）"""
+    return os.path.join(_config.OUTPUTS_DIR, uuid.uuid4().hex[:8], f"out.{ext}")
+
 def _hex_to_ass_color(hex_color: str, alpha: int = 0) -> str:
     """Convert hex #RRGGBB and CSS alpha (0-255) to ASS &HAABBGGRR format.
     ASS alpha: 00=opaque, FF=transparent."""
-    if not hex_color or not hex_color.startswith("#"):
-        return "&H00000000"
-    r = hex_color[1:3]
-    g = hex_color[3:5]
-    b = hex_color[5:7]
-    ass_alpha = hex(255 - alpha)[2:].upper().zfill(2)
-    return f"&H{ass_alpha}{b}{g}{r}"
+    return hex_to_ass_color(hex_color, alpha)
 
 def format_time(t: float, ass: bool = False) -> str:
-    h = int(t // 3600)
-    m = int((t % 3600) // 60)
-    s = int(t % 60)
-    cs = int((t - int(t)) * 100)
-    if ass:
-        return f"{h:d}:{m:02d}:{s:02d}.{cs:02d}"
-    else:
-        ms = int((t - int(t)) * 1000)
-        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-
+    return ass_time(t) if ass else srt_time(t)
@@ -0,0 +1,406 @@
+"""
+ASR 微批调度器 - 将并发请求的 30 秒 mel 窗口合并为批次统一解码
+同一模型大小、同一语言设置的窗口共享一次 encoder/decoder 前向计算，
+解码结果再按窗口路由回各自的请求。
+
+每个请求与 whisper.transcribe 相同地顺序推进：上一窗口的文本作为下一窗口的 prompt，
+窗口末尾未完成的分段丢弃、从最后一个完整时间戳处重新开始，边界上的词不会被截断；
+批次由同一时刻各请求排队的窗口组成，所有进行中的请求都已排队时立即出发，不等待 max_wait。
+"""
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from prometheus_client import Counter, Histogram
+    PROMETHEUS_AVAILABLE = True
+    METRIC_BATCH_SIZE = Histogram('asr_batch_size', 'Number of 30s windows decoded per batch',
+                                  buckets=(1, 2, 4, 8, 16, 32))
+    METRIC_WINDOWS = Counter('asr_windows_total', 'Total 30s windows decoded', ['model_size'])
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+WINDOW_SAMPLES = SAMPLE_RATE * WINDOW_SECONDS
+TIME_PRECISION = 0.02  # whisper 时间戳 token 的精度（秒）
+
+# Whisper transcribe() 默认的温度回退与静音判定阈值
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# prompt 截断到的长度档位：同一批次的 prompt 长度必须相同，分档后不同请求的窗口才能合批；
+# 最大档为 whisper 允许的上限 n_text_ctx // 2 - 1
+PROMPT_BUCKETS = (0, 16, 32, 64, 128, 223)
+# 温度高于此值的结果不再作为下一窗口的 prompt（与 whisper.transcribe 相同）
+PROMPT_RESET_TEMPERATURE = 0.5
+HOP_LENGTH = 160  # whisper.audio.HOP_LENGTH，分段的 seek 以 mel 帧计
+
+# (model_size, language, temperature, prompt 长度)
+BatchKey = Tuple[str, Optional[str], float, int]
+
+
+class _Window:
+    __slots__ = ("mel", "prompt", "future", "enqueued_at")
+
+    def __init__(self, mel: Any, prompt: List[int]):
+        self.mel = mel
+        self.prompt = prompt
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+def bucket_prompt(tokens: List[int]) -> List[int]:
+    """取末尾不超过 tokens 长度的最大档位个 token"""
+    size = max(b for b in PROMPT_BUCKETS if b <= len(tokens))
+    return tokens[len(tokens) - size:] if size else []
+
+
+def complete_tokens(tokens: List[int], timestamp_begin: int, window_samples: int) -> Tuple[List[int], int]:
+    """
+    去掉窗口末尾未完成的分段，返回（保留的 token，下一窗口的前进采样数），规则同 whisper.transcribe：
+    以单个时间戳结尾（最后一段已闭合）或没有成对时间戳时整窗前进；
+    否则截到最后一对相邻时间戳，从前一个时间戳（最后一个完整分段的结束）处重新解码
+    """
+    is_ts = [t >= timestamp_begin for t in tokens]
+    if len(tokens) >= 2 and is_ts[-1] and not is_ts[-2]:
+        return tokens, window_samples
+    for i in range(len(tokens) - 1, 0, -1):
+        if is_ts[i] and is_ts[i - 1]:
+            advance = int(round((tokens[i - 1] - timestamp_begin) * TIME_PRECISION * SAMPLE_RATE))
+            if advance > 0:
+                return tokens[:i], min(advance, window_samples)
+            break
+    return tokens, window_samples
+
+
+def _needs_fallback(result: Any) -> bool:
+    """与 whisper.transcribe 相同的回退判定：压缩比过高或置信度过低（静音除外）"""
+    if result.compression_ratio is not None and result.compression_ratio > COMPRESSION_RATIO_THRESHOLD:
+        return True
+    if result.avg_logprob is not None and result.avg_logprob < LOGPROB_THRESHOLD:
+        return not (result.no_speech_prob is not None and result.no_speech_prob > NO_SPEECH_THRESHOLD)
+    return False
+
+
+def _is_silence(result: Any) -> bool:
+    return (
+        result.no_speech_prob is not None and result.no_speech_prob > NO_SPEECH_THRESHOLD
+        and result.avg_logprob is not None and result.avg_logprob < LOGPROB_THRESHOLD
+    )
+
+
+def split_segments(tokens: List[int], timestamp_begin: int, decode: Callable[[List[int]], str],
+                   offset: float, duration: float) -> List[Dict[str, Any]]:
+    """
+    按时间戳 token 将一个窗口的解码结果切分为分段
+
+    Args:
+        tokens: 解码得到的 token（不含 SOT 序列和 EOT）
+        timestamp_begin: tokenizer.timestamp_begin
+        decode: 文本 token -> 字符串
+        offset: 窗口在原始音频中的起始时间（秒）
+        duration: 窗口的有效时长（秒）
+    """
+    segments = []
+    start: Optional[float] = None
+    text_tokens: List[int] = []
+
+    def _close(end: float):
+        text = decode(text_tokens)
+        if text.strip():
+            seg_start = min(start if start is not None else 0.0, duration)
+            segments.append({
+                "start": offset + seg_start,
+                "end": offset + max(seg_start, min(end, duration)),
+                "text": text,
+                "tokens": list(text_tokens),
+            })
+
+    for tok in tokens:
+        if tok >= timestamp_begin:
+            t = (tok - timestamp_begin) * TIME_PRECISION
+            if text_tokens:
+                _close(t)
+                text_tokens = []
+                start = None
+            else:
+                start = t
+        else:
+            text_tokens.append(tok)
+
+    if text_tokens:
+        _close(duration)
+    return segments
+
+
+def model_traits(model_size: str) -> Tuple[int, bool, int]:
+    """
+    不加载模型即可得到 (n_mels, 是否多语言, 语言数)。
+    模型只允许由调度线程加载和使用，调用方线程不能触碰 model_loader。
+    """
+    is_v3 = model_size.startswith("large-v3")
+    return (128 if is_v3 else 80), not model_size.endswith(".en"), (100 if is_v3 else 99)
+
+
+def _whisper_decode_batch(key: BatchKey, mels: List[Any], prompts: List[List[int]]) -> List[Any]:
+    """
+    默认批解码实现：加载模型并对 (B, n_mels, 3000) 的 mel 张量解码
+    whisper.decode 整批只接受一个 prompt，各行 prompt 不同时（长度相同）在初始 token 中逐行替换
+    """
+    import torch
+    import whisper
+    from whisper.decoding import DecodingTask
+
+    from src.utils.model_loader import get_whisper_model
+
+    class _PromptedDecodingTask(DecodingTask):
+        # 初始 token 为 [sot_prev, *prompt, *sot_sequence]
+        def _main_loop(self, audio_features, tokens):
+            rows = torch.tensor(prompts, device=tokens.device).repeat_interleave(self.n_group, dim=0)
+            tokens[:, 1:1 + rows.shape[1]] = rows
+            return super()._main_loop(audio_features, tokens)
+
+    model_size, lang, temperature, prompt_len = key
+    model = get_whisper_model(model_size)
+    batch = torch.stack(mels).to(model.device)
+    options = whisper.DecodingOptions(
+        task="transcribe",
+        language=lang,
+        temperature=temperature,
+        prompt=prompts[0] if prompt_len else None,
+        fp16=model.device.type == "cuda",
+    )
+    if prompt_len and any(p != prompts[0] for p in prompts):
+        with torch.no_grad():
+            results = _PromptedDecodingTask(model, options).run(batch)
+    else:
+        results = whisper.decode(model, batch, options)
+    return results if isinstance(results, list) else [results]
+
+
+class AsrBatchScheduler:
+    def __init__(self, max_batch_size: int = 8, max_wait: float = 0.05,
+                 max_starve: float = 5.0,
+                 decode_batch: Optional[Callable[[BatchKey, List[Any], List[List[int]]], List[Any]]] = None):
+        """
+        初始化调度器
+
+        Args:
+            max_batch_size: 单批次最多窗口数
+            max_wait: 批次未满时，最早的窗口最多等待多久（秒）再出发
+            max_starve: 其他模型的窗口等待超过该时长时才切换模型，避免频繁换模
+            decode_batch: 批解码函数 (key, mels, prompts) -> DecodingResult 列表，测试时可替换
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.max_starve = max_starve
+        self.decode_batch = decode_batch or _whisper_decode_batch
+        self._pending: Dict[BatchKey, List[_Window]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._current_model: Optional[str] = None
+        # 进行中的 transcribe_audio 请求数；每个请求同一时刻最多排队一个窗口
+        self._active = 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="asr-batch-scheduler", daemon=True)
+            self._thread.start()
+
+    def submit_windows(self, key: BatchKey, mels: List[Any],
+                       prompts: Optional[List[List[int]]] = None) -> List[Future]:
+        """提交一组窗口（prompt 长度均为 key[3]），返回与之一一对应的 Future（结果为 DecodingResult）"""
+        windows = [_Window(mel, prompts[i] if prompts else []) for i, mel in enumerate(mels)]
+        with self._cond:
+            self._pending.setdefault(key, []).extend(windows)
+            self._ensure_thread()
+            self._cond.notify()
+        return [w.future for w in windows]
+
+    def pending_windows(self) -> int:
+        with self._cond:
+            return sum(len(v) for v in self._pending.values())
+
+    def _pick_key(self, now: float) -> Optional[BatchKey]:
+        """优先使用已加载的模型；其他模型的窗口饿死过久时才切换"""
+        keys = [k for k, v in self._pending.items() if v]
+        if not keys:
+            return None
+        oldest = min(keys, key=lambda k: self._pending[k][0].enqueued_at)
+        if oldest[0] == self._current_model:
+            return oldest
+        current = [k for k in keys if k[0] == self._current_model]
+        if current and now - self._pending[oldest][0].enqueued_at < self.max_starve:
+            return min(current, key=lambda k: self._pending[k][0].enqueued_at)
+        return oldest
+
+    def _take_batch(self) -> Tuple[BatchKey, List[_Window]]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                key = self._pick_key(now)
+                if key is None:
+                    self._cond.wait()
+                    continue
+                queue = self._pending[key]
+                deadline = queue[0].enqueued_at + self.max_wait
+                # 所有进行中的请求都在等结果时，再等也不会有新窗口
+                everyone_waiting = self._active and sum(len(v) for v in self._pending.values()) >= self._active
+                if len(queue) >= self.max_batch_size or now >= deadline or everyone_waiting:
+                    batch = queue[:self.max_batch_size]
+                    del queue[:self.max_batch_size]
+                    if not queue:
+                        del self._pending[key]
+                    return key, batch
+                self._cond.wait(timeout=deadline - now)
+
+    def _run(self):
+        while True:
+            key, batch = self._take_batch()
+            try:
+                results = self.decode_batch(key, [w.mel for w in batch], [w.prompt for w in batch])
+                self._current_model = key[0]
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch decode returned {len(results)} results for {len(batch)} windows")
+                if PROMETHEUS_AVAILABLE:
+                    METRIC_BATCH_SIZE.observe(len(batch))
+                    METRIC_WINDOWS.labels(model_size=key[0]).inc(len(batch))
+                for window, result in zip(batch, results):
+                    window.future.set_result(result)
+            except Exception as e:
+                print(f"ASR batch failed ({key[0]}, {len(batch)} windows): {e}")
+                traceback.print_exc()
+                for window in batch:
+                    if not window.future.done():
+                        window.future.set_exception(e)
+
+    def decode_windows(self, model_size: str, lang: Optional[str], mels: List[Any],
+                       prompt: Optional[List[int]] = None) -> List[Any]:
+        """
+        解码一组窗口，对低质量窗口按 whisper 的温度序列逐级回退重解码
+
+        Args:
+            prompt: 前文 token（各窗口相同），按 PROMPT_BUCKETS 截断
+
+        Returns:
+            与 mels 一一对应的 DecodingResult
+        """
+        prompt = bucket_prompt(prompt or [])
+        results: List[Any] = [None] * len(mels)
+        todo = list(range(len(mels)))
+        for i, temperature in enumerate(TEMPERATURES):
+            futures = self.submit_windows((model_size, lang, temperature, len(prompt)), [mels[j] for j in todo],
+                                          [prompt] * len(todo))
+            retry = []
+            for j, fut in zip(todo, futures):
+                results[j] = fut.result()
+                if i + 1 < len(TEMPERATURES) and _needs_fallback(results[j]):
+                    retry.append(j)
+            if not retry:
+                break
+            todo = retry
+        return results
+
+    def transcribe(self, media_path: str, model_size: Optional[str] = None,
+                   lang: Optional[str] = None) -> Dict[str, Any]:
+        """
+        以批处理方式转写媒体文件，返回与 whisper model.transcribe() 相同结构的字典
+        """
+        import whisper
+
+        return self.transcribe_audio(whisper.load_audio(media_path), model_size=model_size, lang=lang)
+
+    def transcribe_audio(self, audio: Any, model_size: Optional[str] = None, lang: Optional[str] = None,
+                         spans: Optional[List[Tuple[int, int]]] = None) -> Dict[str, Any]:
+        """
+        转写 16kHz 单声道 PCM
+
+        Args:
+            audio: float32 采样数组
+            spans: 需要解码的 (起始采样, 结束采样) 列表；默认解码整段音频
+        """
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        model_size = model_size or os.environ.get("WHISPER_MODEL", "base")
+        n_mels, multilingual, num_languages = model_traits(model_size)
+        # 只用于把 token 解码为文本，与语言无关
+        tokenizer = get_tokenizer(multilingual, num_languages=num_languages, language=lang, task="transcribe")
+
+        def to_mel(s: int, e: int):
+            return whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[s:e]), n_mels)
+
+        regions = spans if spans is not None else [(0, len(audio))]
+        segments, language = self.decode_regions(model_size, lang, regions, to_mel, tokenizer)
+        return {
+            "text": "".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": language or "en",
+        }
+
+    def decode_regions(self, model_size: str, lang: Optional[str], regions: List[Tuple[int, int]],
+                       to_mel: Callable[[int, int], Any], tokenizer: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按 whisper.transcribe 的方式顺序解码各区间：每次一个至多 30 秒的窗口，
+        以前文为 prompt，窗口末尾未完成的分段从最后一个完整时间戳处重新解码
+
+        Returns:
+            (分段列表, 语言)；lang 为 None 时取第一个窗口检测到的语言
+        """
+        language = lang
+        prompt: List[int] = []
+        segments: List[Dict[str, Any]] = []
+
+        def _decode_text(tokens: List[int]) -> str:
+            return tokenizer.decode([t for t in tokens if t < tokenizer.eot])
+
+        with self._cond:
+            self._active += 1
+        try:
+            for start, end in regions:
+                seek = start
+                while seek < end:
+                    window_end = min(seek + WINDOW_SAMPLES, end)
+                    result = self.decode_windows(model_size, language, [to_mel(seek, window_end)], prompt)[0]
+                    language = language or getattr(result, "language", None)
+                    if _is_silence(result):
+                        seek = window_end
+                        continue
+                    tokens, advance = complete_tokens(result.tokens, tokenizer.timestamp_begin, window_end - seek)
+                    for seg in split_segments(tokens, tokenizer.timestamp_begin, _decode_text,
+                                              seek / SAMPLE_RATE, (window_end - seek) / SAMPLE_RATE):
+                        seg.update({
+                            "id": len(segments),
+                            "seek": seek // HOP_LENGTH,
+                            "temperature": result.temperature,
+                            "avg_logprob": result.avg_logprob,
+                            "compression_ratio": result.compression_ratio,
+                            "no_speech_prob": result.no_speech_prob,
+                        })
+                        segments.append(seg)
+                        prompt.extend(seg["tokens"])
+                    if result.temperature > PROMPT_RESET_TEMPERATURE:
+                        prompt = []
+                    seek += advance
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+        return segments, language
+
+
+def batching_enabled() -> bool:
+    return os.environ.get("ASR_BATCHING", "1") not in ("0", "false", "False")
+
+
+# 全局调度器实例
+asr_scheduler = AsrBatchScheduler(
+    max_batch_size=int(os.environ.get("ASR_BATCH_SIZE", "8")),
+    max_wait=int(os.environ.get("ASR_BATCH_WAIT_MS", "50")) / 1000,
+)
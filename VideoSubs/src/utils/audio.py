@@ -0,0 +1,87 @@
+"""
+16kHz 单声道 PCM 的解码与磁盘缓存
+同一内容只用 ffmpeg 解码一次，之后的 VAD / ASR / 重解码都直接读取缓存。
+缓存按内容摘要存放在预处理产物目录（OUTPUTS_DIR/artifacts/<sha256>/audio.npy，见 services/ingest.py），
+上传后的后台预处理与转写共用同一份；并发的相同解码合并为一次。
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from src.services.retention import retention
+from src.utils.asr_scheduler import SAMPLE_RATE
+from src.utils.single_flight import SingleFlight
+
+_CREATE_NO_WINDOW = 0x08000000 if sys.platform == "win32" else 0
+
+_flight = SingleFlight("pcm_decode")
+
+
+def pcm_cache_path(media_path: str) -> str:
+    from src.services.ingest import PCM_ARTIFACT, artifact_path
+    from src.services.storage import digest_for_path
+
+    return artifact_path(digest_for_path(media_path), PCM_ARTIFACT)
+
+
+def decode_pcm(media_path: str) -> np.ndarray:
+    """用 ffmpeg 将媒体解码为 16kHz 单声道 int16 PCM（与 whisper.load_audio 的参数一致）"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", os.path.abspath(media_path),
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True, creationflags=_CREATE_NO_WINDOW).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(out, np.int16)
+
+
+def _read_cache(cache_path: str):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        pcm = np.load(cache_path, mmap_mode="r")
+    except Exception as e:
+        print(f"PCM cache unreadable, re-decoding: {e}")
+        return None
+    retention.touch(os.path.dirname(cache_path))
+    return pcm
+
+
+def _decode_to_cache(media_path: str, cache_path: str) -> np.ndarray:
+    # 排队等待期间其他调用可能已写好缓存
+    pcm = _read_cache(cache_path)
+    if pcm is not None:
+        return pcm
+    pcm = decode_pcm(media_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, pcm)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Failed to cache PCM for {media_path}: {e}")
+    return pcm
+
+
+def load_pcm_int16(media_path: str) -> np.ndarray:
+    """读取 16kHz 单声道 int16 PCM（缓存命中时为只读内存映射），优先使用磁盘缓存"""
+    cache_path = pcm_cache_path(media_path)
+    pcm = _read_cache(cache_path)
+    if pcm is None:
+        pcm = _flight.do(cache_path, lambda: _decode_to_cache(media_path, cache_path))
+    return pcm
+
+
+def load_pcm(media_path: str) -> np.ndarray:
+    """
+    读取 16kHz 单声道 float32 PCM，优先使用磁盘缓存
+
+    缓存以 int16 .npy 保存（与 ffmpeg 输出逐位一致），按内容摘要区分版本。
+    """
+    return load_pcm_int16(media_path).astype(np.float32) / 32768.0
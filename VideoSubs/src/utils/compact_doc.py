@@ -0,0 +1,257 @@
+"""
+紧凑字幕文档 - SubtitleDoc 的列式内存表示
+长转写（数万条事件、逐词时间戳）用 pydantic 模型保存时，每条事件、每个词都是独立对象，
+内存与校验开销随事件数线性放大。CompactSubtitleDoc 按列保存：
+
+    start / end           float64[n]
+    id / text             TextStore（全部拼接为一个 str + int64 偏移）；id 为 "1".."n" 时不保存
+    style / speaker       字符串表 + int32 下标（-1 为 None）
+    words                 每事件词数 int32[n]（-1 为 None）
+                          列式模式 start / end / probability float64[m]（NaN 为缺省）+ TextStore
+                          含非标准字段的词字典回退为原样保存的列表
+
+只在 API 边界与 pydantic 模型互转（model_dump / to_model / from_doc），往返无损
+（词时间与概率按 float64 保存，整数读回为相等的 float）；
+subtitle_export 直接读取列数据序列化，无需先展开为事件字典。
+
+    doc = CompactSubtitleDoc.from_segments(result["segments"], language="en", style="Default")
+    doc.model_dump() == doc.to_model().model_dump()
+
+基准: python benchmarks/bench_compact_doc.py --events 100000
+"""
+import json
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.agent.Subs import AssStyle, SubtitleDoc
+
+
+class TextStore:
+    """字符串列：拼接为一个 str，按偏移切片取出"""
+
+    __slots__ = ("_blob", "_offsets")
+
+    def __init__(self, values: Sequence[str]):
+        self._blob = "".join(values)
+        self._offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in values], out=self._offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]]
+
+    def tolist(self, lo: int = 0, hi: Optional[int] = None) -> List[str]:
+        offsets = self._offsets[lo:(len(self) if hi is None else hi) + 1].tolist()
+        blob = self._blob
+        return [blob[a:b] for a, b in zip(offsets, offsets[1:])]
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._blob) + self._offsets.nbytes
+
+
+def _intern(values: Sequence[Optional[str]]) -> Tuple[List[str], np.ndarray]:
+    table: Dict[str, int] = {}
+    codes = np.fromiter((-1 if v is None else table.setdefault(v, len(table)) for v in values),
+                        dtype=np.int32, count=len(values))
+    return list(table), codes
+
+
+def _lookup(table: List[str], codes: np.ndarray) -> List[Optional[str]]:
+    # 下标 -1 落在末尾追加的 None 上
+    values = table + [None]
+    return [values[c] for c in codes.tolist()]
+
+
+def _word_columns(flat: List[Any]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, TextStore]]:
+    """
+    标准词字典（word / start / end[, probability]，时间与概率为数字）转为列；
+    有其他字段或类型时返回 None，由调用方原样保存
+    """
+    try:
+        texts = TextStore([w["word"] for w in flat])
+        columns = [np.asarray([w["start"] for w in flat]), np.asarray([w["end"] for w in flat]),
+                   np.asarray([w.get("probability", np.nan) for w in flat])]
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if flat and any(c.dtype.kind not in "iuf" for c in columns):
+        return None
+    # 只有上述字段：字段数 = 3 + 是否有 probability
+    sizes = np.fromiter(map(len, flat), dtype=np.int64, count=len(flat))
+    if not np.array_equal(sizes, 3 + ~np.isnan(columns[2].astype(np.float64))):
+        return None
+    return (*(c.astype(np.float64) for c in columns), texts)
+
+
+class CompactSubtitleDoc:
+    __slots__ = ("language", "resolution", "fps", "recommended_style", "events_null",
+                 "start", "end", "ids", "text", "styles", "style_codes", "speakers", "speaker_codes",
+                 "word_counts", "word_offsets", "word_start", "word_end", "word_probability", "word_text",
+                 "raw_words")
+
+    def __init__(self, starts: Sequence[float], ends: Sequence[float], texts: Sequence[str],
+                 ids: Optional[Sequence[str]] = None, styles: Optional[Sequence[Optional[str]]] = None,
+                 speakers: Optional[Sequence[Optional[str]]] = None,
+                 words: Optional[Sequence[Optional[List[Dict[str, Any]]]]] = None,
+                 language: Optional[str] = None, resolution: Optional[Dict[str, int]] = None,
+                 fps: Optional[float] = None, recommended_style: Union[AssStyle, Dict[str, Any], None] = None,
+                 events_null: bool = False):
+        """
+        按列构造（各列长度相同）；ids 缺省为 "1".."n"，styles / speakers / words 缺省为全 None
+        """
+        n = len(texts)
+        try:
+            self.start = np.asarray(starts, dtype=np.float64)
+            self.end = np.asarray(ends, dtype=np.float64)
+            self.text = TextStore(texts)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid subtitle events: {e}") from e
+        if len(self.start) != n or len(self.end) != n:
+            raise ValueError("Subtitle columns must have the same length")
+        if ids is not None:
+            ids = [str(i) for i in ids]
+            # 顺序编号不单独保存
+            if ids == [str(i) for i in range(1, n + 1)]:
+                ids = None
+        self.ids = TextStore(ids) if ids is not None else None
+        self.styles, self.style_codes = _intern(styles if styles is not None else [None] * n)
+        self.speakers, self.speaker_codes = _intern(speakers if speakers is not None else [None] * n)
+        self._set_words(words if words is not None else [None] * n)
+        self.language = language
+        self.resolution = resolution
+        self.fps = fps
+        self.recommended_style = (AssStyle.model_validate(recommended_style)
+                                  if isinstance(recommended_style, dict) else recommended_style)
+        self.events_null = events_null
+
+    def _set_words(self, word_lists: Sequence[Optional[List[Dict[str, Any]]]]):
+        counts = np.fromiter((-1 if ws is None else len(ws) for ws in word_lists), dtype=np.int32,
+                             count=len(word_lists))
+        flat = [w for ws in word_lists if ws for w in ws]
+        self.word_counts = counts
+        self.word_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(np.maximum(counts, 0), out=self.word_offsets[1:])
+        self.word_start = self.word_end = self.word_probability = self.word_text = None
+        self.raw_words = None
+        columns = _word_columns(flat)
+        if columns is None:
+            self.raw_words = flat
+        else:
+            self.word_start, self.word_end, self.word_probability, self.word_text = columns
+
+    # ---- 构造 ----
+
+    @classmethod
+    def from_events(cls, events: Optional[Sequence[Any]], **meta) -> "CompactSubtitleDoc":
+        """事件字典或 SubtitleEvent 模型列表；取值方式按第一个事件的类型确定一次"""
+        events_null = events is None
+        events = events or []
+        try:
+            if events and isinstance(events[0], dict):
+                columns = ([ev["start"] for ev in events], [ev["end"] for ev in events],
+                           [ev["text"] for ev in events], [ev["id"] for ev in events],
+                           [ev.get("style") for ev in events], [ev.get("speaker") for ev in events],
+                           [ev.get("words") for ev in events])
+            else:
+                columns = ([ev.start for ev in events], [ev.end for ev in events], [ev.text for ev in events],
+                           [ev.id for ev in events], [ev.style for ev in events], [ev.speaker for ev in events],
+                           [ev.words for ev in events])
+        except (KeyError, AttributeError) as e:
+            raise ValueError(f"Invalid subtitle event: missing {e}") from e
+        return cls(*columns, events_null=events_null, **meta)
+
+    @classmethod
+    def from_doc(cls, doc: Union[SubtitleDoc, Dict[str, Any], "CompactSubtitleDoc"]) -> "CompactSubtitleDoc":
+        if isinstance(doc, CompactSubtitleDoc):
+            return doc
+        get = doc.get if isinstance(doc, dict) else lambda name: getattr(doc, name)
+        return cls.from_events(get("events"), language=get("language"), resolution=get("resolution"),
+                               fps=get("fps"), recommended_style=get("recommended_style"))
+
+    @classmethod
+    def from_segments(cls, segments: Sequence[Dict[str, Any]], language: Optional[str] = None,
+                      style: Optional[str] = None, words: bool = False) -> "CompactSubtitleDoc":
+        """转写分段（start / end / text[, words]）→ 文档，id 按顺序编号，所有事件使用同一样式"""
+        n = len(segments)
+        return cls([seg["start"] for seg in segments], [seg["end"] for seg in segments],
+                   [seg["text"] for seg in segments], styles=[style] * n,
+                   words=[seg.get("words") for seg in segments] if words else None, language=language)
+
+    # ---- 读取 ----
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __repr__(self) -> str:
+        return (f"CompactSubtitleDoc(language={self.language!r}, events={len(self)}, "
+                f"words={int(self.word_offsets[-1])}, nbytes={self.nbytes})")
+
+    def __str__(self) -> str:
+        # 作为 Agent 工具结果时以 JSON 呈现全部内容
+        return json.dumps(self.model_dump(), ensure_ascii=False)
+
+    def _range(self, lo: int, hi: Optional[int]) -> Tuple[int, int]:
+        n = len(self)
+        return min(lo, n), n if hi is None else min(hi, n)
+
+    def columns(self, lo: int = 0, hi: Optional[int] = None
+                ) -> Tuple[List[float], List[float], List[str], List[Optional[str]]]:
+        """[lo, hi) 范围的 start / end / text / style 列，供序列化使用"""
+        lo, hi = self._range(lo, hi)
+        return (self.start[lo:hi].tolist(), self.end[lo:hi].tolist(), self.text.tolist(lo, hi),
+                _lookup(self.styles, self.style_codes[lo:hi]))
+
+    def _words(self, lo: int, hi: int) -> List[Optional[List[Dict[str, Any]]]]:
+        first, last = int(self.word_offsets[lo]), int(self.word_offsets[hi])
+        if self.raw_words is not None:
+            flat = self.raw_words[first:last]
+        else:
+            # NaN（p != p）表示原词字典没有 probability
+            flat = [{"word": w, "start": s, "end": e} if p != p else {"word": w, "start": s, "end": e, "probability": p}
+                    for w, s, e, p in zip(self.word_text.tolist(first, last),
+                                          self.word_start[first:last].tolist(), self.word_end[first:last].tolist(),
+                                          self.word_probability[first:last].tolist())]
+        offsets = (self.word_offsets[lo:hi + 1] - first).tolist()
+        return [None if c < 0 else flat[a:b]
+                for c, a, b in zip(self.word_counts[lo:hi].tolist(), offsets, offsets[1:])]
+
+    def event_dicts(self, lo: int = 0, hi: Optional[int] = None) -> List[Dict[str, Any]]:
+        """[lo, hi) 范围的事件字典，字段与 SubtitleEvent.model_dump() 相同"""
+        lo, hi = self._range(lo, hi)
+        ids = self.ids.tolist(lo, hi) if self.ids is not None else [str(i) for i in range(lo + 1, hi + 1)]
+        starts, ends, texts, styles = self.columns(lo, hi)
+        speakers = _lookup(self.speakers, self.speaker_codes[lo:hi])
+        return [{"id": i, "start": s, "end": e, "text": t, "speaker": sp, "words": w, "style": st}
+                for i, s, e, t, sp, w, st in zip(ids, starts, ends, texts, speakers, self._words(lo, hi), styles)]
+
+    def model_dump(self) -> Dict[str, Any]:
+        """与 SubtitleDoc.model_dump() 相同的字典（不经过 pydantic 校验）"""
+        style = self.recommended_style
+        return {
+            "language": self.language,
+            "resolution": self.resolution,
+            "fps": self.fps,
+            "events": None if self.events_null else self.event_dicts(),
+            "recommended_style": style.model_dump() if style is not None else None,
+        }
+
+    def to_model(self) -> SubtitleDoc:
+        """API 边界：转为 pydantic 模型（整批校验）"""
+        return SubtitleDoc.model_validate(self.model_dump())
+
+    @property
+    def nbytes(self) -> int:
+        """列数据占用的字节数（不含字符串表与回退的词字典）"""
+        total = self.start.nbytes + self.end.nbytes + self.text.nbytes + self.style_codes.nbytes
+        total += self.speaker_codes.nbytes + self.word_counts.nbytes + self.word_offsets.nbytes
+        if self.ids is not None:
+            total += self.ids.nbytes
+        if self.raw_words is None:
+            total += self.word_start.nbytes + self.word_end.nbytes + self.word_probability.nbytes
+            total += self.word_text.nbytes
+        return total
+
@@ -0,0 +1,72 @@
+"""
+内容标识 - 边写盘边计算 SHA-256，以及基于大小 + 采样块的快速指纹
+上传文件只读一遍即可得到摘要，缓存 key 不再需要二次读取整个文件。
+"""
+import hashlib
+import os
+from typing import BinaryIO, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+FINGERPRINT_SAMPLES = 8
+FINGERPRINT_BLOCK = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def copy_and_hash(src: BinaryIO, dest_path: str, chunk_size: int = CHUNK_SIZE,
+                  max_size: Optional[int] = None) -> Tuple[int, str]:
+    """
+    以固定大小分块将 src 写入 dest_path，同一遍计算 SHA-256
+
+    Returns:
+        (写入字节数, sha256 十六进制摘要)
+    Raises:
+        UploadTooLarge: 超过 max_size 时删除已写入部分并抛出
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return size, digest.hexdigest()
+
+
+def file_digest(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """流式计算已有文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(path: str, samples: int = FINGERPRINT_SAMPLES, block: int = FINGERPRINT_BLOCK) -> str:
+    """
+    快速指纹：文件大小 + 首尾及均匀分布的采样块，读取量与文件大小无关
+    仅用于预检（判断文件是否可能未变化），不能代替完整摘要
+    """
+    size = os.path.getsize(path)
+    h = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        if size <= samples * block:
+            h.update(f.read())
+        else:
+            step = (size - block) / (samples - 1)
+            for i in range(samples):
+                f.seek(int(i * step))
+                h.update(f.read(block))
+    return f"{size}-{h.hexdigest()}"
@@ -0,0 +1,383 @@
+"""
+大文件下载 - Range / multipart/byteranges、强 ETag 与条件请求（304 / 412）
+ETag 由内容摘要生成（调用方提供，通常来自 services/storage.py 的持久化摘要缓存），
+摘要计算与文件读取都在线程池中进行，不阻塞事件循环。
+服务器支持 ASGI zerocopysend 扩展时通过 sendfile 发送，否则按 1 MiB 分块读取发送。
+follow_file 用于仍在写入的文件（分片 MP4 烧录输出），边写边发送。
+"""
+import asyncio
+import mimetypes
+import os
+import secrets
+import stat
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Callable, List, Mapping, Optional, Tuple, Union
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+    PROMETHEUS_AVAILABLE = True
+    METRIC_ACTIVE = Gauge('download_active', 'Downloads currently streaming', ['route'])
+    METRIC_REQUESTS = Counter('download_requests_total', 'Download requests by response status', ['route', 'status'])
+    METRIC_BYTES = Counter('download_bytes_total', 'Bytes sent by the download layer', ['route'])
+    METRIC_THROUGHPUT = Histogram('download_throughput_bytes_per_second', 'Per-download throughput', ['route'],
+                                  buckets=(1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9))
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+CHUNK_SIZE = 1024 * 1024
+MAX_RANGES = 16
+# 内容不可变的输出（如任务成品）
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+# 内容不可变且可由共享缓存 / CDN 缓存（如 HLS 分片）
+PUBLIC_IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# 可能被覆盖的文件：每次使用前用 ETag 重新验证
+REVALIDATE_CACHE = "no-cache"
+
+Range = Tuple[int, int]
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+class _DownloadStats:
+    """进程内并发与吞吐统计（未安装 prometheus_client 时同样可用）"""
+
+    def __init__(self):
+        self.active = 0
+        self.completed = 0
+        self.aborted = 0
+        self.bytes_sent = 0
+
+    def snapshot(self):
+        return {"active": self.active, "completed": self.completed, "aborted": self.aborted,
+                "bytes_sent": self.bytes_sent}
+
+
+download_stats = _DownloadStats()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[Range]]:
+    """
+    解析 Range 头，返回按起点排序、合并重叠后的闭区间列表
+
+    Returns:
+        None 表示忽略 Range（无此头、语法无效或区间过多），应返回完整内容
+    Raises:
+        RangeNotSatisfiable: 所有区间都超出文件范围
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges: List[Range] = []
+    for part in spec.split(","):
+        start_s, sep, end_s = part.strip().partition("-")
+        start_s, end_s = start_s.strip(), end_s.strip()
+        if not sep or not (start_s or end_s) or not (start_s or "0").isdigit() or not (end_s or "0").isdigit():
+            return None
+        if not start_s:
+            # 后缀区间: 最后 N 字节
+            length = int(end_s)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(start_s)
+        if end_s and int(end_s) < start:
+            return None
+        end = int(end_s) if end_s else size - 1
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if not ranges or size == 0:
+        raise RangeNotSatisfiable(header)
+
+    merged: List[Range] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+class RangeFileResponse(Response):
+    """
+    文件响应，按请求头处理 If-None-Match / If-Match / If-Modified-Since / If-Range 与 Range
+    etag 可以是字符串或返回内容摘要的函数（在线程池中调用，结果加引号作为强 ETag）
+    """
+
+    def __init__(self, path: str, media_type: Optional[str] = None, filename: Optional[str] = None,
+                 etag: Union[str, Callable[[], str], None] = None, cache_control: str = REVALIDATE_CACHE,
+                 headers: Optional[Mapping[str, str]] = None, stat_result: Optional[os.stat_result] = None,
+                 route: str = "file"):
+        self.path = path
+        self.status_code = 200
+        self.media_type = media_type or mimetypes.guess_type(filename or path)[0] or "application/octet-stream"
+        self.background = None
+        self.body = b""
+        self._etag = etag
+        self.stat_result = stat_result
+        self.route = route
+        self.init_headers(headers)
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("cache-control", cache_control)
+        if filename:
+            self.headers.setdefault("content-disposition", content_disposition(filename))
+
+    async def _resolve_etag(self) -> Optional[str]:
+        if self._etag is None:
+            return None
+        if callable(self._etag):
+            digest = await anyio.to_thread.run_sync(self._etag)
+        else:
+            digest = self._etag
+        return digest if digest.startswith('"') else f'"{digest}"'
+
+    def _finish_headers(self, status: int, length: int, extra: Mapping[str, str]) -> List[Tuple[bytes, bytes]]:
+        headers = [(k, v) for k, v in self.raw_headers if k not in (b"content-length", b"content-type")]
+        for k, v in extra.items():
+            headers.append((k.encode("latin-1"), v.encode("latin-1")))
+        headers.append((b"content-length", str(length).encode("latin-1")))
+        self.status_code = status
+        return headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            st = self.stat_result or await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            await Response("File not found", status_code=404)(scope, receive, send)
+            return
+        if not stat.S_ISREG(st.st_mode):
+            await Response("Not a file", status_code=404)(scope, receive, send)
+            return
+
+        request = Headers(scope=scope)
+        method = scope.get("method", "GET")
+        size = st.st_size
+        etag = await self._resolve_etag()
+        validators = {"last-modified": formatdate(st.st_mtime, usegmt=True)}
+        if etag:
+            validators["etag"] = etag
+
+        # 条件请求（RFC 9110 §13.2.2 的判定顺序）
+        if_match = request.get("if-match")
+        if if_match and not (etag and _etag_matches(if_match, etag, weak=False)):
+            await self._send_empty(send, 412, validators)
+            return
+        if_none_match = request.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = bool(etag) and _etag_matches(if_none_match, etag, weak=True)
+        else:
+            since = _http_date(request.get("if-modified-since"))
+            not_modified = since is not None and int(st.st_mtime) <= since
+        if not_modified and method in ("GET", "HEAD"):
+            await self._send_empty(send, 304, validators)
+            return
+
+        ranges = None
+        if method in ("GET", "HEAD") and "range" in request:
+            if_range = request.get("if-range")
+            honor = if_range is None or (
+                etag == if_range.strip() if if_range.strip().startswith('"')
+                else _http_date(if_range) is not None and int(st.st_mtime) <= _http_date(if_range))
+            if honor:
+                try:
+                    ranges = parse_range(request["range"], size)
+                except RangeNotSatisfiable:
+                    await self._send_empty(send, 416, {"content-range": f"bytes */{size}"})
+                    return
+
+        if ranges is None:
+            headers = self._finish_headers(200, size, {**validators, "content-type": self.media_type})
+            parts = [(None, 0, size)]
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            headers = self._finish_headers(206, end - start + 1, {
+                **validators, "content-type": self.media_type, "content-range": f"bytes {start}-{end}/{size}"})
+            parts = [(None, start, end - start + 1)]
+        else:
+            boundary = secrets.token_hex(16)
+            parts, length = [], 0
+            for start, end in ranges:
+                preamble = (f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode("latin-1")
+                parts.append((preamble, start, end - start + 1))
+                length += len(preamble) + end - start + 1 + 2
+            closing = f"--{boundary}--\r\n".encode("latin-1")
+            parts.append((closing, 0, 0))
+            headers = self._finish_headers(206, length + len(closing), {
+                **validators, "content-type": f"multipart/byteranges; boundary={boundary}"})
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": headers})
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            self._account(self.status_code, 0, None)
+            return
+        await self._send_parts(scope, send, parts, multipart=ranges is not None and len(ranges) > 1)
+
+    async def _send_empty(self, send: Send, status: int, extra: Mapping[str, str]):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": self._finish_headers(status, 0, extra)})
+        await send({"type": "http.response.body", "body": b""})
+        self._account(status, 0, None)
+
+    async def _send_parts(self, scope: Scope, send: Send, parts, multipart: bool):
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        sent, started = 0, time.perf_counter()
+        download_stats.active += 1
+        if PROMETHEUS_AVAILABLE:
+            METRIC_ACTIVE.labels(route=self.route).inc()
+        completed = False
+        try:
+            f = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                for index, (preamble, offset, count) in enumerate(parts):
+                    last = index == len(parts) - 1
+                    if preamble:
+                        await send({"type": "http.response.body", "body": preamble, "more_body": True})
+                    if count and zerocopy:
+                        await send({"type": "http.response.zerocopysend", "file": f, "offset": offset,
+                                    "count": count, "more_body": True})
+                        sent += count
+                    elif count:
+                        await anyio.to_thread.run_sync(f.seek, offset)
+                        remaining = count
+                        while remaining:
+                            chunk = await anyio.to_thread.run_sync(f.read, min(CHUNK_SIZE, remaining))
+                            if not chunk:
+                                raise OSError(f"{self.path} shrank while sending")
+                            remaining -= len(chunk)
+                            sent += len(chunk)
+                            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    if multipart and count:
+                        await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+                    if last:
+                        await send({"type": "http.response.body", "body": b"", "more_body": False})
+            finally:
+                await anyio.to_thread.run_sync(f.close)
+            completed = True
+        finally:
+            download_stats.active -= 1
+            download_stats.bytes_sent += sent
+            if completed:
+                download_stats.completed += 1
+            else:
+                download_stats.aborted += 1
+            if PROMETHEUS_AVAILABLE:
+                METRIC_ACTIVE.labels(route=self.route).dec()
+            self._account(self.status_code, sent, time.perf_counter() - started if completed else None)
+
+    def _account(self, status: int, sent: int, elapsed: Optional[float]):
+        if not PROMETHEUS_AVAILABLE:
+            return
+        METRIC_REQUESTS.labels(route=self.route, status=str(status)).inc()
+        if sent:
+            METRIC_BYTES.labels(route=self.route).inc(sent)
+        if elapsed and sent:
+            METRIC_THROUGHPUT.labels(route=self.route).observe(sent / elapsed)
+
+
+async def follow_file(path: str, is_done: Callable[[], bool], poll_interval: float = 0.25,
+                      idle_timeout: float = 120.0, route: str = "follow") -> AsyncIterator[bytes]:
+    """
+    读取仍在写入的文件，直到 is_done() 为真且已读到末尾
+    文件尚未创建时等待；文件被截断（如任务重试重新写入）或超过 idle_timeout 秒没有新数据时结束
+    """
+    waited = 0.0
+    while not os.path.exists(path):
+        if is_done() or waited >= idle_timeout:
+            return
+        await asyncio.sleep(poll_interval)
+        waited += poll_interval
+
+    sent, started = 0, time.perf_counter()
+    download_stats.active += 1
+    if PROMETHEUS_AVAILABLE:
+        METRIC_ACTIVE.labels(route=route).inc()
+    completed = False
+    try:
+        f = await anyio.to_thread.run_sync(open, path, "rb")
+        try:
+            idle = 0.0
+            while True:
+                # 先取状态再读，保证结束前的最后一批数据不会漏读
+                done = is_done()
+                chunk = await anyio.to_thread.run_sync(f.read, CHUNK_SIZE)
+                if chunk:
+                    sent += len(chunk)
+                    idle = 0.0
+                    yield chunk
+                    continue
+                if done or os.path.getsize(path) < sent or idle >= idle_timeout:
+                    break
+                await asyncio.sleep(poll_interval)
+                idle += poll_interval
+        finally:
+            await anyio.to_thread.run_sync(f.close)
+        completed = True
+    finally:
+        download_stats.active -= 1
+        download_stats.bytes_sent += sent
+        if completed:
+            download_stats.completed += 1
+        else:
+            download_stats.aborted += 1
+        if PROMETHEUS_AVAILABLE:
+            METRIC_ACTIVE.labels(route=route).dec()
+            METRIC_REQUESTS.labels(route=route, status="200").inc()
+            METRIC_BYTES.labels(route=route).inc(sent)
+            if completed and sent:
+                METRIC_THROUGHPUT.labels(route=route).observe(sent / max(time.perf_counter() - started, 1e-6))
+
+
+class RangeStaticFiles(StaticFiles):
+    """StaticFiles，文件响应改用 RangeFileResponse（多段 Range、内容摘要 ETag）"""
+
+    def __init__(self, *args, etag_for: Optional[Callable[[str], str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.etag_for = etag_for
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        path = str(full_path)
+        etag = (lambda: self.etag_for(path)) if self.etag_for else None
+        return RangeFileResponse(path, etag=etag, stat_result=stat_result, route="outputs")
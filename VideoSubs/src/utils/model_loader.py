@@ -26,6 +26,81 @@ if getattr(sys, 'frozen', False):
 _current_model_size = None
 _current_model = None
 
+# Opt-in dynamic int8 quantization for CPU inference (WHISPER_QUANTIZE=int8)
+QUANTIZE_MODE = os.environ.get("WHISPER_QUANTIZE", "").strip().lower()
+QUANT_CACHE_DIR = os.environ.get(
+    "WHISPER_QUANT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "whisper", "quantized")
+)
+
+
+def quantization_enabled() -> bool:
+    return QUANTIZE_MODE in ("int8", "1", "true")
+
+
+def cpu_thread_count(quantized: bool = False) -> int:
+    """
+    Intra-op thread count for CPU inference in this process.
+    TORCH_THREADS wins if set; in quantized CPU mode the cores are split evenly
+    between ASR worker processes (ASR_WORKERS), otherwise keep the old default of 2.
+    """
+    if os.environ.get("TORCH_THREADS"):
+        return int(os.environ["TORCH_THREADS"])
+    if quantized:
+        workers = max(1, int(os.environ.get("ASR_WORKERS", "1") or 1))
+        return max(1, (os.cpu_count() or 2) // workers)
+    return 2
+
+
+def configure_threads(quantized: bool = False) -> int:
+    """Set torch intra-op threads for this process (see cpu_thread_count)."""
+    threads = cpu_thread_count(quantized)
+    torch.set_num_threads(threads)
+    if quantized:
+        try:
+            # Only allowed before any inter-op parallel work has started
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+    return threads
+
+
+def quantize_model(model):
+    """Apply dynamic int8 quantization to every Linear layer of a CPU fp32 Whisper model."""
+    # whisper.model.Linear only overrides forward() to cast weights for fp16;
+    # quantize_dynamic matches exact types, so fold it back to nn.Linear first.
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_cache_path(model_size: str) -> str:
+    torch_version = torch.__version__.split("+")[0]
+    return os.path.join(QUANT_CACHE_DIR, f"{model_size}-int8-torch{torch_version}.pt")
+
+
+def load_quantized_model(model_size: str):
+    """Load the int8 model from the on-disk cache, quantizing and caching it on first use."""
+    path = _quantized_cache_path(model_size)
+    if os.path.isfile(path):
+        try:
+            model = torch.load(path, map_location="cpu", weights_only=False)
+            print(f"Loaded quantized Whisper model from {path}")
+            return model
+        except Exception as e:
+            print(f"Quantized cache unreadable ({e}), rebuilding...")
+
+    model = quantize_model(whisper.load_model(model_size, device="cpu"))
+    try:
+        os.makedirs(QUANT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+        print(f"Quantized Whisper model cached at {path}")
+    except Exception as e:
+        print(f"Failed to cache quantized model: {e}")
+    return model
+
 
 def _get_device():
     """Detect best available device without allocating GPU memory."""
@@ -53,6 +128,11 @@ def unload_model():
         print("Model unloaded from memory.")
 
 
+def loaded_model_size():
+    """Size of the model currently held in memory, or None."""
+    return _current_model_size if _current_model is not None else None
+
+
 def get_whisper_model(model_size: ModelSize = None):
     """Get Whisper model. Keeps only ONE model in memory at a time."""
     global _current_model, _current_model_size
@@ -71,18 +151,26 @@ def get_whisper_model(model_size: ModelSize = None):
 
     device = _get_device()
 
-    print(f"Loading Whisper model: {model_size} on {device}")
+    quantized = device == "cpu" and quantization_enabled()
+    print(f"Loading Whisper model: {model_size} on {device}" + (" (int8)" if quantized else ""))
 
     try:
-        model = whisper.load_model(model_size, device=device)
+        if quantized:
+            model = load_quantized_model(model_size)
+        else:
+            model = whisper.load_model(model_size, device=device)
     except Exception as e:
         if device == "cuda":
             print(f"GPU load failed: {e}. Retrying on CPU...")
             device = "cpu"
-            model = whisper.load_model(model_size, device=device)
+            quantized = quantization_enabled()
+            model = load_quantized_model(model_size) if quantized else whisper.load_model(model_size, device=device)
         else:
             raise e
 
+    if device == "cpu":
+        print(f"Torch threads: {configure_threads(quantized)}")
+
     # Clean up any fragmented GPU memory
     if device == "cuda":
         torch.cuda.empty_cache()
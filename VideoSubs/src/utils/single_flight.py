@@ -0,0 +1,53 @@
+"""
+Single-flight 请求合并 - 相同 key 的并发调用只执行一次，其余调用等待并共享结果
+用于避免重复提交的同一文件被并发转写多次。
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+try:
+    from prometheus_client import Counter
+    PROMETHEUS_AVAILABLE = True
+    METRIC_COALESCED = Counter('single_flight_coalesced_total', 'Calls that joined an in-flight computation', ['group'])
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+
+class SingleFlight:
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        执行 fn()；若相同 key 的调用正在进行，则阻塞等待其结果（异常同样共享）
+
+        结果对象在所有调用者间共享，调用者不应原地修改。
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            if PROMETHEUS_AVAILABLE:
+                METRIC_COALESCED.labels(group=self.name).inc()
+            print(f"[SINGLE-FLIGHT] {self.name}: joined in-flight call for {key}")
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return future.result()
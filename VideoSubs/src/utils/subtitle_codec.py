@@ -0,0 +1,252 @@
+"""
+SubtitleDoc 紧凑二进制格式（.vsub）- 列式存储、分块压缩、按时间窗口惰性读取
+仅依赖标准库（struct / array / zlib）。API 边界仍输出 JSON（dict）。
+
+文件布局（小端）:
+    header   MAGIC | version u16 | flags u16 | n_events u32 | n_blocks u32 | meta_len u32
+    meta     zlib(JSON)：language / resolution / fps / recommended_style / styles / speakers
+    index    n_blocks × (t_min f64, t_max f64, first u32, count u32, offset u64, comp_len u32)
+    blocks   zlib(列数据)，offset 相对文件起始
+
+块内列数据:
+    start f64[n], end f64[n]
+    id / text: 偏移 u32[n+1] + UTF-8 blob
+    style / speaker: 字符串表下标 i32[n]（-1 为 None）
+    words: 每事件词数 i32[n]（-1 为 None）
+           列式模式 start f64[m], end f64[m], probability f64[m]（NaN 为缺省）, word 偏移 u32[m+1] + blob
+           非标准词字典回退为 JSON blob
+"""
+import io
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+MAGIC = b"VSUB"
+VERSION = 1
+BLOCK_EVENTS = 256
+WORDS_COLUMNAR = 1
+WORDS_JSON = 2
+
+_HEADER = struct.Struct("<4sHHIII")
+_INDEX_ENTRY = struct.Struct("<ddIIQI")
+_BLOCK_HEADER = struct.Struct("<IBI")  # count, words_mode, words_total
+_WORD_KEYS = {"word", "start", "end"}
+_WORD_KEYS_PROB = {"word", "start", "end", "probability"}
+_SWAP = sys.byteorder != "little"
+
+
+class SubtitleCodecError(ValueError):
+    pass
+
+
+def _pack(typecode: str, values) -> bytes:
+    arr = array(typecode, values)
+    if _SWAP:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack(typecode: str, data: memoryview, pos: int, count: int) -> Tuple[array, int]:
+    arr = array(typecode)
+    end = pos + count * arr.itemsize
+    arr.frombytes(data[pos:end])
+    if _SWAP:
+        arr.byteswap()
+    return arr, end
+
+
+def _pack_strings(values: List[str]) -> bytes:
+    offsets = [0]
+    blob = bytearray()
+    for v in values:
+        blob += v.encode("utf-8")
+        offsets.append(len(blob))
+    return _pack("I", offsets) + bytes(blob)
+
+
+def _unpack_strings(data: memoryview, pos: int, count: int) -> Tuple[List[str], int]:
+    offsets, pos = _unpack("I", data, pos, count + 1)
+    blob = bytes(data[pos:pos + offsets[-1]])
+    return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)], pos + offsets[-1]
+
+
+def _intern(table: Dict[str, int], value: Optional[str]) -> int:
+    if value is None:
+        return -1
+    return table.setdefault(value, len(table))
+
+
+def _encode_block(events: List[Dict[str, Any]], styles: Dict[str, int], speakers: Dict[str, int]) -> bytes:
+    word_lists = [ev.get("words") for ev in events]
+    flat = [w for ws in word_lists if ws for w in ws]
+    columnar = all(isinstance(w, dict) and set(w) in (_WORD_KEYS, _WORD_KEYS_PROB)
+                   and isinstance(w["word"], str) for w in flat)
+    mode = WORDS_COLUMNAR if columnar else WORDS_JSON
+
+    parts = [
+        _BLOCK_HEADER.pack(len(events), mode, len(flat)),
+        _pack("d", [float(ev["start"]) for ev in events]),
+        _pack("d", [float(ev["end"]) for ev in events]),
+        _pack_strings([str(ev["id"]) for ev in events]),
+        _pack_strings([ev["text"] for ev in events]),
+        _pack("i", [_intern(styles, ev.get("style")) for ev in events]),
+        _pack("i", [_intern(speakers, ev.get("speaker")) for ev in events]),
+        _pack("i", [-1 if ws is None else len(ws) for ws in word_lists]),
+    ]
+    if mode == WORDS_COLUMNAR:
+        parts += [
+            _pack("d", [float(w["start"]) for w in flat]),
+            _pack("d", [float(w["end"]) for w in flat]),
+            _pack("d", [float(w["probability"]) if "probability" in w else math.nan for w in flat]),
+            _pack_strings([w["word"] for w in flat]),
+        ]
+    else:
+        blob = json.dumps(flat, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        parts += [struct.pack("<I", len(blob)), blob]
+    return zlib.compress(b"".join(parts), 6)
+
+
+def _decode_block(payload: bytes, styles: List[str], speakers: List[str]) -> List[Dict[str, Any]]:
+    data = memoryview(zlib.decompress(payload))
+    count, mode, words_total = _BLOCK_HEADER.unpack_from(data, 0)
+    pos = _BLOCK_HEADER.size
+    starts, pos = _unpack("d", data, pos, count)
+    ends, pos = _unpack("d", data, pos, count)
+    ids, pos = _unpack_strings(data, pos, count)
+    texts, pos = _unpack_strings(data, pos, count)
+    style_idx, pos = _unpack("i", data, pos, count)
+    speaker_idx, pos = _unpack("i", data, pos, count)
+    word_counts, pos = _unpack("i", data, pos, count)
+
+    if mode == WORDS_COLUMNAR:
+        w_starts, pos = _unpack("d", data, pos, words_total)
+        w_ends, pos = _unpack("d", data, pos, words_total)
+        w_probs, pos = _unpack("d", data, pos, words_total)
+        w_texts, pos = _unpack_strings(data, pos, words_total)
+        flat = []
+        for i in range(words_total):
+            word = {"word": w_texts[i], "start": w_starts[i], "end": w_ends[i]}
+            if not math.isnan(w_probs[i]):
+                word["probability"] = w_probs[i]
+            flat.append(word)
+    else:
+        (blob_len,) = struct.unpack_from("<I", data, pos)
+        flat = json.loads(bytes(data[pos + 4:pos + 4 + blob_len]))
+
+    events = []
+    w = 0
+    for i in range(count):
+        n = word_counts[i]
+        words = None if n < 0 else flat[w:w + n]
+        w += max(n, 0)
+        events.append({
+            "id": ids[i],
+            "start": starts[i],
+            "end": ends[i],
+            "text": texts[i],
+            "speaker": speakers[speaker_idx[i]] if speaker_idx[i] >= 0 else None,
+            "words": words,
+            "style": styles[style_idx[i]] if style_idx[i] >= 0 else None,
+        })
+    return events
+
+
+def encode_doc(doc: Dict[str, Any], block_events: int = BLOCK_EVENTS) -> bytes:
+    """将 SubtitleDoc 字典编码为 .vsub 字节串"""
+    events = doc.get("events")
+    event_list = events or []
+    styles: Dict[str, int] = {}
+    speakers: Dict[str, int] = {}
+
+    blocks = []
+    for i in range(0, len(event_list), block_events):
+        chunk = event_list[i:i + block_events]
+        t_min = min(float(ev["start"]) for ev in chunk)
+        t_max = max(float(ev["end"]) for ev in chunk)
+        blocks.append((t_min, t_max, i, len(chunk), _encode_block(chunk, styles, speakers)))
+
+    meta = {k: v for k, v in doc.items() if k != "events"}
+    meta["_events_null"] = events is None
+    meta["_styles"] = list(styles)
+    meta["_speakers"] = list(speakers)
+    meta_blob = zlib.compress(json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    offset = _HEADER.size + len(meta_blob) + _INDEX_ENTRY.size * len(blocks)
+    index = bytearray()
+    for t_min, t_max, first, count, payload in blocks:
+        index += _INDEX_ENTRY.pack(t_min, t_max, first, count, offset, len(payload))
+        offset += len(payload)
+
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(event_list), len(blocks), len(meta_blob))
+    return b"".join([header, meta_blob, bytes(index)] + [b[4] for b in blocks])
+
+
+def _read_header(f) -> Tuple[Dict[str, Any], List[Tuple]]:
+    raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise SubtitleCodecError("Truncated subtitle file")
+    magic, version, _flags, _n_events, n_blocks, meta_len = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise SubtitleCodecError("Not a .vsub subtitle file")
+    if version > VERSION:
+        raise SubtitleCodecError(f"Unsupported .vsub version: {version}")
+    meta = json.loads(zlib.decompress(f.read(meta_len)))
+    index_raw = f.read(_INDEX_ENTRY.size * n_blocks)
+    index = [_INDEX_ENTRY.unpack_from(index_raw, i * _INDEX_ENTRY.size) for i in range(n_blocks)]
+    return meta, index
+
+
+def _read_doc(f, start: Optional[float], end: Optional[float]) -> Dict[str, Any]:
+    meta, index = _read_header(f)
+    styles, speakers = meta.pop("_styles"), meta.pop("_speakers")
+    events_null = meta.pop("_events_null")
+    windowed = start is not None or end is not None
+    lo = -math.inf if start is None else start
+    hi = math.inf if end is None else end
+
+    events = []
+    for t_min, t_max, _first, _count, offset, comp_len in index:
+        # 只解压与窗口相交的块
+        if windowed and (t_max < lo or t_min > hi):
+            continue
+        f.seek(offset)
+        block = _decode_block(f.read(comp_len), styles, speakers)
+        if windowed:
+            block = [ev for ev in block if ev["end"] >= lo and ev["start"] <= hi]
+        events.extend(block)
+
+    meta["events"] = None if events_null and not windowed else events
+    return meta
+
+
+def decode_doc(data: bytes, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+    """解码 .vsub 字节串；给出 start/end 时只返回与该时间窗口相交的事件"""
+    return _read_doc(io.BytesIO(data), start, end)
+
+
+def read_doc(path: str, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+    """从文件读取 SubtitleDoc 字典；给出时间窗口时只读取并解压相交的块"""
+    with open(path, "rb") as f:
+        return _read_doc(f, start, end)
+
+
+def write_doc(path: str, doc: Dict[str, Any]) -> int:
+    """原子写入 .vsub 文件，返回写入字节数"""
+    data = encode_doc(doc)
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(data)
@@ -0,0 +1,292 @@
+"""
+字幕导出 - SubtitleDoc 一遍序列化为 SRT / ASS / WebVTT / JSON
+每块事件先按列取出字段（dict 或 pydantic 模型只判断一次，CompactSubtitleDoc 直接切片列数据），整列时间戳用 numpy 一次拆分为时分秒，
+再拼接成一个字符串产出；可写入任意文本流、按任务分配的路径，或直接作为 HTTP 流式响应。
+
+    for chunk in serialize(doc, "srt"): ...
+    write_subtitles(doc, "ass", "outputs/<task_id>/out.ass", width=1920, height=1080)
+
+基准: python benchmarks/bench_subtitle_export.py --events 100000
+"""
+import json
+import os
+import tempfile
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from src.utils.compact_doc import CompactSubtitleDoc
+
+FORMATS = ("srt", "ass", "vtt", "json")
+MEDIA_TYPES = {
+    "srt": "application/x-subrip; charset=utf-8",
+    "ass": "text/x-ssa; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+    "json": "application/json",
+}
+# 每块包含的事件数
+CHUNK_EVENTS = 2048
+
+ASS_STYLE_FORMAT = ("Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+                    "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+                    "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding")
+ASS_EVENT_FORMAT = "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"
+ASS_DEFAULT_STYLE = ("Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H64000000,"
+                     "-1,0,0,0,100,100,0,0,1,1,0,2,10,10,10,1")
+
+
+class SubtitleExportError(ValueError):
+    pass
+
+
+# ---- 时间戳 ----
+
+def _split_ms(t: float) -> Tuple[int, int, int, int]:
+    ms = int(round(max(t, 0.0) * 1000))
+    h, ms = divmod(ms, 3600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return h, m, s, ms
+
+
+def srt_time(t: float) -> str:
+    h, m, s, ms = _split_ms(t)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def vtt_time(t: float) -> str:
+    h, m, s, ms = _split_ms(t)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def ass_time(t: float) -> str:
+    cs = int(round(max(t, 0.0) * 100))
+    h, cs = divmod(cs, 360_000)
+    m, cs = divmod(cs, 6000)
+    s, cs = divmod(cs, 100)
+    return f"{h:d}:{m:02d}:{s:02d}.{cs:02d}"
+
+
+def hex_to_ass_color(hex_color: Optional[str], alpha: int = 0) -> str:
+    """#RRGGBB 与 CSS 透明度（0-255，255 不透明）转为 ASS &HAABBGGRR（00 不透明）"""
+    if not hex_color or not hex_color.startswith("#"):
+        return "&H00000000"
+    r, g, b = hex_color[1:3], hex_color[3:5], hex_color[5:7]
+    return f"&H{hex(255 - alpha)[2:].upper().zfill(2)}{b}{g}{r}"
+
+
+# ---- 事件读取 ----
+
+def _field(doc: Any, name: str, default: Any = None) -> Any:
+    return doc.get(name, default) if isinstance(doc, dict) else getattr(doc, name, default)
+
+
+def _columns(events: Sequence[Any]) -> Tuple[List[float], List[float], List[str], List[Optional[str]]]:
+    """start / end / text / style 列；取值方式按第一个事件的类型确定一次"""
+    if isinstance(events[0], dict):
+        return ([ev["start"] for ev in events], [ev["end"] for ev in events],
+                [ev["text"] for ev in events], [ev.get("style") for ev in events])
+    return ([ev.start for ev in events], [ev.end for ev in events],
+            [ev.text for ev in events], [ev.style for ev in events])
+
+
+def _clock(values: List[float], scale: int) -> Tuple[List[int], List[int], List[int], List[int]]:
+    """整批时间戳拆成 时 / 分 / 秒 / 小数单位（scale=1000 为毫秒，100 为厘秒），四舍五入后再进位"""
+    units = np.rint(np.maximum(np.asarray(values, dtype=np.float64), 0.0) * scale).astype(np.int64)
+    secs = units // scale
+    return (secs // 3600).tolist(), (secs // 60 % 60).tolist(), (secs % 60).tolist(), (units % scale).tolist()
+
+
+def _stamps(values: List[float], sep: str) -> List[str]:
+    return [f"{h:02d}:{m:02d}:{s:02d}{sep}{f:03d}" for h, m, s, f in zip(*_clock(values, 1000))]
+
+
+def _ass_stamps(values: List[float]) -> List[str]:
+    return [f"{h:d}:{m:02d}:{s:02d}.{f:02d}" for h, m, s, f in zip(*_clock(values, 100))]
+
+
+def _chunks(doc: Any) -> Iterator[Sequence[Any]]:
+    events = _field(doc, "events") or []
+    for i in range(0, len(events), CHUNK_EVENTS):
+        yield events[i:i + CHUNK_EVENTS]
+
+
+def _column_chunks(doc: Any) -> Iterator[Tuple[List[float], List[float], List[str], List[Optional[str]]]]:
+    """逐块的 start / end / text / style 列；CompactSubtitleDoc 直接切片列数据"""
+    if isinstance(doc, CompactSubtitleDoc):
+        for i in range(0, len(doc), CHUNK_EVENTS):
+            yield doc.columns(i, i + CHUNK_EVENTS)
+        return
+    for chunk in _chunks(doc):
+        yield _columns(chunk)
+
+
+def _cue_text(text: str) -> str:
+    """SRT / VTT 的空行会提前结束 cue"""
+    if "\n" not in text and "\r" not in text:
+        return text
+    return "\n".join(line for line in text.splitlines() if line.strip())
+
+
+# ---- 各格式 ----
+
+def iter_srt(doc: Any) -> Iterator[str]:
+    index = 1
+    for starts, ends, texts, _ in _column_chunks(doc):
+        yield "".join([
+            f"{i}\n{a} --> {b}\n{_cue_text(t)}\n\n"
+            for i, a, b, t in zip(range(index, index + len(texts)), _stamps(starts, ","), _stamps(ends, ","), texts)
+        ])
+        index += len(texts)
+
+
+def iter_vtt(doc: Any) -> Iterator[str]:
+    yield "WEBVTT\n\n"
+    for starts, ends, texts, _ in _column_chunks(doc):
+        yield "".join([
+            f"{a} --> {b}\n{_cue_text(t).replace('-->', '->')}\n\n"
+            for a, b, t in zip(_stamps(starts, "."), _stamps(ends, "."), texts)
+        ])
+
+
+def _ass_text(text: str) -> str:
+    """ASS 事件为单行：换行替换为空格，去掉 BOM"""
+    if "\n" in text or "\r" in text or "\ufeff" in text:
+        return text.replace("\r", " ").replace("\n", " ").replace("\ufeff", "")
+    return text
+
+
+def _ass_literal(text: str) -> str:
+    """纯文本转为 ASS 事件文本：换行写为 \\N，花括号转义（否则 libass 当作覆盖标签隐藏）"""
+    if any(c in text for c in "\n\r{}\ufeff"):
+        text = text.replace("\ufeff", "").replace("\r\n", "\n").replace("\r", "\n")
+        return text.replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+    return text
+
+
+def ass_style_line(style: Any) -> str:
+    def get(name, default=None):
+        value = _field(style, name)
+        return default if value is None else value
+
+    def flag(name):
+        return -1 if get(name) else 0
+
+    def color(name):
+        return hex_to_ass_color(get(f"{name}Colour"), get(f"{name}Alpha", 0))
+
+    return (f"Style: {get('Name')},{get('FontName')},{get('FontSize')},{color('Primary')},{color('Secondary')},"
+            f"{color('Outline')},{color('Back')},{flag('Bold')},{flag('Italic')},{flag('Underline')},"
+            f"{flag('StrikeOut')},{get('ScaleX', 100)},{get('ScaleY', 100)},{get('Spacing', 0)},{get('Angle', 0)},"
+            f"{get('BorderStyle', 1)},{get('Outline', 1)},{get('Shadow', 0)},{get('Alignment', 2)},"
+            f"{get('MarginL', 10)},{get('MarginR', 10)},{get('MarginV', 10)},{get('Encoding', 1)}")
+
+
+def iter_ass(doc: Any, width: Optional[int] = None, height: Optional[int] = None,
+             styles: Optional[Sequence[Any]] = None, literal_text: bool = False) -> Iterator[str]:
+    """
+    Args:
+        width / height: PlayResX / PlayResY，缺省取 doc.resolution，再缺省 1920x1080
+        styles: AssStyle 列表（模型或字典），缺省为内置 Default 样式
+        literal_text: 文本按纯文本转义（保留换行、花括号原样显示），用于 SRT / VTT 转换；
+            缺省与旧版写出一致：换行替换为空格，文本中的覆盖标签保持生效
+    """
+    ass_text = _ass_literal if literal_text else _ass_text
+    resolution = _field(doc, "resolution") or {}
+    width = width or resolution.get("width") or 1920
+    height = height or resolution.get("height") or 1080
+    style_lines = [ass_style_line(s) for s in styles] if styles else [ASS_DEFAULT_STYLE]
+    yield (f"[Script Info]\nScriptType: v4.00+\nPlayResX: {width}\nPlayResY: {height}\n\n"
+           f"[V4+ Styles]\n{ASS_STYLE_FORMAT}\n" + "".join(line + "\n" for line in style_lines)
+           + f"\n[Events]\n{ASS_EVENT_FORMAT}\n")
+    for starts, ends, texts, styles in _column_chunks(doc):
+        yield "".join([
+            f"Dialogue: 0,{a},{b},{st or 'Default'},,0,0,0,,{ass_text(t)}\n"
+            for a, b, t, st in zip(_ass_stamps(starts), _ass_stamps(ends), texts, styles)
+        ])
+
+
+def _plain(value: Any) -> Any:
+    return value.model_dump() if hasattr(value, "model_dump") else value
+
+
+def iter_json(doc: Any) -> Iterator[str]:
+    """与 SubtitleDoc.model_dump() 结构相同的紧凑 JSON，事件逐块输出"""
+    head = {key: _plain(_field(doc, key)) for key in ("language", "resolution", "fps", "recommended_style")}
+    yield json.dumps(head, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"events":['
+    dump = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    if isinstance(doc, CompactSubtitleDoc):
+        chunks = (doc.event_dicts(i, i + CHUNK_EVENTS) for i in range(0, len(doc), CHUNK_EVENTS))
+    else:
+        chunks = _chunks(doc)
+    first = True
+    for chunk in chunks:
+        # pydantic 模型用其原生序列化，字典用 json
+        items = [ev.model_dump_json() if hasattr(ev, "model_dump_json") else dump(ev) for ev in chunk]
+        yield ("" if first else ",") + ",".join(items)
+        first = False
+    yield "]}"
+
+
+_SERIALIZERS: Dict[str, Callable[..., Iterator[str]]] = {
+    "srt": iter_srt,
+    "ass": iter_ass,
+    "vtt": iter_vtt,
+    "json": iter_json,
+}
+
+
+def serialize(doc: Any, fmt: str, **options) -> Iterator[str]:
+    """按块产出字幕文本；options 只对 ASS 有效（width / height / styles / literal_text）"""
+    if fmt not in _SERIALIZERS:
+        raise SubtitleExportError(f"Unsupported subtitle format: {fmt} (available: {', '.join(FORMATS)})")
+    return _SERIALIZERS[fmt](doc, **options) if fmt == "ass" else _SERIALIZERS[fmt](doc)
+
+
+def to_string(doc: Any, fmt: str, **options) -> str:
+    return "".join(serialize(doc, fmt, **options))
+
+
+def write_subtitles(doc: Any, fmt: str, dest: Union[str, IO[str]], **options) -> Optional[str]:
+    """
+    写入文本流或文件路径（路径写入为原子替换，并发导出不会读到半个文件）
+
+    Returns:
+        dest 为路径时返回该路径
+    """
+    if not isinstance(dest, str):
+        for chunk in serialize(doc, fmt, **options):
+            dest.write(chunk)
+        return None
+    parent = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(parent, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+            for chunk in serialize(doc, fmt, **options):
+                f.write(chunk)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return dest
+
+
+def iter_encoded(doc: Any, fmt: str, **options) -> Iterator[bytes]:
+    """UTF-8 字节块，供 StreamingResponse 使用"""
+    for chunk in serialize(doc, fmt, **options):
+        yield chunk.encode("utf-8")
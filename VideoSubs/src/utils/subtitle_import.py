@@ -0,0 +1,375 @@
+"""
+字幕导入 - SRT / WebVTT / ASS / SSA 流式解析为 SubtitleEvent 与 AssStyle
+按块读取（文件不整体载入内存），每块用正则一次扫描出全部 cue，容错处理常见的不规范写法：
+
+    编码    BOM（UTF-8 / UTF-16 / UTF-32）、无 BOM 的 UTF-16，其余依次尝试 SUBTITLE_ENCODINGS
+    时间戳  缺少小时或毫秒、逗号 / 点 / 冒号分隔、任意位小数、箭头两侧空格；无法解析的 cue 跳过（strict=True 时报错）
+    结构    序号缺失、cue 之间缺少空行、VTT 的 NOTE / STYLE / REGION 块、ASS 的 Format 行字段顺序
+
+与 subtitle_export 互为逆操作：
+
+    doc, styles = load_subtitles("movie.srt")
+    write_subtitles(doc, "ass", "out.ass", styles=styles)
+
+基准: python benchmarks/bench_subtitle_import.py --cues 100000
+"""
+import codecs
+import html
+import os
+import re
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.agent.Subs import AssStyle, SubtitleDoc
+
+FORMATS = ("srt", "vtt", "ass")
+EXTENSIONS = {".srt": "srt", ".vtt": "vtt", ".ass": "ass", ".ssa": "ass"}
+# 无 BOM 且不是合法 UTF-8 时依次尝试（gb18030 几乎能解码任意字节，放在最后的 cp1252 只在其失败时使用）
+SUBTITLE_ENCODINGS = ("utf-8", "gb18030", "cp1252")
+# 编码检测读取的文件头大小
+SNIFF_BYTES = 64 * 1024
+# 按块读取文件的字符数；解析时重组为约 BLOCK_CHARS 大小、在 cue / 行边界断开的块
+READ_CHARS = 1 << 20
+BLOCK_CHARS = 1 << 16
+
+# [H:]MM:SS[.,:]fff —— 小时、小数部分均可省略
+_TIME = r"(?:(\d+)[ \t]*:[ \t]*)?(\d{1,2})[ \t]*:[ \t]*(\d{1,2})(?:[ \t]*[,.:][ \t]*(\d+))?"
+_TIMING_RE = re.compile(rf"^[ \t]*{_TIME}[ \t]*-+>[ \t]*{_TIME}(?=[ \t]|$)", re.M)
+_TIME_RE = re.compile(rf"^\s*{_TIME}\s*$")
+# 形如时间行（箭头前是一个以数字开头的词），包括写错的时间行；正文中的 "a --> b" 不算
+_TIMING_LIKE = r"[ \t]*\d\S*[ \t]*-+>"
+_TIMING_LIKE_RE = re.compile(_TIMING_LIKE)
+# 时间行（其后的设置忽略）+ 连续的非空文本行；文本行不能形如时间行，避免吞掉缺少空行分隔的下一条
+_CUE_RE = re.compile(
+    rf"^[ \t]*{_TIME}[ \t]*-+>[ \t]*{_TIME}(?=[ \t\n]|\Z)[^\n]*(?:\n|\Z)"
+    rf"((?:(?!{_TIMING_LIKE})[^\n]*\S[^\n]*(?:\n|\Z))*)",
+    re.M,
+)
+# 只去掉 SRT / WebVTT 的格式标签、cue 内时间戳与 ASS 覆盖标签，正文中的 "a < b" 保留
+_TAG_RE = re.compile(r"</?(?:[bius]|font|v|c|lang|ruby|rt)\b[^>]*>|<\d[\d:.]*>|\{\\[^}]*\}", re.I)
+_VOICE_RE = re.compile(r"^<v(?:\.[^\s>]*)?\s+([^>]+)>")
+# 转义的花括号（\{ \}）是正文，不是覆盖标签
+_OVERRIDE_RE = re.compile(r"(?<!\\)\{[^}]*\}")
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# ASS 规范中的默认字段顺序（文件缺少 Format 行时使用）
+ASS_EVENT_FIELDS = ("layer", "start", "end", "style", "name", "marginl", "marginr", "marginv", "effect", "text")
+ASS_STYLE_FIELDS = ("name", "fontname", "fontsize", "primarycolour", "secondarycolour", "outlinecolour",
+                    "backcolour", "bold", "italic", "underline", "strikeout", "scalex", "scaley", "spacing",
+                    "angle", "borderstyle", "outline", "shadow", "alignment", "marginl", "marginr", "marginv",
+                    "encoding")
+# SSA v4 的对齐方式（1-3 底部，5-7 顶部，9-11 居中）转为小键盘布局
+_SSA_ALIGNMENT = {1: 1, 2: 2, 3: 3, 5: 7, 6: 8, 7: 9, 9: 4, 10: 5, 11: 6}
+
+
+class SubtitleParseError(ValueError):
+    def __init__(self, message: str, line: Optional[int] = None):
+        super().__init__(f"line {line}: {message}" if line else message)
+        self.line = line
+
+
+# ---- 编码 ----
+
+def detect_encoding(head: bytes) -> str:
+    """根据文件头判断编码；BOM 优先，其次按 NUL 字节分布识别无 BOM 的 UTF-16"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    sample = head[:4096]
+    if len(sample) >= 4 and sample.count(0) > len(sample) // 4:
+        return "utf-16-le" if sample[1::2].count(0) > sample[0::2].count(0) else "utf-16-be"
+    for encoding in SUBTITLE_ENCODINGS:
+        try:
+            # 文件头可能在多字节字符中间截断
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def decode_subtitle(data: bytes, encoding: Optional[str] = None) -> str:
+    return data.decode(encoding or detect_encoding(data[:SNIFF_BYTES]), errors="replace")
+
+
+def open_subtitle(path: str, encoding: Optional[str] = None) -> IO[str]:
+    """按检测到的编码打开文本文件（无法解码的字节替换为 U+FFFD，换行统一为 \\n）"""
+    if encoding is None:
+        with open(path, "rb") as f:
+            encoding = detect_encoding(f.read(SNIFF_BYTES))
+    return open(path, encoding=encoding, errors="replace", newline=None)
+
+
+# ---- 分块 ----
+
+def _blocks(pieces: Iterable[str], sep: str) -> Iterator[Tuple[str, int]]:
+    """
+    将任意切分的文本片段（文件按块读取或逐行读取）重组为约 BLOCK_CHARS 大小、在 sep 处断开的块，
+    同时给出块首行号；换行统一为 \n
+    """
+    buffer, line = "", 1
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) < BLOCK_CHARS:
+            continue
+        if "\r" in buffer:
+            buffer = buffer.replace("\r\n", "\n").replace("\r", "\n")
+        cut = buffer.rfind(sep)
+        if cut < 0:
+            continue
+        block, buffer = buffer[:cut + 1], buffer[cut + len(sep):]
+        yield block, line
+        line += block.count("\n") + len(sep) - 1
+    if "\r" in buffer:
+        buffer = buffer.replace("\r\n", "\n").replace("\r", "\n")
+    if buffer:
+        yield buffer, line
+
+
+def read_pieces(f: IO[str]) -> Iterator[str]:
+    return iter(lambda: f.read(READ_CHARS), "")
+
+
+# ---- 时间戳与文本 ----
+
+def _seconds(h: Optional[str], m: str, s: str, frac: Optional[str]) -> float:
+    value = int(h or 0) * 3600 + int(m) * 60 + int(s)
+    return value + int(frac) / 10 ** len(frac) if frac else float(value)
+
+
+def parse_time(value: str) -> Optional[float]:
+    """'01:02:03,456' / '2:03.5' / '0:00:01.00' 等转为秒，无法解析时返回 None"""
+    m = _TIME_RE.match(value)
+    return _seconds(*m.groups()) if m else None
+
+
+def _plain_text(text: str) -> Tuple[str, Optional[str]]:
+    """去掉 HTML / ASS 标签与实体，返回（文本，VTT <v> 说话人）"""
+    speaker = None
+    if "<" in text or "{" in text or "&" in text:
+        m = _VOICE_RE.match(text)
+        if m:
+            speaker = m.group(1).strip()
+        text = html.unescape(_TAG_RE.sub("", text))
+    return text.strip(), speaker
+
+
+def _reject(strict: bool, message: str, line: int):
+    if strict:
+        raise SubtitleParseError(message, line)
+
+
+# ---- SRT / WebVTT ----
+
+def _check_timings(block: str, first_line: int):
+    """strict 模式：块中形如时间行的行都应是合法时间行，否则报告第一处"""
+    if block.count("-->") == len(_TIMING_RE.findall(block)):
+        return
+    for offset, line in enumerate(block.split("\n")):
+        if "-->" in line and _TIMING_LIKE_RE.match(line) and not _TIMING_RE.match(line):
+            raise SubtitleParseError(f"malformed timing line: {line!r}", first_line + offset)
+
+
+def iter_cues(pieces: Iterable[str], strict: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    SRT 与 WebVTT 共用，产出 SubtitleEvent 字段的字典
+    每块用一个正则扫描时间行及其后的非空行：序号 / cue 标识、WEBVTT 头、NOTE / STYLE 块等不含时间行的内容自然跳过；
+    cue 之间缺少空行时，紧接下一条时间行的纯数字行视为序号丢弃
+    """
+    count = 0
+    for block, first_line in _blocks(pieces, "\n\n"):
+        if strict:
+            _check_timings(block, first_line)
+        for m in _CUE_RE.finditer(block):
+            g = m.groups()
+            start, end = _seconds(*g[0:4]), _seconds(*g[4:8])
+            if end < start:
+                _reject(strict, f"end before start: {m.group(0).partition(chr(10))[0]!r}",
+                        first_line + block.count("\n", 0, m.start()))
+                continue
+            text = g[8]
+            if m.end() < len(block) and block[m.end()] != "\n":
+                # 文本被下一条时间行截断
+                head, _, last = text.rstrip("\n").rpartition("\n")
+                if last.strip().isdigit():
+                    text = head
+            text, speaker = _plain_text(text)
+            if text:
+                count += 1
+                yield {"id": str(count), "start": start, "end": end, "text": text, "speaker": speaker}
+
+
+# ---- ASS / SSA ----
+
+def ass_color_to_hex(value: str) -> Tuple[Optional[str], int]:
+    """ASS &HAABBGGRR / &HBBGGRR 或 SSA 十进制颜色转为（#RRGGBB，CSS 透明度 0-255），与 hex_to_ass_color 互逆"""
+    value = value.strip().rstrip("&")
+    try:
+        if value[:2].lower() == "&h":
+            number = int(value[2:], 16)
+        else:
+            number = int(value) & 0xFFFFFFFF
+    except ValueError:
+        return None, 255
+    r, g, b, a = number & 0xFF, (number >> 8) & 0xFF, (number >> 16) & 0xFF, (number >> 24) & 0xFF
+    return f"#{r:02X}{g:02X}{b:02X}", 255 - a
+
+
+def _number(value: str, cast=float) -> Optional[Any]:
+    try:
+        return cast(float(value)) if cast is int else cast(value)
+    except ValueError:
+        return None
+
+
+def _ass_style(fields: Dict[str, str], ssa: bool) -> AssStyle:
+    style: Dict[str, Any] = {
+        "Name": fields.get("name") or "Default",
+        "FontName": fields.get("fontname") or "Arial",
+        "FontSize": _number(fields.get("fontsize", "")) or 20.0,
+    }
+    # SSA 的 TertiaryColour 对应 ASS 的 OutlineColour
+    fields.setdefault("outlinecolour", fields.get("tertiarycolour", ""))
+    for name in ("Primary", "Secondary", "Outline", "Back"):
+        raw = fields.get(f"{name.lower()}colour")
+        if raw:
+            style[f"{name}Colour"], style[f"{name}Alpha"] = ass_color_to_hex(raw)
+    style.setdefault("PrimaryColour", "#FFFFFF")
+    for name in ("Bold", "Italic", "Underline", "StrikeOut"):
+        if name.lower() in fields:
+            style[name] = fields[name.lower()].strip() not in ("0", "")
+    for name in ("ScaleX", "ScaleY", "Spacing", "Angle", "Outline", "Shadow"):
+        if name.lower() in fields:
+            style[name] = _number(fields[name.lower()])
+    for name in ("BorderStyle", "Alignment", "MarginL", "MarginR", "MarginV", "Encoding"):
+        if name.lower() in fields:
+            style[name] = _number(fields[name.lower()], int)
+    if ssa and style.get("Alignment") is not None:
+        style["Alignment"] = _SSA_ALIGNMENT.get(style["Alignment"], style["Alignment"])
+    return AssStyle.model_validate(style)
+
+
+def _ass_text(text: str) -> str:
+    if "{" in text:
+        text = _OVERRIDE_RE.sub("", text)
+    text = text.replace("\\N", "\n").replace("\\n", "\n").replace("\\h", " ")
+    return text.replace("\\{", "{").replace("\\}", "}").strip()
+
+
+class AssReader:
+    """
+    ASS / SSA 流式解析：迭代产出 Dialogue 事件（SubtitleEvent 字段的字典），
+    [Script Info] 与样式表在读到时填入 info / styles（按规范二者位于 [Events] 之前）
+    """
+
+    def __init__(self, pieces: Iterable[str], strict: bool = False):
+        self.pieces = pieces
+        self.strict = strict
+        self.info: Dict[str, str] = {}
+        self.styles: List[AssStyle] = []
+
+    @property
+    def resolution(self) -> Optional[Dict[str, int]]:
+        width, height = _number(self.info.get("PlayResX", ""), int), _number(self.info.get("PlayResY", ""), int)
+        return {"width": width, "height": height} if width and height else None
+
+    def _section_line(self, section: str, line: str, lineno: int, state: Dict[str, Any]):
+        """[Script Info] / 样式表 / Format 行"""
+        name, sep, value = line.partition(":")
+        if not sep:
+            return
+        key, value = name.strip().lower(), value.strip()
+        if section == "[script info]":
+            self.info[name.strip()] = value
+        elif section.startswith("[v4"):
+            if key == "format":
+                state["style_fields"] = tuple(f.strip().lower() for f in value.split(","))
+            elif key == "style":
+                fields = dict(zip(state["style_fields"], (v.strip() for v in value.split(","))))
+                try:
+                    self.styles.append(_ass_style(fields, ssa=section == "[v4 styles]"))
+                except ValueError as e:
+                    _reject(self.strict, f"invalid style: {e}", lineno)
+        elif section == "[events]" and key == "format":
+            state["event_fields"] = tuple(f.strip().lower() for f in value.split(","))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        section = ""
+        state: Dict[str, Any] = {"style_fields": ASS_STYLE_FIELDS, "event_fields": ASS_EVENT_FIELDS}
+        count = 0
+        for block, first_line in _blocks(self.pieces, "\n"):
+            for lineno, line in enumerate(block.split("\n"), first_line):
+                if line.startswith("Dialogue:") and section == "[events]":
+                    fields = state["event_fields"]
+                    # Text 为最后一个字段，可包含逗号
+                    values = dict(zip(fields, line[9:].split(",", len(fields) - 1)))
+                    start, end = parse_time(values.get("start", "")), parse_time(values.get("end", ""))
+                    if start is None or end is None or end < start:
+                        _reject(self.strict, f"malformed dialogue timing: {line!r}", lineno)
+                        continue
+                    count += 1
+                    yield {"id": str(count), "start": start, "end": end, "text": _ass_text(values.get("text", "")),
+                           "speaker": values.get("name", "").strip() or None,
+                           "style": values.get("style", "").strip() or None}
+                    continue
+                line = line.strip().lstrip("\ufeff")
+                if not line or line.startswith(";"):
+                    continue
+                if line.startswith("["):
+                    section = line.lower()
+                else:
+                    self._section_line(section, line, lineno, state)
+
+
+# ---- 入口 ----
+
+def detect_format(head: str, filename: Optional[str] = None) -> str:
+    """优先按扩展名，其次按内容（[Script Info] → ass，WEBVTT → vtt，其余按 srt）"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in EXTENSIONS:
+        return EXTENSIONS[ext]
+    head = head.lstrip("\ufeff \t\r\n")
+    if head[:13].lower() == "[script info]":
+        return "ass"
+    return "vtt" if head.startswith("WEBVTT") else "srt"
+
+
+def parse_stream(pieces: Iterable[str], fmt: str, strict: bool = False) -> Tuple[SubtitleDoc, List[AssStyle]]:
+    """
+    文本片段（任意切分，如文件按块或逐行读取）→（SubtitleDoc，样式表）
+    事件先解析为字典，最后整批校验为 SubtitleEvent（比逐条构造模型快数倍）
+    """
+    if fmt not in FORMATS:
+        raise SubtitleParseError(f"Unsupported subtitle format: {fmt} (available: {', '.join(FORMATS)})")
+    if fmt != "ass":
+        return SubtitleDoc.model_validate({"events": list(iter_cues(pieces, strict))}), []
+    reader = AssReader(pieces, strict)
+    events = list(reader)
+    recommended = next((s for s in reader.styles if s.Name == "Default"), reader.styles[0] if reader.styles else None)
+    doc = SubtitleDoc.model_validate({"events": events, "resolution": reader.resolution})
+    doc.recommended_style = recommended
+    return doc, reader.styles
+
+
+def parse_subtitles(source: Union[bytes, str], fmt: Optional[str] = None, filename: Optional[str] = None,
+                    strict: bool = False) -> Tuple[SubtitleDoc, List[AssStyle]]:
+    """内存中的字幕内容（bytes 自动检测编码）→（SubtitleDoc，样式表）"""
+    text = decode_subtitle(source) if isinstance(source, bytes) else source
+    return parse_stream([text], fmt or detect_format(text[:256], filename), strict)
+
+
+def load_subtitles(path: str, fmt: Optional[str] = None, encoding: Optional[str] = None,
+                   strict: bool = False) -> Tuple[SubtitleDoc, List[AssStyle]]:
+    """按块读取字幕文件 →（SubtitleDoc，样式表）"""
+    with open_subtitle(path, encoding) as f:
+        if fmt is None:
+            head = f.read(256)
+            f.seek(0)
+            fmt = detect_format(head, path)
+        return parse_stream(read_pieces(f), fmt, strict)
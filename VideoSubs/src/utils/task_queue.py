@@ -151,7 +151,7 @@ class TaskQueue:
             os.makedirs(os.path.dirname(self.persistence_file), exist_ok=True)
             data = {task_id: task.to_dict() for task_id, task in self.tasks.items()}
             with open(self.persistence_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
             # print(f"Queue state saved to {self.persistence_file}")
         except Exception as e:
             print(f"Failed to save queue state: {e}")
@@ -0,0 +1,111 @@
+"""
+轻量语音活动检测（VAD）
+默认使用基于帧能量的自适应阈值检测；若安装了 silero-vad 则改用其神经网络模型，
+后者还能区分音乐与人声。
+"""
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from src.utils.asr_scheduler import SAMPLE_RATE
+
+try:
+    from silero_vad import get_speech_timestamps, load_silero_vad
+    SILERO_AVAILABLE = True
+except ImportError:
+    SILERO_AVAILABLE = False
+
+Span = Tuple[int, int]  # (起始采样, 结束采样)
+
+_silero_model = None
+
+
+def vad_enabled() -> bool:
+    return os.environ.get("ASR_VAD", "1") not in ("0", "false", "False")
+
+
+def _merge(spans: List[Span], min_gap: int) -> List[Span]:
+    merged: List[Span] = []
+    for s, e in spans:
+        if merged and s - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def energy_speech_spans(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30,
+                        margin_db: float = 12.0, floor_db: float = -50.0) -> List[Span]:
+    """
+    基于帧能量的语音检测
+
+    阈值取 噪声底（能量第 10 百分位）+ margin_db，且不低于 floor_db，
+    因此在底噪较高的录音里也能自适应。
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = np.asarray(audio[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    threshold = max(float(np.percentile(energy_db, 10)) + margin_db, floor_db)
+    voiced = energy_db > threshold
+
+    # 找出连续有声帧的起止
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [(int(s) * frame, min(int(e) * frame, len(audio))) for s, e in zip(starts, ends)]
+
+
+def silero_speech_spans(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Span]:
+    import torch
+
+    global _silero_model
+    if _silero_model is None:
+        _silero_model = load_silero_vad()
+    stamps = get_speech_timestamps(torch.from_numpy(np.asarray(audio, dtype=np.float32)), _silero_model,
+                                   sampling_rate=sample_rate)
+    return [(int(t["start"]), int(t["end"])) for t in stamps]
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, min_speech: float = 0.25,
+                  min_silence: float = 0.6, padding: float = 0.2) -> List[Span]:
+    """
+    检测语音区间
+
+    Args:
+        audio: float32 PCM
+        min_speech: 短于该时长（秒）的孤立有声片段视为噪声丢弃
+        min_silence: 短于该时长（秒）的停顿不切分
+        padding: 每个区间前后保留的余量（秒），避免切掉字头字尾
+    """
+    spans = silero_speech_spans(audio, sample_rate) if SILERO_AVAILABLE else energy_speech_spans(audio, sample_rate)
+    spans = _merge(spans, int(min_silence * sample_rate))
+    spans = [(s, e) for s, e in spans if e - s >= int(min_speech * sample_rate)]
+    pad = int(padding * sample_rate)
+    spans = [(max(0, s - pad), min(len(audio), e + pad)) for s, e in spans]
+    return _merge(spans, 1)
+
+
+def pack_windows(spans: List[Span], max_len: int) -> List[Span]:
+    """
+    将语音区间打包为不超过 max_len 采样的解码窗口：
+    相邻的短区间合并进同一窗口（包含其间的短停顿），超长区间按 max_len 切分
+    """
+    windows: List[Span] = []
+    for s, e in spans:
+        while e - s > max_len:
+            windows.append((s, s + max_len))
+            s += max_len
+        if windows and e - windows[-1][0] <= max_len and s >= windows[-1][1]:
+            windows[-1] = (windows[-1][0], e)
+        else:
+            windows.append((s, e))
+    return windows
+
+
+def speech_seconds(spans: List[Span], sample_rate: int = SAMPLE_RATE) -> float:
+    return sum(e - s for s, e in spans) / sample_rate
@@ -0,0 +1,88 @@
+"""
+Unit tests for Whisper clip packing and the ONNX batch decoder — no whisper/torch/onnxruntime.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services import asr_backends  # noqa: E402
+from src.services.asr_backends import OnnxWhisperBackend, WhisperBackend  # noqa: E402
+
+EOT, SOT, TS = 10, 11, 18
+VOCAB = TS + 100
+
+
+def _tokenizer():
+    return SimpleNamespace(
+        eot=EOT, sot=SOT, transcribe=12, translate=13, sot_prev=14, sot_lm=15, no_timestamps=16, no_speech=17,
+        timestamp_begin=TS, sot_sequence=(SOT, 12), non_speech_tokens=[], all_language_tokens=[],
+        encode=lambda text: [1], decode=lambda tokens: " ".join(map(str, tokens)),
+    )
+
+
+class _ScriptedBackend(OnnxWhisperBackend):
+    """每行按脚本输出下一个 token；features[k, 0] 为脚本下标"""
+
+    def __init__(self, scripts):
+        super().__init__()
+        self.scripts = scripts
+        self.calls = []
+
+    def _logits(self, model_size, tokens, features):
+        self.calls.append(tokens.copy())
+        batch, length = tokens.shape
+        logits = np.zeros((batch, length, VOCAB), dtype=np.float32)
+        for k in range(batch):
+            script = self.scripts[int(features[k, 0])]
+            step = length - 2
+            if step < len(script):
+                logits[k, -1, script[step]] = 50.0
+        return logits
+
+
+class TestOnnxDecode:
+    def test_batch_with_rows_finishing_early(self):
+        scripts = [[TS, 5, 6, TS + 50, EOT], [TS, 5, TS + 25, EOT]]
+        backend = _ScriptedBackend(scripts)
+        results = backend._decode_batch("tiny", _tokenizer(), np.array([[0.0], [1.0]]))
+
+        assert [r["tokens"] for r in results] == [s[:-1] for s in scripts]
+        assert all(r["avg_logprob"] > -1e-3 for r in results)
+        # 第二行结束后用 EOT 补齐，批次始终是矩形
+        assert backend.calls[-1].tolist()[1] == [SOT, 12, TS, 5, TS + 25, EOT]
+        assert len(backend.calls) == len(scripts[0])
+
+    def test_timestamp_rules_force_initial_timestamp(self):
+        backend = _ScriptedBackend([[3, EOT]])
+        result = backend._decode_batch("tiny", _tokenizer(), np.array([[0.0]]))[0]
+        assert result["tokens"][0] >= TS
+
+
+class TestWhisperClips:
+    def test_short_spans_are_packed_into_windows(self, monkeypatch):
+        calls = []
+
+        class Model:
+            def transcribe(self, audio, language=None, clip_timestamps=None):
+                calls.append(clip_timestamps)
+                return {"text": "", "segments": [], "language": language}
+
+        class Backend(WhisperBackend):
+            def _model(self, model_size):
+                return Model()
+
+        monkeypatch.setattr(asr_backends, "batching_enabled", lambda: False)
+        sr = asr_backends.SAMPLE_RATE
+        # 100 段 1 秒语音，间隔 1 秒：共 200 秒，打包为 7 个不超过 30 秒的窗口
+        spans = [(2 * i * sr, (2 * i + 1) * sr) for i in range(100)]
+        Backend().transcribe(np.zeros(200 * sr, dtype=np.float32), "tiny", "en", spans=spans)
+        clips = calls[0]
+        assert len(clips) == 2 * 7
+        assert clips[0] == 0.0 and clips[-1] == 199.0
+        assert all(b - a <= 30 for a, b in zip(clips[::2], clips[1::2]))
@@ -0,0 +1,90 @@
+"""
+Unit tests for the indexed, size-bounded ASR result cache — no whisper/torch.
+"""
+import json
+import os
+import sys
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services.asr_cache import AsrCache  # noqa: E402
+from src.utils.subtitle_codec import encode_doc  # noqa: E402
+
+
+def _result(n):
+    return {"language": "en", "events": [{"id": "1", "start": 0.0, "end": 1.0, "text": "x" * n,
+                                          "speaker": None, "words": None, "style": None}]}
+
+
+def _entry_size(n):
+    return len(encode_doc(_result(n)))
+
+
+class TestAsrCache:
+    def test_roundtrip_and_hit_rate(self, tmp_path):
+        cache = AsrCache(root=str(tmp_path), max_bytes=0)
+        assert cache.get("a_standard") is None
+        cache.put("a_standard", _result(10))
+        assert cache.get("a_standard") == _result(10)
+        stats = cache.stats(limit=10)
+        assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["items"][0]["hit_count"] == 1
+        assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+    def test_lru_evicts_least_recently_used(self, tmp_path):
+        cache = AsrCache(root=str(tmp_path), max_bytes=2 * _entry_size(100))
+        cache.put("a", _result(100))
+        time.sleep(0.01)
+        cache.put("b", _result(100))
+        time.sleep(0.01)
+        cache.get("a")
+        cache.put("c", _result(100))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+    def test_lfu_evicts_least_frequently_used(self, tmp_path):
+        cache = AsrCache(root=str(tmp_path), max_bytes=2 * _entry_size(100), policy="lfu")
+        cache.put("a", _result(100))
+        cache.put("b", _result(100))
+        for _ in range(3):
+            cache.get("b")
+        cache.get("a")
+        cache.put("c", _result(100))
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+
+    def test_enforce_adopts_legacy_files_and_drops_missing(self, tmp_path):
+        cache = AsrCache(root=str(tmp_path), max_bytes=0)
+        cache.put("gone", _result(5))
+        os.remove(tmp_path / "gone.vsub")
+        with open(tmp_path / "legacy_high.json", "w", encoding="utf-8") as f:
+            json.dump(_result(5), f, indent=2)
+        cache.enforce()
+        keys = {item["key"] for item in cache.stats(limit=10)["items"]}
+        assert keys == {"legacy_high"}
+
+    def test_purge(self, tmp_path):
+        cache = AsrCache(root=str(tmp_path), max_bytes=0)
+        cache.put("a", _result(1))
+        cache.put("b", _result(1))
+        assert cache.purge("a") == 1
+        assert cache.purge() == 1
+        assert cache.stats()["entries"] == 0
+        assert not (tmp_path / "b.vsub").exists()
+
+    def test_legacy_json_and_window(self, tmp_path):
+        cache = AsrCache(root=str(tmp_path), max_bytes=0)
+        doc = _result(3)
+        doc["events"].append(dict(doc["events"][0], id="2", start=60.0, end=61.0))
+        with open(tmp_path / "old_standard.json", "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        assert cache.get("old_standard", start=30.0)["events"] == doc["events"][1:]
+        cache.put("old_standard", doc)
+        assert not (tmp_path / "old_standard.json").exists()
+        assert cache.get("old_standard", start=30.0)["events"] == doc["events"][1:]
+        assert cache.get("old_standard") == doc
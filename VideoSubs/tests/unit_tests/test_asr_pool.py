@@ -0,0 +1,115 @@
+"""
+Unit tests for the ASR worker pool dispatch and worker health endpoint — no whisper/torch.
+"""
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services import asr_backends  # noqa: E402
+from src.services.asr_pool import AsrWorker, AsrWorkerPool, WorkerUnavailable  # noqa: E402
+from src.services.asr_worker import AsrWorkerHandler  # noqa: E402
+
+
+def _pool(*loads):
+    pool = AsrWorkerPool(len(loads))
+    for i, load in enumerate(loads):
+        worker = AsrWorker(i)
+        worker.healthy = True
+        worker.reported_active = load
+        pool.workers.append(worker)
+    return pool
+
+
+class TestDispatch:
+    def test_picks_least_loaded(self):
+        pool = _pool(2, 0, 1)
+        assert pool._acquire([]).index == 1
+
+    def test_inflight_counts_before_health_report(self):
+        pool = _pool(0, 0)
+        first = pool._acquire([])
+        second = pool._acquire([])
+        assert first is not second
+        pool._release(first)
+        assert first.inflight == 0
+
+    def test_skips_unhealthy_and_excluded(self):
+        pool = _pool(0, 5, 3)
+        pool.workers[0].healthy = False
+        assert pool._acquire([pool.workers[2]]).index == 1
+        with pytest.raises(WorkerUnavailable):
+            pool._acquire(pool.workers[1:])
+
+    def test_waits_for_a_worker_to_become_ready(self):
+        pool = _pool(0)
+        worker = pool.workers[0]
+        worker.healthy = False
+        threading.Timer(0.2, lambda: setattr(worker, "healthy", True)).start()
+        assert pool._acquire([], timeout=5.0) is worker
+        assert pool.ready and pool.status()["ready"]
+
+    def test_wait_is_bounded(self):
+        pool = _pool(0)
+        pool.workers[0].healthy = False
+        with pytest.raises(WorkerUnavailable):
+            pool._acquire([], timeout=0.1)
+        assert not pool.ready
+
+    def test_failover_to_next_worker(self):
+        pool = _pool(0, 1)
+        pool.workers[0].port = pool.workers[1].port = 1  # nothing listens there
+        with pytest.raises(WorkerUnavailable):
+            pool.transcribe(media_path="x.mp4")
+        assert not any(w.healthy for w in pool.workers)
+        assert all(w.inflight == 0 for w in pool.workers)
+
+
+class TestWorkerHealth:
+    def test_health_and_status(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), AsrWorkerHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            worker = AsrWorker(0)
+            worker.port = server.server_address[1]
+            info = worker.request("GET", "/health")
+            assert info["status"] == "ok"
+            assert info["active"] == 0
+            with pytest.raises(RuntimeError):
+                worker.request("GET", "/missing")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_detect_language_runs_in_worker(self, tmp_path, monkeypatch):
+        seen = []
+
+        class Engine:
+            def detect_language(self, audio, model_size):
+                seen.append((len(audio), float(audio[0]), model_size))
+                return "ja", 0.9
+
+        monkeypatch.setattr(asr_backends, "get_backend", lambda: Engine())
+        pcm_path = str(tmp_path / "audio.npy")
+        pcm = np.zeros(40 * 16000, dtype=np.int16)
+        pcm[16000:] = 16384
+        np.save(pcm_path, pcm)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), AsrWorkerHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            pool = _pool(0)
+            pool.workers[0].port = server.server_address[1]
+            assert pool.detect_language(pcm_path, 16000, "tiny") == {"language": "ja", "probability": 0.9}
+            # 工作进程只读取 offset 起的一个 30 秒窗口
+            assert seen == [(30 * 16000, 0.5, "tiny")]
+        finally:
+            server.shutdown()
+            server.server_close()
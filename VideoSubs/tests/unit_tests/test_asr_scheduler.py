@@ -0,0 +1,169 @@
+"""
+Unit tests for the ASR micro-batching scheduler — fake decoder, no whisper/torch.
+"""
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.utils.asr_scheduler import (  # noqa: E402
+    SAMPLE_RATE,
+    AsrBatchScheduler,
+    batching_enabled,
+    bucket_prompt,
+    complete_tokens,
+    split_segments,
+)
+
+
+def _result(text, temperature=0.0, avg_logprob=-0.2, compression_ratio=1.2, no_speech_prob=0.01, tokens=()):
+    return SimpleNamespace(text=text, tokens=list(tokens), language="en", temperature=temperature,
+                           avg_logprob=avg_logprob, compression_ratio=compression_ratio,
+                           no_speech_prob=no_speech_prob)
+
+
+class TestBatching:
+    def test_concurrent_jobs_share_batches(self):
+        batches = []
+
+        def fake_decode(key, mels, prompts):
+            batches.append((key, list(mels)))
+            return [_result(m) for m in mels]
+
+        sched = AsrBatchScheduler(max_batch_size=8, max_wait=0.2, decode_batch=fake_decode)
+        outputs = {}
+
+        def job(name):
+            outputs[name] = [r.text for r in sched.decode_windows("small", None, [f"{name}-{i}" for i in range(3)])]
+
+        threads = [threading.Thread(target=job, args=(n,)) for n in ("a", "b")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert outputs["a"] == ["a-0", "a-1", "a-2"]
+        assert outputs["b"] == ["b-0", "b-1", "b-2"]
+        assert len(batches) == 1
+        assert len(batches[0][1]) == 6
+
+    def test_keys_are_not_mixed(self):
+        seen = []
+
+        def fake_decode(key, mels, prompts):
+            seen.append((key[0], len(mels)))
+            return [_result(m) for m in mels]
+
+        sched = AsrBatchScheduler(max_batch_size=4, max_wait=0.01, max_starve=0, decode_batch=fake_decode)
+        small = sched.submit_windows(("small", None, 0.0, 0), ["s1", "s2"])
+        medium = sched.submit_windows(("medium", None, 0.0, 0), ["m1"])
+        assert [f.result(timeout=5).text for f in small] == ["s1", "s2"]
+        assert medium[0].result(timeout=5).text == "m1"
+        assert sorted(seen) == [("medium", 1), ("small", 2)]
+
+    def test_temperature_fallback(self):
+        def fake_decode(key, mels, prompts):
+            temperature = key[2]
+            return [_result(m, temperature=temperature,
+                            compression_ratio=3.0 if m == "bad" and temperature < 0.4 else 1.0)
+                    for m in mels]
+
+        sched = AsrBatchScheduler(max_wait=0.01, decode_batch=fake_decode)
+        good, bad = sched.decode_windows("small", "en", ["good", "bad"])
+        assert good.temperature == 0.0
+        assert bad.temperature == 0.4
+
+    def test_failure_propagates(self):
+        def fake_decode(key, mels, prompts):
+            raise RuntimeError("boom")
+
+        sched = AsrBatchScheduler(max_wait=0.01, decode_batch=fake_decode)
+        fut = sched.submit_windows(("small", None, 0.0, 0), ["x"])[0]
+        try:
+            fut.result(timeout=5)
+            assert False, "expected failure"
+        except RuntimeError as e:
+            assert "boom" in str(e)
+
+    def test_batching_is_on_by_default(self, monkeypatch):
+        monkeypatch.delenv("ASR_BATCHING", raising=False)
+        assert batching_enabled()
+        monkeypatch.setenv("ASR_BATCHING", "0")
+        assert not batching_enabled()
+
+
+class TestSequentialDecode:
+    TS = 1000
+
+    def _tokenizer(self):
+        return SimpleNamespace(timestamp_begin=self.TS, eot=999, decode=lambda tokens: " ".join(map(str, tokens)))
+
+    def test_complete_tokens_cuts_unfinished_segment(self):
+        window = 30 * SAMPLE_RATE
+        # 最后一段以单个时间戳闭合：整窗前进
+        assert complete_tokens([self.TS, 1, self.TS + 100], self.TS, window) == ([self.TS, 1, self.TS + 100], window)
+        # 最后一段未闭合：截到 2 秒处的时间戳对，从 2 秒重新开始
+        tokens = [self.TS, 1, self.TS + 100, self.TS + 100, 2, 3]
+        assert complete_tokens(tokens, self.TS, window) == (tokens[:3], 2 * SAMPLE_RATE)
+        # 没有时间戳对：整窗前进
+        assert complete_tokens([self.TS, 1, 2], self.TS, window) == ([self.TS, 1, 2], window)
+
+    def test_bucket_prompt_keeps_tail(self):
+        assert bucket_prompt(list(range(10))) == []
+        assert bucket_prompt(list(range(40))) == list(range(8, 40))
+
+    def test_prompt_and_seek_carry_over(self):
+        seen = []
+        TS = self.TS
+
+        def fake_decode(key, mels, prompts):
+            seen.extend(zip(mels, prompts))
+            out = []
+            for start, end in mels:
+                if start == 0:
+                    # 第一个窗口的第二段在 20 秒后未闭合
+                    tokens = [TS] + list(range(1, 17)) + [TS + 1000, TS + 1000, 50]
+                else:
+                    tokens = [TS, 60, TS + 200]
+                out.append(_result("", tokens=tokens))
+            return out
+
+        sched = AsrBatchScheduler(max_wait=5.0, decode_batch=fake_decode)
+        started = time.monotonic()
+        segments, language = sched.decode_regions(
+            "small", None, [(0, 40 * SAMPLE_RATE)], lambda s, e: (s, e), self._tokenizer())
+        assert time.monotonic() - started < 5.0
+
+        # 只有一个请求在进行时不等待 max_wait；第二个窗口从 20 秒处开始并带上前文
+        assert [m for m, _ in seen] == [(0, 30 * SAMPLE_RATE), (20 * SAMPLE_RATE, 40 * SAMPLE_RATE)]
+        assert seen[1][1] == list(range(1, 17))
+        assert [(s["start"], s["end"], s["text"]) for s in segments] == [
+            (0.0, 20.0, " ".join(map(str, range(1, 17)))),
+            (20.0, 24.0, "60"),
+        ]
+        assert language == "en"
+
+
+class TestSplitSegments:
+    TS = 1000
+
+    def _decode(self, tokens):
+        return " ".join(str(t) for t in tokens)
+
+    def test_timestamp_pairs(self):
+        tokens = [self.TS + 0, 1, 2, self.TS + 100, self.TS + 100, 3, self.TS + 250]
+        segs = split_segments(tokens, self.TS, self._decode, offset=30.0, duration=30.0)
+        assert [(s["start"], s["end"], s["text"]) for s in segs] == [
+            (30.0, 32.0, "1 2"),
+            (32.0, 35.0, "3"),
+        ]
+
+    def test_unterminated_segment_ends_at_window(self):
+        segs = split_segments([self.TS + 50, 7], self.TS, self._decode, offset=0.0, duration=12.5)
+        assert segs[0]["start"] == 1.0
+        assert segs[0]["end"] == 12.5
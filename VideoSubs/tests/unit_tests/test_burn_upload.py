@@ -0,0 +1,96 @@
+"""
+Unit tests for streaming burn uploads and file_uuid reuse — no whisper/torch/ffmpeg.
+"""
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+pytest.importorskip("httpx")
+pytest.importorskip("multipart")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import src.config as config  # noqa: E402
+from src.routers import burn  # noqa: E402
+from src.services import storage  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+    submitted = []
+
+    async def submit(task_type, **kwargs):
+        submitted.append(kwargs)
+        return "t1"
+
+    monkeypatch.setattr(burn.burn_queue, "submit", submit)
+    app = FastAPI()
+    app.include_router(burn.router, prefix="/api")
+    return TestClient(app), submitted
+
+
+class TestBurnUpload:
+    def test_streams_media_and_reports_hash(self, client):
+        http, submitted = client
+        media = os.urandom(3 * 1024 * 1024)
+        resp = http.post("/api/burn/", files={
+            "file": ("clip.mp4", media, "video/mp4"),
+            "ass_file": ("subs.ass", b"[Script Info]\n", "text/plain"),
+        })
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["media_size"] == len(media)
+        assert body["media_sha256"] == hashlib.sha256(media).hexdigest()
+        with open(submitted[0]["media_path"], "rb") as f:
+            assert f.read() == media
+
+    def test_reuses_uploaded_file_uuid(self, client):
+        http, submitted = client
+        record = storage.media_store.put_stream(io.BytesIO(b"video"), "uploaded.mp4")
+        resp = http.post("/api/burn/", data={"file_uuid": record["uuid"]},
+                         files={"ass_file": ("subs.ass", b"[Script Info]\n", "text/plain")})
+        assert resp.status_code == 200
+        assert submitted[0]["media_path"] == record["path"]
+        assert resp.json()["media_sha256"] == hashlib.sha256(b"video").hexdigest()
+
+    def test_requires_media(self, client):
+        http, _ = client
+        resp = http.post("/api/burn/", files={"ass_file": ("subs.ass", b"x", "text/plain")})
+        assert resp.status_code == 400
+
+    def test_converts_srt_to_ass_with_selected_style(self, client, monkeypatch):
+        http, submitted = client
+        monkeypatch.setattr(burn, "probe_file", lambda path: {"width": 1280, "height": 720})
+        srt = ("1\n00:00:01,000 --> 00:00:02,000\nHello\n\n"
+               "2\n00:00:03,000 --> 00:00:04,000\nLine one\nx {curly} y\n").encode("utf-8-sig")
+        style = '{"Name": "Big", "FontName": "Arial", "FontSize": 72, "PrimaryColour": "#FFFF00"}'
+        resp = http.post("/api/burn/", data={"style": style}, files={
+            "file": ("clip.mp4", b"video", "video/mp4"),
+            "ass_file": ("subs.srt", srt, "text/plain"),
+        })
+        assert resp.status_code == 200
+        assert submitted[0]["ass_path"].endswith("subs.ass")
+        with open(submitted[0]["ass_path"], encoding="utf-8") as f:
+            ass = f.read()
+        assert "PlayResX: 1280\nPlayResY: 720" in ass
+        assert "Style: Big,Arial,72.0," in ass
+        assert "Dialogue: 0,0:00:01.00,0:00:02.00,Big,,0,0,0,,Hello\n" in ass
+        # 换行与花括号保留原样，libass 不会把 {curly} 当作覆盖标签隐藏
+        assert "Dialogue: 0,0:00:03.00,0:00:04.00,Big,,0,0,0,,Line one\\Nx \\{curly\\} y\n" in ass
+
+    def test_rejects_empty_srt_and_bad_style(self, client):
+        http, submitted = client
+        files = {"file": ("clip.mp4", b"video", "video/mp4"), "ass_file": ("subs.srt", b"garbage", "text/plain")}
+        assert http.post("/api/burn/", files=files).status_code == 400
+        files["ass_file"] = ("subs.ass", b"[Script Info]\n", "text/plain")
+        assert http.post("/api/burn/", data={"style": "{"}, files=files).status_code == 400
+        assert submitted == []
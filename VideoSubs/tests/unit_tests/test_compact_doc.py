@@ -0,0 +1,91 @@
+"""
+Unit tests for the columnar CompactSubtitleDoc — no whisper/torch/ffmpeg.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.agent.Subs import SubtitleDoc  # noqa: E402
+from src.utils import subtitle_export  # noqa: E402
+from src.utils.compact_doc import CompactSubtitleDoc, TextStore  # noqa: E402
+from src.utils.subtitle_export import to_string  # noqa: E402
+
+DOC = {
+    "language": "zh",
+    "resolution": {"width": 1920, "height": 1080},
+    "fps": 25.0,
+    "events": [
+        {"id": "1", "start": 0, "end": 1.5, "text": "第一句", "style": "Top", "speaker": "A",
+         "words": [{"word": "第一", "start": 0.0, "end": 1.0, "probability": 0.9},
+                   {"word": "句", "start": 1.0, "end": 1.5}]},
+        {"id": "2", "start": 2.25, "end": 3, "text": "second\nline", "style": "Default", "words": []},
+        {"id": "3", "start": 4, "end": 5, "text": "", "style": "Top", "speaker": "A"},
+    ],
+    "recommended_style": {"Name": "Top", "FontName": "Noto", "FontSize": 48, "PrimaryColour": "#FFFFFF"},
+}
+
+
+class TestCompactDoc:
+    def test_lossless_round_trip(self):
+        model = SubtitleDoc.model_validate(DOC)
+        for source in (DOC, model):
+            doc = CompactSubtitleDoc.from_doc(source)
+            assert doc.model_dump() == model.model_dump()
+            assert doc.to_model() == model
+        assert CompactSubtitleDoc.from_doc(SubtitleDoc()).model_dump() == SubtitleDoc().model_dump()
+
+    def test_columnar_storage(self):
+        doc = CompactSubtitleDoc.from_doc(DOC)
+        assert doc.start.dtype == np.float64 and doc.start.tolist() == [0.0, 2.25, 4.0]
+        assert doc.ids is None
+        assert doc.styles == ["Top", "Default"] and doc.style_codes.tolist() == [0, 1, 0]
+        assert doc.speaker_codes.tolist() == [0, -1, 0]
+        assert doc.word_counts.tolist() == [2, 0, -1] and doc.raw_words is None
+        assert np.isnan(doc.word_probability[1])
+        assert doc.text[1] == "second\nline" and len(doc) == 3
+        assert doc.event_dicts(1, 2) == [SubtitleDoc.model_validate(DOC).events[1].model_dump()]
+
+    def test_irregular_ids_and_words_preserved(self):
+        events = [
+            {"id": "a", "start": 0, "end": 1, "text": "x",
+             "words": [{"word": "x", "start": 0, "end": 1, "extra": 1}]},
+            {"id": "7", "start": 1, "end": 2, "text": "y",
+             "words": [{"word": "y", "start": 1, "end": 2, "probability": None}]},
+        ]
+        doc = CompactSubtitleDoc.from_events(events)
+        assert doc.ids.tolist() == ["a", "7"] and doc.raw_words is not None
+        assert doc.model_dump()["events"] == SubtitleDoc(events=events).model_dump()["events"]
+
+    def test_from_segments_and_str(self):
+        doc = CompactSubtitleDoc.from_segments([{"start": 0.5, "end": 1, "text": "hi", "words": [1]}],
+                                               language="en", style="Default")
+        assert doc.model_dump()["events"] == [
+            {"id": "1", "start": 0.5, "end": 1.0, "text": "hi", "speaker": None, "words": None, "style": "Default"},
+        ]
+        assert json.loads(str(doc))["language"] == "en"
+        assert "events=1" in repr(doc)
+
+    def test_invalid_events(self):
+        with pytest.raises(ValueError):
+            CompactSubtitleDoc.from_events([{"start": 0, "end": 1}])
+        with pytest.raises(ValueError):
+            CompactSubtitleDoc.from_events([{"id": "1", "start": "soon", "end": 1, "text": "x"}])
+
+    def test_text_store_slices(self):
+        store = TextStore(["ab", "", "字幕"])
+        assert [store[i] for i in range(3)] == ["ab", "", "字幕"]
+        assert store.tolist(1) == ["", "字幕"]
+
+    def test_export_matches_models(self, monkeypatch):
+        monkeypatch.setattr(subtitle_export, "CHUNK_EVENTS", 2)
+        model = SubtitleDoc.model_validate(DOC)
+        doc = CompactSubtitleDoc.from_doc(model)
+        for fmt in subtitle_export.FORMATS:
+            assert to_string(doc, fmt) == to_string(model, fmt)
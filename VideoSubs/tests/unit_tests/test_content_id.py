@@ -0,0 +1,45 @@
+"""
+Unit tests for streaming upload hashing and fast fingerprints — no whisper/torch.
+"""
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.utils.content_id import UploadTooLarge, copy_and_hash, file_digest, fingerprint  # noqa: E402
+
+
+class TestContentId:
+    def test_copy_and_hash_matches_sha256(self, tmp_path):
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        dest = str(tmp_path / "upload.mp4")
+        size, digest = copy_and_hash(io.BytesIO(data), dest, chunk_size=64 * 1024)
+        assert size == len(data)
+        assert digest == hashlib.sha256(data).hexdigest() == file_digest(dest)
+        with open(dest, "rb") as f:
+            assert f.read() == data
+
+    def test_oversized_upload_is_removed(self, tmp_path):
+        dest = tmp_path / "big.mp4"
+        with pytest.raises(UploadTooLarge):
+            copy_and_hash(io.BytesIO(b"x" * 1000), str(dest), chunk_size=100, max_size=500)
+        assert not dest.exists()
+
+    def test_fingerprint_tracks_size_and_samples(self, tmp_path):
+        path = tmp_path / "a.bin"
+        data = bytearray(os.urandom(2 * 1024 * 1024))
+        path.write_bytes(data)
+        fp = fingerprint(str(path))
+        assert fp.startswith(f"{len(data)}-")
+        assert fingerprint(str(path)) == fp
+        data[0] ^= 0xFF
+        path.write_bytes(data)
+        assert fingerprint(str(path)) != fp
+        path.write_bytes(data + b"\0")
+        assert not fingerprint(str(path)).startswith(f"{len(data)}-")
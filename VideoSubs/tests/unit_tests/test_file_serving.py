@@ -0,0 +1,149 @@
+"""
+Unit tests for the Range / ETag download layer — no whisper/torch/ffmpeg.
+"""
+import hashlib
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src.utils.file_serving import (  # noqa: E402
+    RangeFileResponse,
+    RangeNotSatisfiable,
+    RangeStaticFiles,
+    download_stats,
+    parse_range,
+)
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def served(tmp_path):
+    path = tmp_path / "output.mp4"
+    path.write_bytes(DATA)
+    digest = hashlib.sha256(DATA).hexdigest()
+    app = FastAPI()
+
+    @app.api_route("/download", methods=["GET", "HEAD"])
+    async def download():
+        return RangeFileResponse(str(path), media_type="video/mp4", filename="结果.mp4",
+                                 etag=lambda: digest)
+
+    app.mount("/outputs", RangeStaticFiles(directory=str(tmp_path), etag_for=lambda p: digest))
+    return TestClient(app), f'"{digest}"'
+
+
+class TestParseRange:
+    def test_forms(self):
+        assert parse_range("bytes=0-9", 100) == [(0, 9)]
+        assert parse_range("bytes=90-", 100) == [(90, 99)]
+        assert parse_range("bytes=-10", 100) == [(90, 99)]
+        assert parse_range("bytes=50-500", 100) == [(50, 99)]
+        assert parse_range("bytes=0-4,3-9,20-29", 100) == [(0, 9), (20, 29)]
+
+    def test_invalid_is_ignored_and_unsatisfiable_raises(self):
+        assert parse_range("items=0-1", 100) is None
+        assert parse_range("bytes=5-1", 100) is None
+        assert parse_range(",".join(f"bytes={i * 3}-{i * 3}" for i in range(20)).replace(",bytes=", ","), 100) is None
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=100-200", 100)
+
+
+class TestRangeFileResponse:
+    def test_full_download_has_validators(self, served):
+        client, etag = served
+        resp = client.get("/download")
+        assert resp.status_code == 200 and resp.content == DATA
+        assert resp.headers["etag"] == etag
+        assert resp.headers["accept-ranges"] == "bytes"
+        assert resp.headers["content-disposition"].startswith("attachment; filename*=utf-8''")
+        assert download_stats.active == 0
+
+    def test_single_and_multipart_ranges(self, served):
+        client, _ = served
+        resp = client.get("/download", headers={"Range": "bytes=100-199"})
+        assert resp.status_code == 206 and resp.content == DATA[100:200]
+        assert resp.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+
+        resp = client.get("/download", headers={"Range": "bytes=0-9,-5"})
+        assert resp.status_code == 206
+        boundary = resp.headers["content-type"].split("boundary=")[1]
+        assert int(resp.headers["content-length"]) == len(resp.content)
+        parts = resp.content.split(f"--{boundary}".encode())
+        assert parts[1].endswith(b"\r\n\r\n" + DATA[:10] + b"\r\n")
+        assert f"bytes {len(DATA) - 5}-{len(DATA) - 1}/{len(DATA)}".encode() in parts[2]
+        assert parts[2].endswith(DATA[-5:] + b"\r\n") and parts[3] == b"--\r\n"
+
+        resp = client.get("/download", headers={"Range": f"bytes={len(DATA)}-"})
+        assert resp.status_code == 416 and resp.headers["content-range"] == f"bytes */{len(DATA)}"
+
+    def test_conditional_requests(self, served):
+        client, etag = served
+        assert client.get("/download", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/download", headers={"If-None-Match": '"other"'}).status_code == 200
+        assert client.get("/download", headers={"If-Match": '"other"'}).status_code == 412
+
+        # If-Range 不匹配时返回完整内容
+        resp = client.get("/download", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert resp.status_code == 200 and len(resp.content) == len(DATA)
+        resp = client.get("/download", headers={"Range": "bytes=0-9", "If-Range": etag})
+        assert resp.status_code == 206 and resp.content == DATA[:10]
+
+    def test_head_and_static_mount(self, served):
+        client, etag = served
+        resp = client.head("/download")
+        assert resp.status_code == 200 and resp.content == b""
+        assert resp.headers["content-length"] == str(len(DATA))
+
+        resp = client.get("/outputs/output.mp4", headers={"Range": "bytes=-3"})
+        assert resp.status_code == 206 and resp.content == DATA[-3:]
+        assert resp.headers["etag"] == etag and resp.headers["cache-control"] == "no-cache"
+        assert client.get("/outputs/missing.mp4").status_code == 404
+
+
+class TestFollowFile:
+    def test_streams_growing_burn_output(self, tmp_path, monkeypatch):
+        import threading
+        import time
+
+        from src.routers import tasks
+        from src.utils.task_queue import Task, TaskStatus
+
+        task = Task("t1", "burn_task", {"task_dir": str(tmp_path), "output_mode": "fragmented"})
+        task.status = TaskStatus.PROCESSING
+        monkeypatch.setitem(tasks.burn_queue.tasks, "t1", task)
+        out = tmp_path / "output.mp4"
+
+        def burn():
+            with open(out, "wb") as f:
+                for i in range(5):
+                    f.write(bytes([i]) * 1000)
+                    f.flush()
+                    time.sleep(0.05)
+            task.status = TaskStatus.COMPLETED
+
+        app = FastAPI()
+        app.include_router(tasks.router, prefix="/api")
+        client = TestClient(app)
+        assert client.get("/api/burn/task/t1").json()["stream_url"] == "/api/burn/stream/t1"
+        writer = threading.Thread(target=burn)
+        writer.start()
+        resp = client.get("/api/burn/stream/t1")
+        writer.join()
+        assert resp.status_code == 200
+        assert resp.content == b"".join(bytes([i]) * 1000 for i in range(5))
+
+        # faststart 输出在完成前不可播放
+        task.kwargs["output_mode"] = "faststart"
+        task.status = TaskStatus.PROCESSING
+        assert client.get("/api/burn/stream/t1").status_code == 409
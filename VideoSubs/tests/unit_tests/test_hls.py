@@ -0,0 +1,105 @@
+"""
+Unit tests for HLS playlists, segmented WebVTT and segment serving — no whisper/torch/ffmpeg.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services.hls import (  # noqa: E402
+    master_playlist,
+    media_playlist,
+    parse_media_playlist,
+    segment_webvtt,
+)
+
+
+class TestPlaylists:
+    def test_segment_webvtt_repeats_boundary_cues(self):
+        events = [
+            {"start": 1.0, "end": 2.0, "text": "a"},
+            {"start": 5.5, "end": 7.0, "text": "spans\n\nboundary"},
+            {"start": 13.0, "end": 14.0, "text": "c"},
+        ]
+        segments = segment_webvtt(events, [6.0, 6.0, 6.0])
+        assert len(segments) == 3
+        assert all(s.startswith("WEBVTT\n") for s in segments)
+        assert "00:00:01.000 --> 00:00:02.000\na\n" in segments[0]
+        assert "00:00:05.500 --> 00:00:07.000\nspans\nboundary\n" in segments[0]
+        assert "spans" in segments[1] and "a\n" not in segments[1]
+        assert "00:00:13.000 --> 00:00:14.000\nc\n" in segments[2] and "spans" not in segments[2]
+
+    def test_timestamp_map_follows_start_pts(self):
+        events = [{"start": 1.0, "end": 2.0, "text": "a"}]
+        assert "X-TIMESTAMP-MAP=MPEGTS:0,LOCAL:00:00:00.000\n" in segment_webvtt(events, [6.0])[0]
+        # 流复制的 MPEG-TS 输入常从 1.4 秒开始
+        assert "X-TIMESTAMP-MAP=MPEGTS:126000,LOCAL:00:00:00.000\n" in segment_webvtt(events, [6.0], 1.4)[0]
+
+    def test_media_and_master_playlists(self):
+        playlist = media_playlist([(6.006, "subs_00000.vtt"), (3.5, "subs_00001.vtt")])
+        assert "#EXT-X-TARGETDURATION:7" in playlist and playlist.endswith("#EXT-X-ENDLIST\n")
+        assert parse_media_playlist(playlist) == [(6.006, "subs_00000.vtt"), (3.5, "subs_00001.vtt")]
+
+        master = master_playlist(2_000_000, (1920, 1080), {"language": "zh"})
+        assert 'TYPE=SUBTITLES,GROUP-ID="subs",NAME="zh",LANGUAGE="zh"' in master
+        assert "#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1920x1080,SUBTITLES=\"subs\"\nvideo.m3u8" in master
+        assert "SUBTITLES" not in master_playlist(1000)
+
+
+class TestHlsRouter:
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        pytest.importorskip("httpx")
+        pytest.importorskip("multipart")
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        import src.config as config
+        from src.routers import hls
+
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        submitted = []
+
+        async def submit(task_type, **kwargs):
+            submitted.append((task_type, kwargs))
+            return "q1"
+
+        monkeypatch.setattr(hls.burn_queue, "submit", submit)
+        app = FastAPI()
+        app.include_router(hls.router, prefix="/api")
+        return TestClient(app), submitted, tmp_path
+
+    def test_segments_cached_long_playlists_revalidated(self, client):
+        test_client, _, root = client
+        hls_dir = root / "abc123" / "hls"
+        hls_dir.mkdir(parents=True)
+        (hls_dir / "master.m3u8").write_text("#EXTM3U\n")
+        (hls_dir / "video_00000.m4s").write_bytes(b"\x00" * 10)
+
+        resp = test_client.get("/api/hls/abc123/video_00000.m4s")
+        assert resp.status_code == 200
+        assert resp.headers["cache-control"] == "public, max-age=31536000, immutable"
+        resp = test_client.get("/api/hls/abc123/master.m3u8")
+        assert resp.headers["cache-control"] == "no-cache"
+        assert resp.headers["content-type"].startswith("application/vnd.apple.mpegurl")
+        assert test_client.get("/api/hls/abc123/index.db").status_code == 404
+
+    def test_export_validates_subtitles(self, client, monkeypatch):
+        test_client, submitted, root = client
+        media = root / "clip.mp4"
+        media.write_bytes(b"video")
+        from src.routers import hls
+        monkeypatch.setattr(hls, "get_file_path", lambda file_uuid: str(media))
+
+        assert test_client.post("/api/hls/", data={"file_uuid": "u", "subtitles": "{bad"}).status_code == 400
+        doc = {"language": "en", "events": [{"id": "1", "start": 0, "end": 1, "text": "hi"}]}
+        resp = test_client.post("/api/hls/", data={"file_uuid": "u", "subtitles": json.dumps(doc)})
+        assert resp.status_code == 200 and resp.json()["playlist_url"].endswith("/master.m3u8")
+        task_type, kwargs = submitted[0]
+        assert task_type == "hls_task" and kwargs["media_path"] == str(media)
+        assert kwargs["subtitle_doc"]["events"][0]["text"] == "hi"
@@ -0,0 +1,114 @@
+"""
+Unit tests for the upload ingest pipeline — no whisper/torch/ffmpeg.
+"""
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+import src.config as config  # noqa: E402
+from src.services import ingest, storage  # noqa: E402
+from src.services.ingest import (  # noqa: E402
+    LANGUAGE_ARTIFACT,
+    PCM_ARTIFACT,
+    PROBE_ARTIFACT,
+    IngestPipeline,
+    artifact_path,
+    language_hint,
+)
+from src.services.storage import MediaStore  # noqa: E402
+from src.utils.audio import load_pcm  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+    media = MediaStore(str(tmp_path / "media"))
+    monkeypatch.setattr(storage, "media_store", media)
+    return media
+
+
+def _seed(record, meta, pcm):
+    """预先放入 probe / audio 产物，模拟已由 ffprobe / ffmpeg 生成"""
+    os.makedirs(os.path.dirname(artifact_path(record["sha256"], PCM_ARTIFACT)), exist_ok=True)
+    with open(artifact_path(record["sha256"], PROBE_ARTIFACT), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    np.save(artifact_path(record["sha256"], PCM_ARTIFACT), pcm)
+
+
+class TestIngestPipeline:
+    def test_audio_only_upload(self, store):
+        record = store.put_stream(io.BytesIO(b"fake audio"), "talk.wav")
+        pcm = (np.sin(np.arange(16000) / 10) * 10000).astype(np.int16)
+        _seed(record, {"duration": 1.0, "streams": [{"codec_type": "audio"}]}, pcm)
+
+        status = IngestPipeline().run(record["uuid"])
+        steps = status["steps"]
+        assert steps["probe"]["status"] == steps["audio"]["status"] == steps["peaks"]["status"] == "done"
+        for step in ("thumbnail", "sprite", "scenes"):
+            assert steps[step] == {"status": "skipped", "detail": "no video stream"}
+        # 测试环境没有 whisper，语言检测跳过而不是失败
+        assert steps["language"]["status"] == "skipped"
+        peaks = np.load(os.path.join(artifact_path(record["sha256"], "peaks"), "160.npy"))
+        assert peaks.shape == (100, 2) and peaks.dtype == np.int16
+        assert peaks[:, 0].min() == pcm.min() and peaks[:, 1].max() == pcm.max()
+
+        # 转写读取同一份 PCM，不再调用 ffmpeg
+        audio = load_pcm(record["path"])
+        assert audio.dtype == np.float32 and np.allclose(audio * 32768.0, pcm)
+
+    def test_same_content_is_processed_once(self, store):
+        a = store.put_stream(io.BytesIO(b"same bytes"), "a.mp3")
+        b = store.put_stream(io.BytesIO(b"same bytes"), "b.mp3")
+        _seed(a, {"duration": 0.5, "streams": []}, np.zeros(8000, np.int16))
+        pipeline = IngestPipeline()
+        pipeline.run(a["uuid"])
+        peaks = artifact_path(a["sha256"], "peaks")
+        mtime = os.stat(peaks).st_mtime_ns
+        assert pipeline.run(b["uuid"])["steps"]["peaks"]["status"] == "done"
+        assert os.stat(peaks).st_mtime_ns == mtime
+        assert pipeline.run("missing") is None and pipeline.status("missing") is None
+
+    def test_missing_audio_skips_dependent_steps(self, store):
+        record = store.put_stream(io.BytesIO(b"no audio"), "clip.mp4")
+        pipeline = IngestPipeline()
+        pipeline._audio = lambda ctx, dest: (_ for _ in ()).throw(RuntimeError("Failed to load audio"))
+        os.makedirs(os.path.dirname(artifact_path(record["sha256"], PROBE_ARTIFACT)))
+        with open(artifact_path(record["sha256"], PROBE_ARTIFACT), "w", encoding="utf-8") as f:
+            json.dump({"duration": 1.0, "streams": []}, f)
+        steps = pipeline.run(record["uuid"])["steps"]
+        assert steps["audio"] == {"status": "failed", "detail": "Failed to load audio"}
+        assert steps["peaks"] == {"status": "skipped", "detail": "requires audio"}
+
+    def test_language_hint_respects_probability(self, store):
+        record = store.put_stream(io.BytesIO(b"speech"), "talk.wav")
+        os.makedirs(os.path.dirname(artifact_path(record["sha256"], LANGUAGE_ARTIFACT)))
+        with open(artifact_path(record["sha256"], LANGUAGE_ARTIFACT), "w", encoding="utf-8") as f:
+            json.dump({"language": "zh", "probability": 0.93}, f)
+        assert language_hint(record["path"]) == "zh"
+        with open(artifact_path(record["sha256"], LANGUAGE_ARTIFACT), "w", encoding="utf-8") as f:
+            json.dump({"language": "en", "probability": 0.2}, f)
+        assert language_hint(record["path"]) is None
+
+    def test_language_window_scans_bounded_prefix(self, monkeypatch):
+        sr = 16000
+        pcm = np.zeros(200 * sr, dtype=np.int16)
+        pcm[70 * sr:75 * sr] = 1000
+        seen = []
+
+        def detect(audio):
+            seen.append(len(audio))
+            loud = np.flatnonzero(np.abs(audio) > 0.01)
+            return [(int(loud[0]), int(loud[-1]) + 1)] if len(loud) else []
+
+        assert IngestPipeline._first_speech(pcm, detect) == 70 * sr
+        assert seen == [60 * sr, 60 * sr]
+        monkeypatch.setattr(ingest, "LANGUAGE_SCAN_SECONDS", 60)
+        assert IngestPipeline._first_speech(pcm, detect) == 0
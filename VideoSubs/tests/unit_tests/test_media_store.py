@@ -0,0 +1,58 @@
+"""
+Unit tests for the content-addressed media store — no whisper/torch/ffmpeg.
+"""
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services.storage import MediaStore  # noqa: E402
+
+
+class TestMediaStore:
+    def test_identical_uploads_share_one_blob(self, tmp_path):
+        store = MediaStore(str(tmp_path))
+        data = os.urandom(200_000)
+        a = store.put_stream(io.BytesIO(data), "a.mp4")
+        b = store.put_stream(io.BytesIO(data), "a.mp4")
+        assert a["uuid"] != b["uuid"] and a["path"] != b["path"]
+        assert a["sha256"] == b["sha256"]
+        assert os.path.samefile(a["path"], b["path"]) or open(b["path"], "rb").read() == data
+        stats = store.stats()
+        assert stats["files"] == 2 and stats["blobs"] == 1
+        assert stats["deduplicated_bytes"] == len(data)
+        assert os.listdir(tmp_path / "tmp") == []
+
+    def test_records_survive_restart(self, tmp_path):
+        record = MediaStore(str(tmp_path)).put_stream(io.BytesIO(b"hello"), "clip.MOV", user_id="u")
+        reopened = MediaStore(str(tmp_path)).get(record["uuid"])
+        assert reopened["path"].endswith(".mov")
+        assert reopened["filename"] == "clip.MOV" and reopened["user_id"] == "u"
+        assert reopened["size"] == 5
+        assert MediaStore(str(tmp_path)).digest_for_path(record["path"]) == record["sha256"]
+
+    def test_delete_keeps_shared_blob_until_last_reference(self, tmp_path):
+        store = MediaStore(str(tmp_path))
+        a = store.put_stream(io.BytesIO(b"same"), "a.mp4")
+        b = store.put_stream(io.BytesIO(b"same"), "b.mp4")
+        blob = store._blob_path(a["sha256"])
+        assert store.delete(a["uuid"])
+        assert os.path.exists(blob) and store.get(b["uuid"]) is not None
+        assert store.delete(b["uuid"])
+        assert not os.path.exists(blob)
+        assert store.get(a["uuid"]) is None and not store.delete(a["uuid"])
+
+    def test_concurrent_puts_of_same_content(self, tmp_path):
+        store = MediaStore(str(tmp_path))
+        data = os.urandom(50_000)
+        with ThreadPoolExecutor(8) as pool:
+            records = list(pool.map(lambda i: store.put_stream(io.BytesIO(data), f"{i}.mp4"), range(16)))
+        assert len({r["uuid"] for r in records}) == 16
+        assert store.stats()["blobs"] == 1
+        for r in records:
+            with open(r["path"], "rb") as f:
+                assert f.read() == data
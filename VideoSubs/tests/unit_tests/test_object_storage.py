@@ -0,0 +1,120 @@
+"""
+Unit tests for the object-storage backends against the local S3 stand-in — no whisper/torch/ffmpeg.
+"""
+import io
+import os
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services import object_storage  # noqa: E402
+from src.services.asr_cache import AsrCache  # noqa: E402
+from src.services.object_storage import (  # noqa: E402
+    LocalObjectStore,
+    ObjectNotFound,
+    ObjectStorageError,
+    ReadThroughCache,
+    S3ObjectStore,
+)
+from src.services.s3_standin import S3StandIn  # noqa: E402
+from src.services.storage import MediaStore  # noqa: E402
+
+
+@pytest.fixture
+def standin(tmp_path):
+    server = S3StandIn(str(tmp_path / "s3")).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def s3(standin):
+    return S3ObjectStore(standin.endpoint, standin.bucket, standin.access_key, standin.secret_key)
+
+
+class TestS3ObjectStore:
+    def test_put_get_range_delete(self, s3):
+        s3.put_bytes("a/b c.bin", b"0123456789")
+        assert s3.size("a/b c.bin") == 10
+        assert s3.get_range("a/b c.bin") == b"0123456789"
+        assert s3.get_range("a/b c.bin", 2, 5) == b"2345"
+        assert s3.get_range("a/b c.bin", 7) == b"789"
+        s3.delete("a/b c.bin")
+        assert s3.size("a/b c.bin") is None
+        with pytest.raises(ObjectNotFound):
+            s3.get_range("a/b c.bin")
+
+    def test_multipart_upload(self, s3, tmp_path, monkeypatch):
+        monkeypatch.setattr(object_storage, "MULTIPART_THRESHOLD", 1000)
+        monkeypatch.setattr(object_storage, "PART_SIZE", 700)
+        data = os.urandom(2500)
+        src = tmp_path / "big.bin"
+        src.write_bytes(data)
+        s3.put_file("big.bin", str(src))
+        dest = tmp_path / "out.bin"
+        s3.download("big.bin", str(dest))
+        assert dest.read_bytes() == data
+        assert os.listdir(tmp_path / "s3" / ".uploads") == []
+
+    def test_presigned_download(self, s3):
+        s3.put_bytes("out/output.mp4", b"video")
+        url = s3.presign("out/output.mp4", expires=60, filename="result.mp4")
+        with urllib.request.urlopen(url) as resp:
+            assert resp.read() == b"video"
+            assert 'filename="result.mp4"' in resp.headers["Content-Disposition"]
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            urllib.request.urlopen(url.replace("out/output.mp4", "out/other.mp4"))
+        assert exc.value.code == 403
+
+    def test_bad_credentials_rejected(self, standin):
+        bad = S3ObjectStore(standin.endpoint, standin.bucket, standin.access_key, "wrong")
+        with pytest.raises(ObjectStorageError):
+            bad.put_bytes("x", b"1")
+
+
+class TestLocalObjectStore:
+    def test_roundtrip_and_key_validation(self, tmp_path):
+        store = LocalObjectStore(str(tmp_path))
+        store.put_bytes("k/v.txt", b"hello")
+        assert store.get_range("k/v.txt", 1, 3) == b"ell"
+        assert store.presign("k/v.txt") is None
+        assert ReadThroughCache(store).fetch("k/v.txt") == store.path("k/v.txt")
+        with pytest.raises(ValueError):
+            store.path("../escape")
+
+
+class TestReadThrough:
+    def test_concurrent_fetches_download_once(self, s3, tmp_path, monkeypatch):
+        s3.put_bytes("blobs/abc", b"x" * 1000)
+        calls = []
+        original = s3.download
+        monkeypatch.setattr(s3, "download", lambda key, dest: (calls.append(key), original(key, dest)))
+        cache = ReadThroughCache(s3, str(tmp_path / "cache"))
+        with ThreadPoolExecutor(8) as pool:
+            paths = list(pool.map(lambda _: cache.fetch("blobs/abc"), range(8)))
+        assert len(set(paths)) == 1 and open(paths[0], "rb").read() == b"x" * 1000
+        cache.fetch("blobs/abc")
+        assert len(calls) == 1
+
+    def test_media_store_refetches_missing_blob(self, s3, tmp_path):
+        node_a = MediaStore(str(tmp_path / "a"), objects=s3, cache=ReadThroughCache(s3, str(tmp_path / "cache")))
+        record = node_a.put_stream(io.BytesIO(b"media-bytes"), "clip.mp4")
+        assert s3.size(f"blobs/{record['sha256']}") == 11
+
+        # 本地副本被清理后，从对象存储取回
+        os.remove(record["path"])
+        os.remove(os.path.join(str(tmp_path / "a"), "blobs", record["sha256"][:2], record["sha256"]))
+        assert open(node_a.ensure_local(record["path"]), "rb").read() == b"media-bytes"
+
+    def test_asr_cache_shared_between_nodes(self, s3, tmp_path):
+        doc = {"events": [{"id": "1", "start": 0.0, "end": 1.0, "text": "hi"}]}
+        AsrCache(str(tmp_path / "a"), objects=s3).put("k_standard", doc)
+        fetched = AsrCache(str(tmp_path / "b"), objects=s3).get("k_standard")
+        assert fetched["events"][0]["text"] == "hi"
@@ -0,0 +1,110 @@
+"""
+Unit tests for the resumable chunked upload API — no whisper/torch.
+"""
+import hashlib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+pytest.importorskip("httpx")
+pytest.importorskip("multipart")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import src.config as config  # noqa: E402
+from src.routers import upload  # noqa: E402
+from src.services import resumable_upload, storage  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+    app = FastAPI()
+    app.include_router(upload.router, prefix="/api")
+    return TestClient(app)
+
+
+def _init(client, data, chunk_size):
+    resp = client.post("/api/upload/sessions", data={"filename": "movie.mp4", "size": len(data),
+                                                     "chunk_size": chunk_size})
+    assert resp.status_code == 201
+    return resp.json()["session_id"]
+
+
+class TestResumableUpload:
+    def test_parallel_out_of_order_chunks(self, client):
+        data = os.urandom(1024 * 1024 + 123)
+        chunk = 256 * 1024
+        sid = _init(client, data, chunk)
+        offsets = list(range(0, len(data), chunk))[::-1]
+
+        def put(off):
+            part = data[off:off + chunk]
+            return client.put(f"/api/upload/sessions/{sid}?offset={off}", content=part,
+                              headers={"X-Chunk-SHA256": hashlib.sha256(part).hexdigest()}).status_code
+
+        with ThreadPoolExecutor(4) as pool:
+            assert set(pool.map(put, offsets)) == {200}
+
+        assert client.get(f"/api/upload/sessions/{sid}").json()["missing"] == []
+        resp = client.post(f"/api/upload/sessions/{sid}/complete",
+                           data={"sha256": hashlib.sha256(data).hexdigest()})
+        assert resp.status_code == 200
+        file_uuid = resp.json()["uuid"]
+        with open(storage.get_file_path(file_uuid), "rb") as f:
+            assert f.read() == data
+        assert storage.get_file_digest(file_uuid) == hashlib.sha256(data).hexdigest()
+        assert client.get(f"/api/upload/sessions/{sid}").status_code == 404
+
+    def test_resume_reports_missing_ranges(self, client):
+        data = b"a" * 100
+        sid = _init(client, data, 40)
+        client.put(f"/api/upload/sessions/{sid}?offset=40", content=data[40:80])
+        status = client.get(f"/api/upload/sessions/{sid}").json()
+        assert status["received_bytes"] == 40
+        assert status["missing"] == [[0, 40], [80, 100]]
+        assert client.post(f"/api/upload/sessions/{sid}/complete").status_code == 400
+
+    def test_rejects_bad_checksum_and_out_of_range(self, client):
+        sid = _init(client, b"x" * 10, 10)
+        bad = client.put(f"/api/upload/sessions/{sid}?offset=0", content=b"x" * 10,
+                         headers={"X-Chunk-SHA256": "0" * 64})
+        assert bad.status_code == 400
+        assert client.put(f"/api/upload/sessions/{sid}?offset=5", content=b"x" * 10).status_code == 400
+        assert client.get(f"/api/upload/sessions/{sid}").json()["received_bytes"] == 0
+
+    def test_chunked_body_is_limited_while_reading(self, client, monkeypatch):
+        monkeypatch.setattr(upload, "MAX_CHUNK_SIZE", 64)
+        sid = _init(client, b"x" * 200, 200)
+
+        def body():
+            for _ in range(10):
+                yield b"x" * 20
+
+        # 生成器请求体以分块传输编码发送，没有 Content-Length
+        resp = client.put(f"/api/upload/sessions/{sid}?offset=0", content=body())
+        assert resp.status_code == 413
+        assert client.get(f"/api/upload/sessions/{sid}").json()["received_bytes"] == 0
+
+    def test_expired_sessions_are_removed(self, client, monkeypatch):
+        sid = _init(client, b"x" * 10, 10)
+        monkeypatch.setattr(resumable_upload, "SESSION_TTL", -1)
+        client.put(f"/api/upload/sessions/{sid}?offset=0", content=b"x")
+        assert resumable_upload.resumable_uploads.expire_sessions() == 1
+        assert client.get(f"/api/upload/sessions/{sid}").status_code == 404
+
+    def test_chunk_racing_completion_is_not_found(self, client):
+        sid = _init(client, b"x" * 10, 10)
+        manager = resumable_upload.resumable_uploads
+        # 会话在 write_chunk 读取元数据之后、打开 data.part 之前被完成
+        os.remove(os.path.join(manager._dir(sid), "data.part"))
+        with pytest.raises(resumable_upload.UploadSessionNotFound):
+            manager.write_chunk(sid, 0, b"x" * 10)
+        assert client.put(f"/api/upload/sessions/{sid}?offset=0", content=b"x" * 10).status_code == 404
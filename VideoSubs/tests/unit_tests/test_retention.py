@@ -0,0 +1,77 @@
+"""
+Unit tests for the indexed retention manager — no whisper/torch/ffmpeg.
+"""
+import io
+import os
+import sys
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services import retention as retention_module  # noqa: E402
+from src.services.retention import CACHES, OUTPUTS, UPLOADS, RetentionManager  # noqa: E402
+from src.services.storage import MediaStore  # noqa: E402
+
+
+def _task_dir(root, name, size, age=0.0):
+    path = root / name
+    path.mkdir()
+    (path / "output.mp4").write_bytes(b"x" * size)
+    if age:
+        old = time.time() - age
+        os.utime(path, (old, old))
+    return str(path)
+
+
+class TestRetentionManager:
+    def test_scan_indexes_existing_entries_once(self, tmp_path, monkeypatch):
+        _task_dir(tmp_path, "t1", 100)
+        (tmp_path / "queue_state.json").write_text("{}")
+        manager = RetentionManager(root=str(tmp_path), pin_sources=[])
+        assert manager.scan() == 1
+        assert manager.stats()[OUTPUTS] == {"entries": 1, "bytes": 100, "max_bytes": 0, "reclaimed_bytes": 0}
+
+        # 未变化的条目不再计算大小
+        monkeypatch.setattr(retention_module, "_entry_size", lambda path: (_ for _ in ()).throw(AssertionError))
+        assert manager.scan() == 0
+
+    def test_budget_evicts_least_recently_used(self, tmp_path):
+        manager = RetentionManager(budgets={OUTPUTS: 250}, root=str(tmp_path), pin_sources=[])
+        for name in ("a", "b", "c"):
+            manager.track(_task_dir(tmp_path, name, 100), OUTPUTS)
+            time.sleep(0.01)
+        manager.touch(str(tmp_path / "a"))
+
+        report = manager.run()
+        assert report[OUTPUTS] == {"evicted": 1, "reclaimed_bytes": 100, "bytes": 200}
+        assert not (tmp_path / "b").exists()
+        assert (tmp_path / "a").exists() and (tmp_path / "c").exists()
+        assert manager.stats()[OUTPUTS]["reclaimed_bytes"] == 100
+
+    def test_pinned_entries_survive(self, tmp_path):
+        old = _task_dir(tmp_path, "queued", 100, age=48 * 3600)
+        stale = _task_dir(tmp_path, "stale", 100, age=48 * 3600)
+        manager = RetentionManager(root=str(tmp_path),
+                                   pin_sources=[lambda: [os.path.join(old, "input.ass")]])
+        report = manager.run(max_age_hours=24)
+        assert report[OUTPUTS]["evicted"] == 1
+        assert os.path.exists(old) and not os.path.exists(stale)
+
+    def test_uploads_evicted_through_media_store(self, tmp_path, monkeypatch):
+        manager = RetentionManager(budgets={UPLOADS: 150}, root=str(tmp_path), pin_sources=[])
+        monkeypatch.setattr("src.services.storage.retention", manager)
+        store = MediaStore(str(tmp_path / "media"))
+        monkeypatch.setattr("src.services.storage.media_store", store)
+
+        kept = store.put_stream(io.BytesIO(b"k" * 100), "keep.mp4")
+        time.sleep(0.01)
+        dropped = store.put_stream(io.BytesIO(b"d" * 100), "drop.mp4")
+        time.sleep(0.01)
+        store.ensure_local(kept["path"])
+
+        assert manager.enforce()[UPLOADS]["evicted"] == 1
+        assert store.get(dropped["uuid"]) is None and not os.path.exists(dropped["path"])
+        assert store.get(kept["uuid"]) is not None
+        assert manager.stats()[CACHES]["entries"] == 0
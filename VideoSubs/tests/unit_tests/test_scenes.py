@@ -0,0 +1,118 @@
+"""
+Unit tests for the shot-boundary index and subtitle snapping — no whisper/torch/ffmpeg.
+"""
+import io
+import os
+import sys
+import time
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+import src.config as config  # noqa: E402
+from src.services import scenes, storage  # noqa: E402
+from src.services.ingest import SCENES_ARTIFACT, artifact_path  # noqa: E402
+from src.services.scenes import (  # noqa: E402
+    SceneIndex,
+    load_index,
+    parse_showinfo,
+    save_cuts,
+    snap_segments,
+)
+from src.services.storage import MediaStore  # noqa: E402
+
+SHOWINFO = """\
+[Parsed_showinfo_2 @ 0x55d] config in time_base: 1/12800, frame_rate: 25/1
+[Parsed_showinfo_2 @ 0x55d] n:   0 pts: 134400 pts_time:10.5    duration:    512 fmt:yuv420p
+[Parsed_showinfo_2 @ 0x55d] n:   1 pts:  38400 pts_time:3      duration:    512 fmt:yuv420p
+[Parsed_showinfo_2 @ 0x55d] n:   2 pts: 256000 pts_time:20     duration:    512 fmt:yuv420p
+frame=    3 fps=0.0 q=-0.0 Lsize=N/A time=00:00:20.04
+"""
+
+
+class TestSceneIndex:
+    def test_parse_showinfo(self):
+        assert parse_showinfo(SHOWINFO) == [3.0, 10.5, 20.0]
+
+    def test_queries(self):
+        index = SceneIndex([20.0, 3.0, 10.5])
+        assert index.nearest(0) == 3.0 and index.nearest(7) == 10.5 and index.nearest(99) == 20.0
+        assert index.before(10.5) == 10.5 and index.before(2) is None
+        assert index.after(10.5) == 20.0 and index.after(20) is None
+        assert index.between(3, 15) == [3.0, 10.5]
+        assert SceneIndex([]).nearest(5) is None
+
+    def test_snap_segments(self):
+        index = SceneIndex([3.0, 10.5, 20.0])
+        segments = [
+            {"start": 0.5, "end": 2.9},    # 结束于切点前几帧 → 延到切点
+            {"start": 3.1, "end": 6.0},    # 开始于切点后几帧 → 提前到切点
+            {"start": 10.4, "end": 10.6},  # 吸附后长度为 0 → 保留原始时间
+            {"start": 12.0, "end": 15.0},  # 远离切点不动
+        ]
+        snap_segments(segments, index, tolerance=0.25)
+        assert [(s["start"], s["end"]) for s in segments] == [(0.5, 3.0), (3.0, 6.0), (10.4, 10.6), (12.0, 15.0)]
+
+    def test_saved_index_round_trip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        assert load_index("abc") is None
+        save_cuts([5.0, 1.0], artifact_path("abc", SCENES_ARTIFACT))
+        assert load_index("abc").cuts == [1.0, 5.0]
+
+
+class TestSceneEndpoints:
+    def test_nearest_cut(self, tmp_path, monkeypatch):
+        pytest.importorskip("httpx")
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from src.routers import timeline
+
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        media = MediaStore(str(tmp_path / "media"))
+        monkeypatch.setattr(storage, "media_store", media)
+        monkeypatch.setattr(timeline, "media_store", media)
+        record = media.put_stream(io.BytesIO(b"video"), "movie.mp4")
+        save_cuts([3.0, 10.5, 20.0], artifact_path(record["sha256"], SCENES_ARTIFACT))
+
+        app = FastAPI()
+        app.include_router(timeline.router, prefix="/api")
+        client = TestClient(app)
+        assert client.get(f"/api/files/{record['uuid']}/scenes").json() == {"count": 3, "cuts": [3.0, 10.5, 20.0]}
+        assert client.get(f"/api/files/{record['uuid']}/scenes", params={"start": 5}).json()["cuts"] == [10.5, 20.0]
+        resp = client.get(f"/api/files/{record['uuid']}/scenes/nearest", params={"t": 9})
+        assert resp.json() == {"t": 9.0, "nearest": 10.5, "before": 3.0, "after": 10.5}
+        assert client.get("/api/files/missing/scenes").status_code == 404
+
+    def test_missing_index_builds_in_background(self, tmp_path, monkeypatch):
+        pytest.importorskip("httpx")
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from src.routers import timeline
+
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        media = MediaStore(str(tmp_path / "media"))
+        monkeypatch.setattr(storage, "media_store", media)
+        monkeypatch.setattr(timeline, "media_store", media)
+        monkeypatch.setattr(media, "media_info", lambda file_uuid: {"duration": 30.0, "width": 640})
+        record = media.put_stream(io.BytesIO(b"video"), "movie.mp4")
+
+        def build(file_uuid):
+            save_cuts([4.0], artifact_path(record["sha256"], SCENES_ARTIFACT))
+
+        monkeypatch.setattr(scenes, "prefetch", build)
+        app = FastAPI()
+        app.include_router(timeline.router, prefix="/api")
+        client = TestClient(app)
+        resp = client.get(f"/api/files/{record['uuid']}/scenes")
+        assert resp.status_code == 202 and resp.json() == {"status": "building"}
+        # 后台任务在默认线程池中完成后，同一请求直接返回索引
+        for _ in range(100):
+            if load_index(record["sha256"]) is not None:
+                break
+            time.sleep(0.01)
+        assert client.get(f"/api/files/{record['uuid']}/scenes").json() == {"count": 1, "cuts": [4.0]}
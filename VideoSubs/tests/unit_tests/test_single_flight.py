@@ -0,0 +1,68 @@
+"""
+Unit tests for single-flight request coalescing — no whisper/torch.
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.utils.single_flight import SingleFlight  # noqa: E402
+
+
+def _run_concurrently(flight, key, fn, n):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_run_once(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"text": "hello"}
+
+        results, errors = _run_concurrently(flight, "k", work, 5)
+        assert not errors
+        assert len(calls) == 1
+        assert len(results) == 5 and all(r is results[0] for r in results)
+        assert not flight.in_flight("k")
+
+    def test_errors_are_shared_and_key_released(self):
+        flight = SingleFlight("test")
+
+        def boom():
+            time.sleep(0.1)
+            raise ValueError("decode failed")
+
+        results, errors = _run_concurrently(flight, "k", boom, 3)
+        assert not results
+        assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+        assert flight.do("k", lambda: 42) == 42
+
+    def test_distinct_keys_do_not_block(self):
+        flight = SingleFlight("test")
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        with pytest.raises(KeyError):
+            flight.do("c", lambda: {}["missing"])
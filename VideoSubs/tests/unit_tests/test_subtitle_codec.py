@@ -0,0 +1,64 @@
+"""
+Unit tests for the compact .vsub subtitle format — no whisper/torch.
+"""
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.utils.subtitle_codec import (  # noqa: E402
+    SubtitleCodecError,
+    decode_doc,
+    encode_doc,
+    read_doc,
+    write_doc,
+)
+
+
+def _event(i, words=None, speaker=None):
+    return {"id": str(i + 1), "start": i * 2.0, "end": i * 2.0 + 1.5, "text": f"第{i}句 line {i}",
+            "speaker": speaker, "words": words, "style": "Default" if i % 2 else None}
+
+
+def _doc(n=1000):
+    words = [{"word": " hi", "start": 0.0, "end": 0.4, "probability": 0.9}, {"word": " there", "start": 0.4, "end": 1.0}]
+    events = [_event(i, words=words if i % 3 == 0 else None, speaker="A" if i % 5 == 0 else None) for i in range(n)]
+    return {"language": "zh", "resolution": {"w": 1920, "h": 1080}, "fps": 25.0, "events": events,
+            "recommended_style": None}
+
+
+class TestSubtitleCodec:
+    def test_roundtrip_is_lossless(self):
+        doc = _doc()
+        assert decode_doc(encode_doc(doc)) == doc
+
+    def test_smaller_than_pretty_json(self):
+        import json
+        doc = _doc()
+        assert len(encode_doc(doc)) < len(json.dumps(doc, ensure_ascii=False, indent=2).encode("utf-8")) / 4
+
+    def test_window_read_returns_overlapping_events(self, tmp_path):
+        doc = _doc()
+        path = str(tmp_path / "doc.vsub")
+        write_doc(path, doc)
+        window = read_doc(path, start=100.0, end=220.0)
+        expected = [ev for ev in doc["events"] if ev["end"] >= 100.0 and ev["start"] <= 220.0]
+        assert window["events"] == expected
+        assert window["language"] == "zh"
+
+    def test_irregular_words_fall_back_to_json(self):
+        doc = {"language": None, "events": [_event(0, words=[{"word": "a", "start": 0, "end": 1, "speaker": "x"}]),
+                                            _event(1, words=[])]}
+        assert decode_doc(encode_doc(doc))["events"] == doc["events"]
+
+    def test_empty_and_null_events(self):
+        assert decode_doc(encode_doc({"events": None})) == {"events": None}
+        assert decode_doc(encode_doc({"events": []})) == {"events": []}
+
+    def test_rejects_foreign_data(self):
+        with pytest.raises(SubtitleCodecError):
+            decode_doc(b"{\"events\": []}" + b"\0" * 32)
@@ -0,0 +1,130 @@
+"""
+Unit tests for the streaming subtitle serializer and export endpoint — no whisper/torch/ffmpeg.
+"""
+import io
+import json
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.agent.Subs import AssStyle, SubtitleDoc  # noqa: E402
+from src.utils import subtitle_export  # noqa: E402
+from src.utils.subtitle_export import (  # noqa: E402
+    SubtitleExportError,
+    ass_time,
+    hex_to_ass_color,
+    serialize,
+    srt_time,
+    to_string,
+    vtt_time,
+    write_subtitles,
+)
+
+EVENTS = [
+    {"id": "1", "start": 0.0, "end": 1.5, "text": "hello"},
+    {"id": "2", "start": 61.2345, "end": 3661.9996, "text": "two\n\nlines", "style": "Top"},
+]
+
+
+class TestTimestamps:
+    def test_formats(self):
+        assert srt_time(3661.5) == "01:01:01,500"
+        assert vtt_time(0.0005) == "00:00:00.000"
+        assert srt_time(59.9996) == "00:01:00,000"
+        assert ass_time(3661.996) == "1:01:02.00"
+        assert srt_time(-1) == "00:00:00,000"
+
+    def test_hex_to_ass_color(self):
+        assert hex_to_ass_color("#FF8000", 255) == "&H000080FF"
+        assert hex_to_ass_color(None) == "&H00000000"
+
+
+class TestSerialize:
+    @pytest.mark.parametrize("make", [lambda: {"events": EVENTS}, lambda: SubtitleDoc(events=EVENTS)])
+    def test_dict_and_model_inputs_match(self, make):
+        doc = make()
+        srt = to_string(doc, "srt")
+        assert srt == ("1\n00:00:00,000 --> 00:00:01,500\nhello\n\n"
+                       "2\n00:01:01,234 --> 01:01:02,000\ntwo\nlines\n\n")
+        vtt = to_string(doc, "vtt")
+        assert vtt.startswith("WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nhello\n\n")
+        ass = to_string(doc, "ass")
+        assert "PlayResX: 1920\nPlayResY: 1080" in ass
+        assert "Dialogue: 0,0:00:00.00,0:00:01.50,Default,,0,0,0,,hello\n" in ass
+        assert "Dialogue: 0,0:01:01.23,1:01:02.00,Top,,0,0,0,,two  lines\n" in ass
+        parsed = json.loads(to_string(doc, "json"))
+        assert [e["text"] for e in parsed["events"]] == ["hello", "two\n\nlines"]
+        assert SubtitleDoc.model_validate(parsed).events[1].end == 3661.9996
+
+    def test_chunk_boundaries(self, monkeypatch):
+        monkeypatch.setattr(subtitle_export, "CHUNK_EVENTS", 3)
+        events = [{"start": i, "end": i + 0.5, "text": str(i)} for i in range(7)]
+        chunks = list(serialize({"events": events}, "srt"))
+        assert len(chunks) == 3
+        assert "".join(chunks).split("\n\n")[6].startswith("7\n00:00:06,000")
+        parsed = json.loads(to_string({"events": events}, "json"))
+        assert [e["text"] for e in parsed["events"]] == [str(i) for i in range(7)]
+
+    def test_ass_resolution_and_styles(self):
+        style = AssStyle(Name="Top", FontName="Noto", FontSize=48, PrimaryColour="#FFFFFF", PrimaryAlpha=255,
+                         Bold=True, Alignment=8)
+        ass = to_string({"events": EVENTS, "resolution": {"width": 1280, "height": 720}}, "ass", styles=[style])
+        assert "PlayResX: 1280\nPlayResY: 720" in ass
+        assert "Style: Top,Noto,48.0,&H00FFFFFF,&H00000000,&H00000000,&H00000000,-1,0,0,0,100,100,0,0,1,1,0,8," in ass
+
+    def test_empty_and_unknown_format(self):
+        assert to_string({"events": []}, "srt") == ""
+        assert json.loads(to_string(SubtitleDoc(), "json"))["events"] == []
+        with pytest.raises(SubtitleExportError):
+            list(serialize({"events": EVENTS}, "txt"))
+
+    def test_write_to_path_and_stream(self, tmp_path):
+        dest = str(tmp_path / "task" / "out.srt")
+        assert write_subtitles({"events": EVENTS}, "srt", dest) == dest
+        with open(dest, encoding="utf-8", newline="") as f:
+            assert f.read() == to_string({"events": EVENTS}, "srt")
+        assert os.listdir(tmp_path / "task") == ["out.srt"]
+
+        buf = io.StringIO()
+        assert write_subtitles({"events": EVENTS}, "vtt", buf) is None
+        assert buf.getvalue() == to_string({"events": EVENTS}, "vtt")
+
+
+class TestExportRouter:
+    @pytest.fixture
+    def client(self):
+        pytest.importorskip("httpx")
+        pytest.importorskip("multipart")
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from src.routers import subtitles
+
+        app = FastAPI()
+        app.include_router(subtitles.router, prefix="/api")
+        return TestClient(app)
+
+    def test_export_formats(self, client):
+        body = json.dumps({"events": EVENTS})
+        resp = client.post("/api/subtitles/export", data={"format": "srt", "subtitles": body, "filename": "clip"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-subrip")
+        assert 'filename="clip.srt"' in resp.headers["content-disposition"]
+        assert resp.text == to_string(SubtitleDoc(events=EVENTS), "srt")
+
+        styles = json.dumps([{"Name": "Top", "FontName": "Arial", "FontSize": 40, "PrimaryColour": "#FFFFFF"}])
+        resp = client.post("/api/subtitles/export",
+                           data={"format": "ass", "subtitles": body, "width": 640, "height": 360, "styles": styles})
+        assert "PlayResX: 640\nPlayResY: 360" in resp.text and "Style: Top,Arial,40.0," in resp.text
+
+    def test_export_errors(self, client):
+        body = json.dumps({"events": EVENTS})
+        assert client.post("/api/subtitles/export", data={"format": "txt", "subtitles": body}).status_code == 400
+        assert client.post("/api/subtitles/export", data={"format": "srt"}).status_code == 400
+        assert client.post("/api/subtitles/export", data={"subtitles": "{not json"}).status_code == 400
+        assert client.post("/api/subtitles/export", data={"task_id": "missing"}).status_code == 404
@@ -0,0 +1,155 @@
+"""
+Unit tests for the SRT / WebVTT / ASS subtitle parsers — no whisper/torch/ffmpeg.
+"""
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.agent.Subs import AssStyle, SubtitleDoc  # noqa: E402
+from src.utils import subtitle_import  # noqa: E402
+from src.utils.subtitle_export import to_string  # noqa: E402
+from src.utils.subtitle_import import (  # noqa: E402
+    SubtitleParseError,
+    ass_color_to_hex,
+    detect_encoding,
+    detect_format,
+    load_subtitles,
+    parse_subtitles,
+    parse_time,
+)
+
+SRT = (
+    "1\n00:00:01,000 --> 00:00:02,500\n<i>Hello</i> &amp; bye\n\n"
+    "2\n0:00:03.5-->0:00:04\nline1\nline2\n"
+    "3\n00:00:05,000 --> 00:00:06,000 X1:10\n{\\an8}top\n\n"
+    "4\n00:00:07,000 --> 00:00:0x\nbad\n\n"
+    "00:00:09,000 --> 00:00:08,000\nreversed\n"
+)
+
+ASS = (
+    "[Script Info]\nPlayResX: 1280\nPlayResY: 720\n\n"
+    "[V4+ Styles]\nFormat: Name, Fontname, Fontsize, PrimaryColour, Bold, Alignment\n"
+    "Style: Top,Noto Sans,48,&H80FFFF00,-1,8\n\n"
+    "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    "Dialogue: 0,0:00:01.00,0:00:02.50,Top,Bob,0,0,0,,{\\b1}Hi, there\\Nfriend\n"
+    "Comment: 0,0:00:01.00,0:00:02.50,Top,,0,0,0,,skipped\n"
+    "Dialogue: 0,bad,0:00:02.50,Top,,0,0,0,,dropped\n"
+)
+
+
+class TestPrimitives:
+    def test_parse_time(self):
+        assert parse_time("01:02:03,456") == pytest.approx(3723.456)
+        assert parse_time("2:03.5") == pytest.approx(123.5)
+        assert parse_time("0:00:01.00") == 1.0
+        assert parse_time("12") is None and parse_time("1:2x") is None
+
+    def test_detect_encoding(self):
+        assert detect_encoding("字幕".encode("utf-8-sig")) == "utf-8-sig"
+        assert detect_encoding("1\n00:00".encode("utf-16-le")) == "utf-16-le"
+        assert detect_encoding("字幕".encode("utf-8")[:-1]) == "utf-8"
+        assert detect_encoding("你好，字幕".encode("gb18030")) == "gb18030"
+
+    def test_detect_format(self):
+        assert detect_format("", "a.SSA") == "ass"
+        assert detect_format("\ufeffWEBVTT\n") == "vtt"
+        assert detect_format("[Script Info]\n") == "ass"
+        assert detect_format("1\n00:00:01,000") == "srt"
+
+    def test_ass_color_roundtrip(self):
+        assert ass_color_to_hex("&H80FFFF00") == ("#00FFFF", 127)
+        assert ass_color_to_hex("&HFF") == ("#FF0000", 255)
+        assert ass_color_to_hex("16777215") == ("#FFFFFF", 255)
+        assert ass_color_to_hex("&Hzz") == (None, 255)
+
+
+class TestSrtVtt:
+    def test_tolerant_srt(self):
+        doc, styles = parse_subtitles(("\ufeff" + SRT).replace("\n", "\r\n").encode("utf-16"))
+        assert styles == []
+        assert [(e.id, e.start, e.end, e.text) for e in doc.events] == [
+            ("1", 1.0, 2.5, "Hello & bye"),
+            ("2", 3.5, 4.0, "line1\nline2"),
+            ("3", 5.0, 6.0, "top"),
+        ]
+
+    def test_strict_reports_line(self):
+        with pytest.raises(SubtitleParseError) as exc:
+            parse_subtitles(SRT, strict=True)
+        assert exc.value.line == 14
+
+    def test_vtt_blocks_and_voice(self):
+        vtt = ("WEBVTT - title\n\nNOTE a comment\nspanning\n\nSTYLE\n::cue { color: red }\n\n"
+               "intro\n00:01.000 --> 00:02.000 align:start\n<v Roger>We are <c.x>here</c>\n\n"
+               "02:03.250 --> 02:04.000\nsecond")
+        doc, _ = parse_subtitles(vtt)
+        assert [(e.start, e.text, e.speaker) for e in doc.events] == [
+            (1.0, "We are here", "Roger"), (123.25, "second", None),
+        ]
+
+    def test_text_that_looks_like_markup_is_kept(self):
+        events = [
+            {"id": "1", "start": 1.0, "end": 2.0, "text": "a < b and c > d"},
+            {"id": "2", "start": 3.0, "end": 4.0, "text": "a --> b"},
+        ]
+        for strict in (False, True):
+            doc, _ = parse_subtitles(to_string({"events": events}, "srt"), strict=strict)
+            assert doc.model_dump(exclude_none=True)["events"] == events
+        doc, _ = parse_subtitles("WEBVTT\n\n00:01.000 --> 00:02.000\n<B>x</B> <00:01.500><c.y>y</c>\n")
+        assert doc.events[0].text == "x y"
+
+    def test_export_roundtrip_across_blocks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(subtitle_import, "BLOCK_CHARS", 64)
+        monkeypatch.setattr(subtitle_import, "READ_CHARS", 50)
+        events = [{"id": str(i + 1), "start": i * 2.0, "end": i * 2.0 + 1.234, "text": f"cue {i}\nline"}
+                  for i in range(50)]
+        for fmt in ("srt", "vtt"):
+            path = tmp_path / f"subs.{fmt}"
+            path.write_text(to_string({"events": events}, fmt), encoding="utf-8")
+            doc, _ = load_subtitles(str(path))
+            assert doc.model_dump(exclude_none=True)["events"] == events
+
+
+class TestAss:
+    def test_styles_and_dialogue(self):
+        doc, styles = parse_subtitles(ASS.encode("gb18030"), filename="a.ass")
+        assert doc.resolution == {"width": 1280, "height": 720}
+        assert [(e.start, e.end, e.text, e.speaker, e.style) for e in doc.events] == [
+            (1.0, 2.5, "Hi, there\nfriend", "Bob", "Top"),
+        ]
+        assert styles == [doc.recommended_style]
+        assert styles[0].model_dump(exclude_none=True) == {
+            "Name": "Top", "FontName": "Noto Sans", "FontSize": 48.0, "PrimaryColour": "#00FFFF",
+            "PrimaryAlpha": 127, "Bold": True, "Alignment": 8,
+        }
+
+    def test_ssa_alignment_and_export_roundtrip(self):
+        style = AssStyle(Name="Main", FontName="Arial", FontSize=40, PrimaryColour="#FF8000", PrimaryAlpha=255,
+                         Italic=True, Alignment=7, MarginV=30)
+        ass = to_string(SubtitleDoc(events=[{"id": "1", "start": 1, "end": 2, "text": "x", "style": "Main"}]),
+                        "ass", styles=[style])
+        doc, styles = parse_subtitles(ass)
+        assert styles[0].PrimaryColour == "#FF8000" and styles[0].Italic and styles[0].Alignment == 7
+        assert doc.events[0].style == "Main"
+
+        ssa = "[V4 Styles]\nFormat: Name, Fontname, Fontsize, PrimaryColour, Alignment\nStyle: Old,Arial,20,65535,6\n"
+        _, styles = parse_subtitles(ssa, fmt="ass")
+        assert styles[0].Alignment == 8 and styles[0].PrimaryColour == "#FFFF00"
+
+    def test_literal_text_roundtrip(self):
+        events = [{"id": "1", "start": 1.0, "end": 2.0, "text": "Line one\nx {curly} y"}]
+        ass = to_string({"events": events}, "ass", literal_text=True)
+        assert ",,Line one\\Nx \\{curly\\} y\n" in ass
+        doc, _ = parse_subtitles(ass)
+        assert doc.events[0].text == events[0]["text"]
+
+    def test_strict_dialogue(self):
+        with pytest.raises(SubtitleParseError):
+            parse_subtitles(ASS, fmt="ass", strict=True)
+        with pytest.raises(SubtitleParseError):
+            parse_subtitles(ASS, fmt="sub")
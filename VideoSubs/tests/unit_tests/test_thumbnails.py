@@ -0,0 +1,87 @@
+"""
+Unit tests for poster / sprite-sheet thumbnails — no whisper/torch/ffmpeg.
+"""
+import io
+import os
+import sys
+
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+import src.config as config  # noqa: E402
+from src.services import storage, thumbnails  # noqa: E402
+from src.services.ingest import SPRITE_ARTIFACT, artifact_path  # noqa: E402
+from src.services.storage import MediaStore  # noqa: E402
+from src.services.thumbnails import (  # noqa: E402
+    SPRITE_IMAGE,
+    SPRITE_INDEX,
+    sprite_layout,
+    sprite_vtt,
+)
+
+HD = {"duration": 7200.0, "width": 1920, "height": 1080}
+
+
+class TestSpriteLayout:
+    def test_layout_for_long_and_short_videos(self):
+        layout = sprite_layout(HD)
+        assert (layout["frames"], layout["columns"], layout["rows"]) == (100, 10, 10)
+        assert (layout["width"], layout["height"]) == (160, 90) and layout["interval"] == 72.0
+
+        short = sprite_layout({"duration": 4.5, "width": 720, "height": 1280})
+        assert (short["frames"], short["columns"], short["rows"]) == (4, 4, 1)
+        assert short["height"] == 284
+
+    def test_vtt_index(self):
+        vtt = sprite_vtt(sprite_layout({"duration": 25.0, "width": 1920, "height": 1080}, frames=12))
+        blocks = vtt.strip().split("\n\n")
+        assert blocks[0] == "WEBVTT" and len(blocks) == 13
+        assert blocks[1] == "00:00:00.000 --> 00:00:02.083\nsprite.jpg#xywh=0,0,160,90"
+        # 第 11 帧换到第二行，最后一帧结束于片尾
+        assert blocks[11].endswith("sprite.jpg#xywh=0,90,160,90")
+        assert blocks[12].startswith("00:00:22.917 --> 00:00:25.000")
+
+
+class TestThumbnailEndpoints:
+    def test_serves_cached_sprite(self, tmp_path, monkeypatch):
+        pytest.importorskip("httpx")
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from src.routers import timeline
+
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        media = MediaStore(str(tmp_path / "media"))
+        monkeypatch.setattr(storage, "media_store", media)
+        record = media.put_stream(io.BytesIO(b"video"), "movie.mp4")
+        sprite_dir = artifact_path(record["sha256"], SPRITE_ARTIFACT)
+        os.makedirs(sprite_dir)
+        with open(os.path.join(sprite_dir, SPRITE_IMAGE), "wb") as f:
+            f.write(b"\xff\xd8jpeg")
+        with open(os.path.join(sprite_dir, SPRITE_INDEX), "w", encoding="utf-8") as f:
+            f.write(sprite_vtt(sprite_layout(HD)))
+
+        app = FastAPI()
+        app.include_router(timeline.router, prefix="/api")
+        client = TestClient(app)
+        resp = client.get(f"/api/files/{record['uuid']}/sprite.vtt")
+        assert resp.status_code == 200 and resp.text.startswith("WEBVTT")
+        assert resp.headers["cache-control"].endswith("immutable")
+        resp = client.get(f"/api/files/{record['uuid']}/sprite.jpg")
+        assert resp.status_code == 200 and resp.content == b"\xff\xd8jpeg"
+        assert client.get("/api/files/missing/thumbnail").status_code == 404
+
+    def test_prefetch_builds_sprite_even_if_poster_fails(self, monkeypatch):
+        calls = []
+
+        def poster(file_uuid):
+            calls.append("poster")
+            raise RuntimeError("ffmpeg failed")
+
+        monkeypatch.setattr(thumbnails, "ensure_poster", poster)
+        monkeypatch.setattr(thumbnails, "ensure_sprite", lambda file_uuid: calls.append("sprite"))
+        thumbnails.prefetch("abc")
+        assert calls == ["poster", "sprite"]
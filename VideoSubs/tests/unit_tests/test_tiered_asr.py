@@ -0,0 +1,55 @@
+"""
+Unit tests for two-pass ASR span selection and splicing — no whisper/torch.
+"""
+import os
+import sys
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.services.tiered_asr import select_refine_spans, splice_segments  # noqa: E402
+
+
+def _seg(start, end, text="x", avg_logprob=-0.1, compression_ratio=1.2, no_speech_prob=0.01):
+    return {"start": start, "end": end, "text": text, "avg_logprob": avg_logprob,
+            "compression_ratio": compression_ratio, "no_speech_prob": no_speech_prob}
+
+
+class TestSelectRefineSpans:
+    def test_confident_draft_needs_nothing(self):
+        assert select_refine_spans([_seg(0, 5), _seg(5, 10)], duration=10) == []
+
+    def test_neighbours_are_merged_and_padded(self):
+        segs = [_seg(0, 5), _seg(5, 8, avg_logprob=-1.2), _seg(8, 12, compression_ratio=2.8), _seg(20, 25)]
+        assert select_refine_spans(segs, duration=25) == [(4.5, 12.5)]
+
+    def test_spans_never_exceed_a_window(self):
+        segs = [_seg(i * 10, i * 10 + 10, avg_logprob=-2) for i in range(6)]
+        spans = select_refine_spans(segs, duration=60)
+        assert all(e - s <= 30 for s, e in spans)
+        assert spans[0][0] == 0 and spans[-1][1] == 60
+        assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
+
+    def test_hallucinated_text_in_silence(self):
+        segs = [_seg(0, 3, text=" Thanks for watching!", no_speech_prob=0.9)]
+        assert select_refine_spans(segs, duration=3) == [(0.0, 3)]
+
+
+class TestSpliceSegments:
+    def test_refined_replace_covered_draft(self):
+        draft = [_seg(0, 5, "a"), _seg(5, 8, "b?", avg_logprob=-1.2), _seg(8, 12, "c")]
+        refined = [_seg(5.1, 7.9, "b!")]
+        out = splice_segments(draft, [(4.5, 8.5)], refined)
+        assert [s["text"] for s in out] == ["a", "b!", "c"]
+        assert [s["id"] for s in out] == [0, 1, 2]
+        assert out[1]["refined"] is True
+
+    def test_padding_does_not_duplicate_neighbours(self):
+        draft = [_seg(0, 5, "a"), _seg(5, 8, "b?", avg_logprob=-1.2), _seg(8, 12, "c")]
+        spans = select_refine_spans(draft, duration=12)
+        assert spans == [(4.5, 8.5)]
+        # 大模型在 padding 里重新解出了 "a" 的结尾与 "c" 的开头
+        refined = [_seg(4.5, 4.9, "a-tail"), _seg(4.8, 8.3, "b!"), _seg(8.1, 8.5, "c-head")]
+        out = splice_segments(draft, spans, refined)
+        assert [(s["start"], s["end"], s["text"]) for s in out] == [(0, 5, "a"), (5, 8, "b!"), (8, 12, "c")]
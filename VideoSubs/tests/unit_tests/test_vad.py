@@ -0,0 +1,69 @@
+"""
+Unit tests for the energy VAD, decode-window packing and skipped-audio accounting.
+"""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.utils import vad  # noqa: E402
+
+SR = 16000
+
+
+def _tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SR)) / SR
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds):
+    return np.random.default_rng(0).normal(0, 1e-4, int(seconds * SR)).astype(np.float32)
+
+
+class TestDetectSpeech:
+    def test_finds_speech_between_silence(self, monkeypatch):
+        monkeypatch.setattr(vad, "SILERO_AVAILABLE", False)
+        audio = np.concatenate([_silence(10), _tone(3), _silence(1), _tone(2), _silence(20)])
+        spans = vad.detect_speech(audio)
+        assert len(spans) == 2
+        assert abs(spans[0][0] / SR - 9.8) < 0.1
+        assert abs(spans[1][1] / SR - 16.2) < 0.1
+        assert vad.speech_seconds(spans) < 8
+
+    def test_all_silence(self, monkeypatch):
+        monkeypatch.setattr(vad, "SILERO_AVAILABLE", False)
+        assert vad.detect_speech(np.zeros(SR * 5, dtype=np.float32)) == []
+
+
+class TestPackWindows:
+    def test_short_regions_share_a_window(self):
+        assert vad.pack_windows([(0, 100), (200, 300), (900, 1000)], max_len=500) == [(0, 300), (900, 1000)]
+
+    def test_long_region_is_split(self):
+        assert vad.pack_windows([(0, 1200)], max_len=500) == [(0, 500), (500, 1000), (1000, 1200)]
+
+
+class TestSkippedSeconds:
+    def test_counts_only_audio_outside_decoded_windows(self, monkeypatch):
+        from src.services import ingest, scenes, transcription
+        from src.utils import audio as audio_utils
+
+        class Backend:
+            def transcribe(self, audio, model_size, lang=None, spans=None):
+                return {"text": "", "segments": [], "language": "en"}
+
+        # 60 秒音频，两段语音间隔 5 秒：打包进同一个 30 秒窗口，间隔也会被解码
+        monkeypatch.setattr(audio_utils, "load_pcm", lambda path: np.zeros(60 * SR, dtype=np.float32))
+        monkeypatch.setattr(vad, "vad_enabled", lambda: True)
+        monkeypatch.setattr(vad, "detect_speech", lambda audio: [(0, 5 * SR), (10 * SR, 20 * SR)])
+        monkeypatch.setattr(ingest, "language_hint", lambda path: "en")
+        monkeypatch.setattr(scenes, "index_for_path", lambda path: None)
+        monkeypatch.setattr(transcription, "get_backend", lambda name=None: Backend())
+        result = transcription.transcribe_media("clip.mp4")
+        assert result["skipped_seconds"] == pytest.approx(40.0)
@@ -0,0 +1,101 @@
+"""
+Unit tests for the waveform peak pyramid — no whisper/torch/ffmpeg.
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+import src.config as config  # noqa: E402
+from src.services import storage  # noqa: E402
+from src.services.ingest import PCM_ARTIFACT, artifact_path  # noqa: E402
+from src.services.storage import MediaStore  # noqa: E402
+from src.services.waveform import (  # noqa: E402
+    LEVEL_FACTOR,
+    LEVELS,
+    build_pyramid,
+    choose_level,
+    compute_peaks,
+    read_window,
+    reduce_peaks,
+)
+
+RNG = np.random.default_rng(0)
+PCM = RNG.integers(-32768, 32767, 16000 * 7 + 123, dtype=np.int16)
+
+
+class TestPyramid:
+    def test_compute_peaks_with_partial_tail(self):
+        pcm = np.array([1, -5, 3, 7, -2, 0, 9], dtype=np.int16)
+        assert compute_peaks(pcm, 3).tolist() == [[-5, 3], [-2, 7], [9, 9]]
+        assert compute_peaks(np.zeros(0, np.int16), 160).shape == (0, 2)
+
+    def test_reduced_levels_match_direct_computation(self):
+        peaks = compute_peaks(PCM, LEVELS[0])
+        for level in LEVELS[1:3]:
+            peaks = reduce_peaks(peaks, LEVEL_FACTOR)
+            assert np.array_equal(peaks, compute_peaks(PCM, level))
+
+    def test_choose_level(self):
+        assert choose_level(1000) == LEVELS[0]
+        assert choose_level(100) == LEVELS[0]
+        assert choose_level(25) == LEVELS[1]
+        assert choose_level(0.001) == LEVELS[-1]
+
+    def test_read_window(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        build_pyramid(PCM, artifact_path("abc", "peaks"))
+        assert sorted(os.listdir(artifact_path("abc", "peaks"))) == sorted(f"{level}.npy" for level in LEVELS)
+
+        window, level, first = read_window("abc", 2.0, 3.0, 100)
+        assert level == LEVELS[0] and first == 2.0 and len(window) == 100
+        assert np.array_equal(window, compute_peaks(PCM[32000:48000], LEVELS[0]))
+
+        window8, _, _ = read_window("abc", 2.0, 3.0, 100, bits=8)
+        assert window8.dtype == np.int8 and np.array_equal(window8, window >> 8)
+
+        # 整段只要 10 个像素时选用粗级别
+        window, level, first = read_window("abc", 0.0, None, 10 / 7)
+        assert level > LEVELS[0] and first == 0.0 and len(window) < 20
+
+
+class TestWaveformEndpoint:
+    def test_returns_binary_window(self, tmp_path, monkeypatch):
+        pytest.importorskip("httpx")
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        from src.routers import timeline
+
+        monkeypatch.setattr(config, "OUTPUTS_DIR", str(tmp_path))
+        media = MediaStore(str(tmp_path / "media"))
+        monkeypatch.setattr(storage, "media_store", media)
+        record = media.put_stream(io.BytesIO(b"audio"), "talk.wav")
+        # 预先放入 PCM 缓存，模拟已解码
+        os.makedirs(os.path.dirname(artifact_path(record["sha256"], PCM_ARTIFACT)))
+        np.save(artifact_path(record["sha256"], PCM_ARTIFACT), PCM)
+
+        app = FastAPI()
+        app.include_router(timeline.router, prefix="/api")
+        client = TestClient(app)
+        resp = client.get(f"/api/files/{record['uuid']}/waveform", params={"start": 1, "end": 2, "pixels": 100})
+        assert resp.status_code == 200
+        assert resp.headers["x-waveform-samples-per-peak"] == str(LEVELS[0])
+        assert resp.headers["x-waveform-peaks"] == "100" and resp.headers["x-waveform-start"] == "1.000"
+        peaks = np.frombuffer(resp.content, "<i2").reshape(-1, 2)
+        assert np.array_equal(peaks, compute_peaks(PCM[16000:32000], LEVELS[0]))
+
+        again = client.get(f"/api/files/{record['uuid']}/waveform", params={"start": 1, "end": 2, "pixels": 100},
+                           headers={"If-None-Match": resp.headers["etag"]})
+        assert again.status_code == 304
+
+        resp = client.get(f"/api/files/{record['uuid']}/waveform", params={"pixels": 50, "bits": 8})
+        assert len(resp.content) == int(resp.headers["x-waveform-peaks"]) * 2
+        assert client.get(f"/api/files/{record['uuid']}/waveform", params={"bits": 4}).status_code == 400
+        assert client.get("/api/files/missing/waveform").status_code == 404